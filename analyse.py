@@ -1,6 +1,8 @@
 import json
 import os
-from typing import List, Dict
+from typing import Callable, List, Dict, Iterable, Optional
+from collections import OrderedDict
+import threading
 from datetime import datetime
 import re
 import pandas as pd
@@ -8,38 +10,215 @@ import requests
 from io import BytesIO
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
-from openpyxl.drawing.spreadsheet_drawing import AnchorMarker, TwoCellAnchor
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import PatternFill, Alignment, Side, Border, Font
-from PIL import Image as PILImage  # 确保 Pillow 已安装
 import cv2
 import numpy as np
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 import base64
 import time
 from bs4 import BeautifulSoup
 import hashlib
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urljoin
+from requests.cookies import remove_cookie_by_name
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
+from storage import get_storage, DATA_DIR, ANALYSIS_DIR, IMAGE_DIR, REPORTS_DIR
+from strategies import STRATEGIES, SIDE_REPORTS, resolve_strategy, resolve_reports, get_strategy
+from metrics import parse_price, parse_count, numeric_field
+from image_cache import content_hash, get_image_cache
+from report_writer import ReportWriter
+from match_report import (create_match_report, match_product, MatchReportBuilder, ProductMatch,
+                          SCHEME1_SHEET, SCHEME2_SHEET, SCHEME2_CANDIDATES)
+from thumbnails import get_thumbnail_store, render_upload, REPORT_SIZE, CELL_SIZE
+from search_cache import get_search_cache
+from analysis_journal import AnalysisJournal, PreviousResults
+from browser_pool import BrowserPool, get_browser_service
+from mtop_token import get_token_manager, is_token_error, TOKEN_COOKIES
+
+def _metric_column(products: List[Dict], field: str, parse) -> np.ndarray:
+    """
+    读取商品指标的数值列
+    入库时已解析的数据直接使用 "<字段名>_num" 列；旧数据按列解析，相同的字符串只解析一次。
+    空值记为 0，无法解析的值（如 "1.2.3"）记为 NaN，会在筛选时被排除
+    """
+    num_field = numeric_field(field)
+    if all(num_field in p for p in products):
+        return np.array([p[num_field] for p in products], dtype=np.float64)
+    
+    codes, uniques = pd.factorize(pd.Series([p.get(field, 'N/A') for p in products], dtype=object))
+    parsed = np.array([parse(value) for value in uniques], dtype=np.float64)
+    if not len(parsed):
+        return np.zeros(len(codes))
+    return np.where(codes >= 0, parsed[codes], 0.0)
+
+def _rank_scores(values: np.ndarray, descending: bool) -> np.ndarray:
+    """
+    排名评分：第一名100分，之后每名递减 100/n 分
+    数值相同的商品并列同一名次（取并列中的最高名次），得分相同
+    返回 (得分数组, 从0开始的名次数组)
+    """
+    n = len(values)
+    keys = -values if descending else values
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    # 每个元素所在并列组的起始位置即其名次（从0开始）
+    is_new = np.empty(n, dtype=bool)
+    is_new[:1] = True
+    np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=is_new[1:])
+    group_start = np.maximum.accumulate(np.where(is_new, np.arange(n), 0))
+    ranks = np.empty(n, dtype=np.int64)
+    ranks[order] = group_start
+    return 100 - ranks * (100 / n), ranks
+
+class ProductFrame:
+    """已解析的商品数据：原始商品列表和按列解析好的数值指标"""
+    
+    # 每个数据帧最多缓存的价格范围排名数
+    RANK_CACHE_SIZE = 8
+    
+    def __init__(self, products: List[Dict], prices: np.ndarray,
+                 sales: np.ndarray, influencers: np.ndarray):
+        self.products = products
+        self.prices = prices
+        self.sales = sales
+        self.influencers = influencers
+        self._rank_cache = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self.products)
+    
+    def ranks(self, price_range: tuple) -> tuple:
+        """
+        返回价格范围内有效商品的下标及销量、达人数量排名
+        同一价格范围的排名只计算一次，不同权重和 top_n 的策略可以直接复用
+        """
+        key = (float(price_range[0]), float(price_range[1]))
+        with self._lock:
+            if key in self._rank_cache:
+                self._rank_cache.move_to_end(key)
+                return self._rank_cache[key]
+        
+        # NaN 的比较结果为 False，无法解析的商品会被过滤
+        valid_mask = ((self.prices >= price_range[0]) & (self.prices <= price_range[1]) &
+                      (self.sales > 0) & (self.influencers > 0))
+        valid_idx = np.flatnonzero(valid_mask)
+        if len(valid_idx):
+            sales_score, sales_rank = _rank_scores(self.sales[valid_idx], descending=True)
+            influencer_score, influencer_rank = _rank_scores(self.influencers[valid_idx], descending=False)
+        else:
+            sales_score = sales_rank = influencer_score = influencer_rank = np.empty(0)
+        entry = (valid_idx, sales_score, sales_rank, influencer_score, influencer_rank)
+        
+        with self._lock:
+            self._rank_cache[key] = entry
+            while len(self._rank_cache) > self.RANK_CACHE_SIZE:
+                self._rank_cache.popitem(last=False)
+        return entry
+
+# 已解析数据帧的进程内缓存，键为 (文件绝对路径, 修改时间, 大小)
+_FRAME_CACHE_SIZE = 4
+_frame_cache = OrderedDict()
+_frame_cache_lock = threading.Lock()
+
+# 图片特征的进程内缓存，键为 (图片内容哈希, 特征类型)
+_FEATURE_CACHE_SIZE = 4096
+_feature_cache = OrderedDict()
+_feature_cache_lock = threading.Lock()
+
+
+# ORB 特征点提取前把图片缩放到的最大边长
+_ORB_MAX_SIDE = 320
+
+
+def _decode_image(content: bytes, flags: int) -> np.ndarray:
+    img = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), flags)
+    if img is None:
+        raise ValueError("无法解码图片")
+    return img
+
+
+def _dhash_feature(content: bytes) -> np.ndarray:
+    """64 位差值哈希（dHash），JPEG 直接按 1/8 分辨率解码"""
+    img = _decode_image(content, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    small = cv2.resize(img, (9, 8), interpolation=cv2.INTER_AREA)
+    return (small[:, 1:] > small[:, :-1]).ravel()
+
+
+def _orb_feature(content: bytes) -> np.ndarray:
+    """ORB 特征点描述子，没有特征点时返回空数组"""
+    img = _decode_image(content, cv2.IMREAD_GRAYSCALE)
+    scale = _ORB_MAX_SIDE / max(img.shape[:2])
+    if scale < 1:
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    _, descriptors = cv2.ORB_create(nfeatures=500).detectAndCompute(img, None)
+    return descriptors if descriptors is not None else np.empty((0, 32), dtype=np.uint8)
+
+
+def _orb_good_matches(source: np.ndarray, candidate: np.ndarray) -> int:
+    """通过 Lowe 比率检验的特征点匹配数"""
+    if len(source) < 2 or len(candidate) < 2:
+        return 0
+    pairs = cv2.BFMatcher(cv2.NORM_HAMMING).knnMatch(source, candidate, k=2)
+    return sum(1 for pair in pairs if len(pair) == 2 and pair[0].distance < 0.75 * pair[1].distance)
+
+
+def _histogram_feature(content: bytes) -> np.ndarray:
+    """
+    计算图片的颜色直方图特征（224x224，8x8x8 直方图，512 维）
+    先取平方根，避免商品图中大面积的白色背景占据主导，使不同商品的相关系数也很高；
+    再去均值并 L2 归一化，两个特征的点积即为皮尔逊相关系数
+    """
+    img = cv2.resize(_decode_image(content, cv2.IMREAD_COLOR), (224, 224))
+    hist = cv2.calcHist([img], [0, 1, 2], None, [8, 8, 8], [0, 256, 0, 256, 0, 256])
+    vector = np.sqrt(hist.ravel().astype(np.float64))
+    vector -= vector.mean()
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def _correl_scores(source: np.ndarray, candidates: List[np.ndarray]) -> np.ndarray:
+    """一次矩阵运算计算源图片与所有候选图片直方图的皮尔逊相关系数（-1 到 1）"""
+    return np.clip(np.stack(candidates) @ source, -1.0, 1.0)
+
+
+_FEATURE_EXTRACTORS = {
+    'dhash': _dhash_feature,
+    'histogram': _histogram_feature,
+    'orb': _orb_feature,
+}
+
+# 级联匹配的各层，按顺序执行
+CASCADE_TIERS = ('dhash', 'histogram', 'orb')
 
 class ImageMatcher:
     def __init__(self):
-        self.driver = None
-        self.similarity_threshold = 0.8  # 相似度阈值
-        self.alibaba_searcher = Alibaba1688Searcher()
+        # 直方图相似度阈值：同一图片重新压缩、缩放后约 0.98 以上，裁剪、调亮后约 0.7-0.85，
+        # 不同商品（即使背景相同）一般在 0.6 以下
+        self.similarity_threshold = 0.65
+        self.dhash_max_distance = 24     # dHash 汉明距离上限（共64位），超过视为明显不同的图片
+        self.orb_min_matches = 10        # ORB 特征点最少匹配数
+        self.alibaba_searcher = None  # 需要搜索时从浏览器服务租用
+        self._cascade_stats = {tier: {'checked': 0, 'passed': 0, 'seconds': 0.0} for tier in CASCADE_TIERS}
 
     def init_browser(self):
-        """初始化浏览器"""
-        self.alibaba_searcher.init_browser()
+        """从浏览器服务租用一个已就绪的搜索器"""
+        if self.alibaba_searcher is None:
+            self.alibaba_searcher = get_browser_service(Alibaba1688Searcher).lease()
 
     def close_browser(self):
-        """关闭浏览器"""
-        self.alibaba_searcher.close_browser()
+        """把搜索器归还给浏览器服务"""
+        if self.alibaba_searcher is not None:
+            get_browser_service(Alibaba1688Searcher).release(self.alibaba_searcher)
+            self.alibaba_searcher = None
 
     def search_1688_by_image(self, image_url: str) -> List[Dict]:
         """
@@ -53,45 +232,318 @@ class ImageMatcher:
         比较两张图片的相似度
         返回相似度得分(0-1)
         """
-        # 下载图片
-        img1 = self._download_and_process_image(img1_url)
-        img2 = self._download_and_process_image(img2_url)
-        
-        # 使用OpenCV计算图片相似度
+        return self.compare_many(img1_url, [img2_url])[0]
+
+    def compare_many(self, source_url: str, candidate_urls: List[str]) -> List[float]:
+        """
+        批量比较源图片与候选图片的颜色直方图相似度，返回与 candidate_urls 顺序一致的得分列表
+        每张图片的特征向量只计算一次，所有候选一次矩阵运算完成打分，无法处理的图片得分为 0
+        """
+        scores = [0.0] * len(candidate_urls)
+        source = self._image_feature(source_url, 'histogram')
+        if source is None or not candidate_urls:
+            return scores
+        
+        features = [self._image_feature(url, 'histogram') for url in candidate_urls]
+        valid = [i for i, feature in enumerate(features) if feature is not None]
+        if valid:
+            valid_scores = _correl_scores(source, [features[i] for i in valid])
+            for i, score in zip(valid, valid_scores.tolist()):
+                scores[i] = score
+        return scores
+
+    def match_many(self, source_url: str, candidate_urls: List[str]) -> List[float]:
+        """
+        级联匹配：dHash 预筛 → 颜色直方图 → ORB 特征点，只有通过上一层的候选才进入下一层
+        返回与 candidate_urls 顺序一致的得分：通过全部层级的候选为直方图相似度，其余为 0
+        """
+        scores = [0.0] * len(candidate_urls)
+        histogram_scores = {}
+        
+        def dhash_tier(indices):
+            source = self._image_feature(source_url, 'dhash')
+            if source is None:
+                return []
+            passed = []
+            for i in indices:
+                feature = self._image_feature(candidate_urls[i], 'dhash')
+                if feature is not None and np.count_nonzero(feature != source) <= self.dhash_max_distance:
+                    passed.append(i)
+            return passed
+        
+        def histogram_tier(indices):
+            tier_scores = self.compare_many(source_url, [candidate_urls[i] for i in indices])
+            histogram_scores.update(zip(indices, tier_scores))
+            return [i for i, score in zip(indices, tier_scores) if score >= self.similarity_threshold]
+        
+        def orb_tier(indices):
+            source = self._image_feature(source_url, 'orb')
+            if source is None:
+                return []
+            passed = []
+            for i in indices:
+                feature = self._image_feature(candidate_urls[i], 'orb')
+                if feature is not None and _orb_good_matches(source, feature) >= self.orb_min_matches:
+                    passed.append(i)
+            return passed
+        
+        survivors = list(range(len(candidate_urls)))
+        for tier, select in zip(CASCADE_TIERS, (dhash_tier, histogram_tier, orb_tier)):
+            survivors = self._run_tier(tier, survivors, select)
+        for i in survivors:
+            scores[i] = histogram_scores[i]
+        return scores
+
+    def _run_tier(self, tier: str, indices: List[int], select) -> List[int]:
+        """执行级联中的一层，记录耗时和通过率"""
+        if not indices:
+            return indices
+        start = time.perf_counter()
+        passed = select(indices)
+        stats = self._cascade_stats[tier]
+        stats['checked'] += len(indices)
+        stats['passed'] += len(passed)
+        stats['seconds'] += time.perf_counter() - start
+        return passed
+
+    def cascade_stats(self) -> Dict[str, Dict]:
+        """各层的检查数量、通过数量、通过率和平均每个候选的耗时（毫秒）"""
+        result = {}
+        for tier, stats in self._cascade_stats.items():
+            checked = stats['checked']
+            result[tier] = {
+                'checked': checked,
+                'passed': stats['passed'],
+                'pass_rate': round(stats['passed'] / checked, 4) if checked else 0.0,
+                'avg_ms': round(stats['seconds'] * 1000 / checked, 2) if checked else 0.0
+            }
+        return result
+
+    def _image_feature(self, url: str, kind: str):
+        """返回图片的指定特征，按图片内容哈希缓存，失败返回 None"""
         try:
-            # 转换为相同大小
-            img1 = cv2.resize(img1, (224, 224))
-            img2 = cv2.resize(img2, (224, 224))
-            
-            # 计算直方图
-            hist1 = cv2.calcHist([img1], [0, 1, 2], None, [8, 8, 8], [0, 256, 0, 256, 0, 256])
-            hist2 = cv2.calcHist([img2], [0, 1, 2], None, [8, 8, 8], [0, 256, 0, 256, 0, 256])
-            
-            # 归一化直方图
-            cv2.normalize(hist1, hist1)
-            cv2.normalize(hist2, hist2)
-            
-            # 计算相似度
-            similarity = cv2.compareHist(hist1, hist2, cv2.HISTCMP_CORREL)
-            return similarity
+            content = get_image_cache().fetch(url)
+            if not content:
+                return None
+            # 按取得的图片内容计算哈希，不依赖可能已过期或被淘汰的 URL 索引
+            key = (content_hash(content), kind)
+            with _feature_cache_lock:
+                feature = _feature_cache.get(key)
+                if feature is not None:
+                    _feature_cache.move_to_end(key)
+                    return feature
+            
+            feature = _FEATURE_EXTRACTORS[kind](content)
+            
+            with _feature_cache_lock:
+                _feature_cache[key] = feature
+                while len(_feature_cache) > _FEATURE_CACHE_SIZE:
+                    _feature_cache.popitem(last=False)
+            return feature
         except Exception as e:
-            print(f"比较图片时出错: {str(e)}")
-            return 0.0
+            print(f"计算图片特征时出错 {url}: {str(e)}")
+            return None
+
+# 1688 搜索页面的等待配置
+SEARCH_PAGE_TIMEOUT = float(os.environ.get('ECHOTIK_1688_PAGE_TIMEOUT', '20'))  # 等待商品加载的超时（秒）
+SEARCH_TARGET_OFFERS = int(os.environ.get('ECHOTIK_1688_TARGET_OFFERS', '10'))  # 需要解析的商品数量
+SEARCH_SETTLE_SECONDS = 1.5  # 商品不足目标数量时，数量保持不变多久视为加载完毕
+
+# 搜索方式：browser 打开搜索页面解析；http 直接调用图片搜索数据接口，浏览器只用于获取token
+SEARCH_MODE = os.environ.get('ECHOTIK_1688_SEARCH_MODE', 'browser')
+MTOP_API_URL = os.environ.get('ECHOTIK_1688_API_URL', 'https://h5api.m.1688.com/h5')
+MTOP_APP_KEY = '12574478'
+SEARCH_API = os.environ.get('ECHOTIK_1688_SEARCH_API', 'mtop.relationrecommend.WirelessRecommend.recommend')
+SEARCH_API_VERSION = '2.0'
+SEARCH_API_APP_ID = int(os.environ.get('ECHOTIK_1688_SEARCH_APP_ID', '32517'))
+
+# 上传前把图片缩小到该边长并重新压缩（0 表示上传原图），1688 按图搜索不需要高分辨率原图
+UPLOAD_MAX_SIDE = int(os.environ.get('ECHOTIK_1688_UPLOAD_MAX_SIDE', '800'))
+UPLOAD_QUALITY = int(os.environ.get('ECHOTIK_1688_UPLOAD_QUALITY', '85'))
+
+# 统计已加载图片的商品卡片数量，并把第一个未加载的卡片滚动到可视区域以触发懒加载
+_LOADED_OFFERS_JS = """
+var cards = document.getElementsByClassName('normalcommon-offer-card');
+var loaded = 0;
+for (var i = 0; i < cards.length; i++) {
+    var img = cards[i].querySelector('.img-container .img');
+    if (!img || (img.getAttribute('style') || '').indexOf('url(') === -1) break;
+    loaded++;
+}
+if (loaded < arguments[0] && loaded < cards.length) {
+    cards[loaded].scrollIntoView({block: 'center'});
+}
+return [loaded, cards.length];
+"""
+
+# 一次性取回前 N 个商品卡片的 HTML 及页面地址（用于解析相对链接）
+_OFFER_CARDS_HTML_JS = """
+var cards = Array.prototype.slice.call(document.getElementsByClassName('normalcommon-offer-card'), 0, arguments[0]);
+return [document.baseURI, cards.map(function (card) { return card.outerHTML; }).join('')];
+"""
+
+_STYLE_URL_PATTERN = re.compile(r'url\(["\']?(.*?)["\']?\)')
+
+
+def _element_text(element) -> str:
+    """元素的文本，空白折叠为单个空格（与浏览器中元素的 .text 一致）"""
+    return ' '.join(element.get_text().split())
+
+
+def _strip_tags(text) -> str:
+    """去掉标题中的高亮标签（如 <font color=red>）"""
+    return ' '.join(re.sub(r'<[^>]+>', '', str(text or '')).split())
+
+
+def _first_value(item: Dict, *paths):
+    """按顺序尝试多个字段路径（如 'priceInfo.price'），返回第一个非空值"""
+    for path in paths:
+        value = item
+        for key in path.split('.'):
+            value = value.get(key) if isinstance(value, dict) else None
+        if value:
+            return value
+    return None
+
+
+# 图片搜索接口响应中商品列表的位置（相对于 data），按顺序查找第一个存在的列表
+_OFFER_LIST_PATHS = ('offerList', 'itemsArray', 'data.offerList', 'data.itemsArray')
+
+
+def _offer_list(result: Dict) -> List[Dict]:
+    data = result.get('data')
+    for path in _OFFER_LIST_PATHS:
+        items = data
+        for key in path.split('.'):
+            items = items.get(key) if isinstance(items, dict) else None
+        if isinstance(items, list):
+            return [item for item in items if isinstance(item, dict)]
+    return []
+
+
+def parse_offer_json(result: Dict, limit: Optional[int] = None) -> List[Dict]:
+    """
+    解析图片搜索数据接口返回的商品列表（data.offerList 或 data.itemsArray），字段与 parse_offer_cards 一致
+    缺少 offerId、图片或标题的条目（广告位、推荐词等）会被跳过
+    """
+    products = []
+    for item in _offer_list(result):
+        if limit is not None and len(products) >= limit:
+            break
+        # 部分接口把商品字段包在 data 中
+        item = item['data'] if isinstance(item.get('data'), dict) else item
+        offer_id = item.get('offerId')
+        image_url = _first_value(item, 'imageUrl', 'offerPicUrl', 'image.imgUrl', 'offerImage.imageUrl')
+        title = _strip_tags(_first_value(item, 'title', 'subject', 'offerTitle'))
+        if not offer_id or not image_url or not title:
+            continue
+        product_url = _first_value(item, 'detailUrl', 'offerUrl') or f"https://detail.1688.com/offer/{offer_id}.html"
+        price = _first_value(item, 'price', 'priceInfo.price', 'tradePrice.offerPrice.valueString')
+        products.append({
+            'title': title,
+            'price': str(price or ''),
+            'product_url': urljoin('https://detail.1688.com/', product_url),
+            'image_url': urljoin('https://cbu01.alicdn.com/', image_url)
+        })
+    return products
+
+
+def parse_offer_cards(html: str, base_url: str = 'https://s.1688.com/', limit: Optional[int] = None) -> List[Dict]:
+    """
+    解析1688搜索结果页中的商品卡片（normalcommon-offer-card）
+    每个商品包含 title、price、product_url、image_url，缺少链接、图片或标题的卡片会被跳过
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    products = []
+    for offer in soup.select('.normalcommon-offer-card'):
+        if limit is not None and len(products) >= limit:
+            break
+        # 选择第一个指向商品详情页的链接
+        product_url = None
+        for link in offer.find_all('a', href=True):
+            href = urljoin(base_url, link['href'])
+            if 'detail.1688.com' in href or 'dj.1688.com' in href:
+                product_url = href
+                break
+        
+        img_div = offer.select_one('.img-container .img')
+        title_elem = offer.select_one('.mojar-element-title .title')
+        price_elem = offer.select_one('.mojar-element-price .price')
+        if not product_url or img_div is None or title_elem is None or price_elem is None:
+            print("× 商品数据不完整，跳过")
+            continue
+        
+        match = _STYLE_URL_PATTERN.search(img_div.get('style', ''))
+        image_url = match.group(1) if match else ''
+        title = _element_text(title_elem)
+        if not image_url or not title:
+            print("× 商品数据不完整，跳过")
+            continue
+        
+        products.append({
+            'title': title,
+            'price': _element_text(price_elem),
+            'product_url': product_url,
+            'image_url': image_url
+        })
+    return products
+
+
+class SearchLatency:
+    """记录每个商品1688搜索的耗时，多个浏览器共用"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records: List[Dict] = []
+
+    def record(self, image_url: str, total_seconds: float, wait_seconds: float, offers: int, cached: bool,
+               upload: Optional[Dict] = None):
+        """upload 为本次上传的耗时和数据量，使用缓存的 imageId 时为 None"""
+        with self._lock:
+            self._records.append({
+                'image_url': image_url,
+                'total_ms': round(total_seconds * 1000, 1),
+                'wait_ms': round(wait_seconds * 1000, 1),
+                'offers': offers,
+                'cached': cached,
+                'upload': upload
+            })
+
+    def summary(self) -> Dict:
+        """耗时统计（毫秒）及每个商品的记录"""
+        with self._lock:
+            records = list(self._records)
+        if not records:
+            return {'count': 0}
+        totals = np.array([r['total_ms'] for r in records])
+        uploads = [r['upload'] for r in records if r['upload']]
+        return {
+            'count': len(records),
+            'avg_ms': round(float(totals.mean()), 1),
+            'p50_ms': round(float(np.percentile(totals, 50)), 1),
+            'p95_ms': round(float(np.percentile(totals, 95)), 1),
+            'max_ms': round(float(totals.max()), 1),
+            'avg_wait_ms': round(float(np.mean([r['wait_ms'] for r in records])), 1),
+            'uploads': len(uploads),
+            'avg_upload_ms': round(float(np.mean([u['ms'] for u in uploads])), 1) if uploads else 0.0,
+            'upload_raw_bytes': sum(u.get('raw_bytes', 0) for u in uploads),
+            'upload_sent_bytes': sum(u.get('sent_bytes', 0) for u in uploads),
+            'products': records
+        }
 
-    def _download_and_process_image(self, url: str) -> np.ndarray:
-        """下载并处理图片"""
-        response = requests.get(url)
-        img_array = np.asarray(bytearray(response.content), dtype=np.uint8)
-        return cv2.imdecode(img_array, cv2.IMREAD_COLOR)
 
 class Alibaba1688Searcher:
     def __init__(self):
         self.session = requests.Session()
         self.base_url = "https://re.1688.com"
-        self.api_url = "https://h5api.m.1688.com/h5"
+        self.api_url = MTOP_API_URL
         self.driver = None
-        self.m_h5_tk = None  # 存储token
-        self.headers = None  # 存储请求头
+        self.headers = None  # 存储请求头（token 由进程内共享的 TokenManager 管理）
+        self.page_timeout = SEARCH_PAGE_TIMEOUT
+        self.target_offers = SEARCH_TARGET_OFFERS
+        self.search_mode = SEARCH_MODE
+        self.upload_max_side = UPLOAD_MAX_SIDE
+        self.last_upload: Optional[Dict] = None  # 最近一次上传的原图和实际发送的字节数
 
     def init_browser(self):
         """初始化浏览器和必要的参数"""
@@ -143,15 +595,14 @@ class Alibaba1688Searcher:
                 EC.presence_of_element_located((By.TAG_NAME, "body"))
             )
             
-            # 获取cookies和localStorage
+            # 获取cookies
             cookies = self.driver.get_cookies()
-            token = self.driver.execute_script('return localStorage.getItem("_m_h5_tk");')
             
-            # 设置cookies
+            # 设置cookies，token 相关的 cookie 交给共享的 TokenManager
             for cookie in cookies:
-                self.session.cookies.set(cookie['name'], cookie['value'])
-                if cookie['name'] == '_m_h5_tk':
-                    self.m_h5_tk = cookie['value'].split('_')[0]
+                if cookie['name'] not in TOKEN_COOKIES:
+                    self.session.cookies.set(cookie['name'], cookie['value'])
+            get_token_manager().update((cookie['name'], cookie['value']) for cookie in cookies)
             
             # 设置通用请求头
             self.headers = {
@@ -181,9 +632,38 @@ class Alibaba1688Searcher:
         """关闭浏览器"""
         if self.driver:
             self.driver.quit()
+            self.driver = None
+
+    def is_alive(self) -> bool:
+        """浏览器是否仍可用（健康检查）"""
+        if not self.driver:
+            return False
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _encode_upload(self, content: bytes) -> str:
+        """缩小并重新压缩图片后转为base64，处理失败时上传原图"""
+        prepared = content
+        if self.upload_max_side:
+            try:
+                prepared = render_upload(content, self.upload_max_side, UPLOAD_QUALITY)
+            except Exception as e:
+                print(f"压缩上传图片失败，使用原图: {str(e)}")
+        self.last_upload = {'raw_bytes': len(content), 'sent_bytes': len(prepared)}
+        print(f"上传图片大小: {len(content)} -> {len(prepared)} 字节")
+        return base64.b64encode(prepared).decode('utf-8')
 
     def _image_to_base64(self, image_url: str) -> str:
         """将图片转换为base64编码，增强错误处理和重试机制"""
+        image_cache = get_image_cache()
+        cached = image_cache.get(image_url)
+        if cached is not None:
+            print(f"使用缓存的图片: {image_url}")
+            return self._encode_upload(cached)
+        
         max_retries = 3
         
         for attempt in range(max_retries):
@@ -213,9 +693,10 @@ class Alibaba1688Searcher:
                 if response.status_code == 200:
                     print(f"图片下载成功，内容类型: {response.headers.get('Content-Type', '未知')}")
                     print(f"图片大小: {len(response.content)} 字节")
+                    image_cache.put(image_url, response.content)
                     
                     # 将图片内容转换为base64
-                    base64_data = base64.b64encode(response.content).decode('utf-8')
+                    base64_data = self._encode_upload(response.content)
                     print(f"Base64数据长度: {len(base64_data)}")
                     return base64_data
                 else:
@@ -233,7 +714,8 @@ class Alibaba1688Searcher:
                             alt_response = requests.get(image_url, headers=alt_headers, timeout=15)
                             if alt_response.status_code == 200:
                                 print("替代方法1成功!")
-                                base64_data = base64.b64encode(alt_response.content).decode('utf-8')
+                                image_cache.put(image_url, alt_response.content)
+                                base64_data = self._encode_upload(alt_response.content)
                                 return base64_data
                         except:
                             pass
@@ -251,7 +733,8 @@ class Alibaba1688Searcher:
                                     alt_response = requests.get(alt_url, headers=headers, timeout=15)
                                     if alt_response.status_code == 200:
                                         print("替代方法2成功!")
-                                        base64_data = base64.b64encode(alt_response.content).decode('utf-8')
+                                        image_cache.put(image_url, alt_response.content)
+                                        base64_data = self._encode_upload(alt_response.content)
                                         return base64_data
                             except:
                                 pass
@@ -278,6 +761,17 @@ class Alibaba1688Searcher:
         except:
             return None
 
+    def _image_digest(self, image_url: str) -> Optional[str]:
+        """返回图片的内容哈希，图片无法获取时返回 None（不使用搜索缓存）"""
+        image_cache = get_image_cache()
+        try:
+            if image_cache.get(image_url) is None:
+                image_cache.fetch(image_url)
+        except Exception as e:
+            print(f"获取图片内容失败，不使用搜索缓存: {str(e)}")
+            return None
+        return image_cache.hash_of(image_url)
+
     def download_image(self, url: str) -> bytes:
         """下载图片"""
         max_retries = 3
@@ -285,6 +779,11 @@ class Alibaba1688Searcher:
         
         print(f"\n开始处理图片: {url}")
         
+        image_cache = get_image_cache()
+        cached = image_cache.get(url)
+        if cached is not None:
+            return cached
+        
         for attempt in range(max_retries):
             try:
                 print(f"尝试下载图片 (第 {attempt+1}/{max_retries} 次)...")
@@ -292,6 +791,7 @@ class Alibaba1688Searcher:
                 
                 response = requests.get(url, timeout=10)
                 if response.status_code == 200:
+                    image_cache.put(url, response.content)
                     return response.content
                 else:
                     print(f"下载图片失败: HTTP {response.status_code}")
@@ -302,6 +802,7 @@ class Alibaba1688Searcher:
                         print(f"尝试替代URL: {alt_url}")
                         alt_response = requests.get(alt_url, timeout=10)
                         if alt_response.status_code == 200:
+                            image_cache.put(url, alt_response.content)
                             return alt_response.content
                 
                 if attempt < max_retries - 1:
@@ -323,7 +824,7 @@ class Alibaba1688Searcher:
         """上传图片到1688"""
         try:
             # 1. 确保已初始化
-            if not self.m_h5_tk or not self.headers:
+            if not self.headers or get_token_manager().current()[0] is None:
                 self._init_token_and_headers()
             
             # 2. 准备上传数据
@@ -339,52 +840,98 @@ class Alibaba1688Searcher:
                 "appKey": "pvvljh1grxcmaay2vgpe9nb68gg9ueg2"
             }
             
-            # 3. 计算签名
-            sign_content = f"{self.m_h5_tk}&{timestamp}&12574478&{json.dumps(data)}"
-            sign = hashlib.md5(sign_content.encode('utf-8')).hexdigest()
-            
-            # 4. 构建请求参数
-            params = {
-                'jsv': '2.6.1',
-                'appKey': '12574478',
-                't': timestamp,
-                'sign': sign,
-                'api': 'mtop.1688.imageService.putImage',
-                'v': '1.0',
-                'type': 'originaljson',
-                'dataType': 'jsonp',
-                'timeout': '20000',
-                'ignoreLogin': 'true',
-                'prefix': 'h5api',
-                'ecode': '0',
-                'jsonpIncPrefix': 'search1688'
-            }
-            
-            # 5. 发送请求
-            upload_url = f"{self.api_url}/mtop.1688.imageservice.putimage/1.0/?{urlencode(params)}"
-            
-            response = self.session.post(
-                upload_url,
-                data={'data': json.dumps(data)},
-                headers=self.headers
-            )
-
-            if response.status_code == 200:
-                try:
-                    result = response.json()
-                    if result.get("ret", [""])[0].startswith("SUCCESS"):
-                        return result
-                    else:
-                        raise Exception(f"上传失败: {result.get('ret', ['未知错误'])[0]}")
-                except json.JSONDecodeError:
-                    raise Exception("解析响应失败")
-            else:
-                raise Exception(f"请求失败: HTTP {response.status_code}")
+            # 3. 签名并发送请求
+            return self._mtop_post('mtop.1688.imageService.putImage', '1.0', data, timestamp)
 
         except Exception as e:
             print(f"\n上传图片时出错: {str(e)}")
             raise  # 向上传递错误
 
+    def _mtop_url(self, api: str, version: str, timestamp: str, sign: str) -> str:
+        params = {
+            'jsv': '2.6.1',
+            'appKey': MTOP_APP_KEY,
+            't': timestamp,
+            'sign': sign,
+            'api': api,
+            'v': version,
+            'type': 'originaljson',
+            'dataType': 'jsonp',
+            'timeout': '20000',
+            'ignoreLogin': 'true',
+            'prefix': 'h5api',
+            'ecode': '0',
+            'jsonpIncPrefix': 'search1688'
+        }
+        return f"{self.api_url}/{api.lower()}/{version}/?{urlencode(params)}"
+
+    def _take_token_cookies(self, response) -> List[tuple]:
+        """读取响应下发的 token cookie，并从会话中移除，保证请求只使用 TokenManager 中的 token"""
+        cookies = [(name, value) for name, value in response.cookies.items() if name in TOKEN_COOKIES]
+        for name in TOKEN_COOKIES:
+            remove_cookie_by_name(self.session.cookies, name)
+        return cookies
+
+    def _fetch_token_cookies(self) -> List[tuple]:
+        """发起一次不带 token 的接口请求，服务端会在响应中下发新的 token cookie"""
+        timestamp = str(int(time.time() * 1000))
+        url = self._mtop_url('mtop.1688.imageService.putImage', '1.0', timestamp, '')
+        response = self.session.post(url, data={'data': '{}'}, headers=self.headers, timeout=20)
+        return self._take_token_cookies(response)
+
+    def _mtop_post(self, api: str, version: str, data: dict, timestamp: Optional[str] = None) -> dict:
+        """
+        调用1688 mtop 接口：签名为 md5(token&时间戳&appKey&data)，失败时抛出异常
+        token 即将过期时先主动刷新；遇到 token 错误时用响应下发的新 token 重试一次
+        """
+        token_manager = get_token_manager()
+        # 参数只序列化一次，签名和请求体使用同一份数据；重试时也无需再次编码
+        data_json = json.dumps(data, separators=(',', ':'))
+        body = urlencode({'data': data_json})
+        for attempt in range(2):
+            if token_manager.needs_refresh():
+                token_manager.refresh(self._fetch_token_cookies, token_manager.version)
+            version_used = token_manager.version
+            token, cookies = token_manager.current()
+            
+            request_timestamp = timestamp if (timestamp and attempt == 0) else str(int(time.time() * 1000))
+            sign_content = f"{token}&{request_timestamp}&{MTOP_APP_KEY}&{data_json}"
+            sign = hashlib.md5(sign_content.encode('utf-8')).hexdigest()
+            url = self._mtop_url(api, version, request_timestamp, sign)
+            response = self.session.post(url, data=body, headers=self.headers, cookies=cookies)
+            refreshed = token_manager.update(self._take_token_cookies(response))
+            
+            if response.status_code != 200:
+                raise Exception(f"请求失败: HTTP {response.status_code}")
+            try:
+                result = response.json()
+            except ValueError:
+                raise Exception("解析响应失败")
+            ret = result.get("ret", [""])[0]
+            if ret.startswith("SUCCESS"):
+                return result
+            if is_token_error(ret) and attempt == 0:
+                token_manager.record_token_error()
+                print(f"1688 token 已失效（{ret}），刷新后重试")
+                if not refreshed:
+                    token_manager.refresh(self._fetch_token_cookies, version_used)
+                continue
+            raise Exception(f"接口调用失败: {ret or '未知错误'}")
+
+    def _search_offers_http(self, image_id: str) -> List[Dict]:
+        """不打开搜索页面，直接调用图片搜索数据接口获取商品列表"""
+        data = {
+            "appId": SEARCH_API_APP_ID,
+            "params": json.dumps({
+                "imageId": image_id,
+                "beginPage": 1,
+                "pageSize": self.target_offers,
+                "tab": "imageSearch"
+            })
+        }
+        result = self._mtop_post(SEARCH_API, SEARCH_API_VERSION, data)
+        return parse_offer_json(result, limit=self.target_offers)
+
     def search_similar_products(self, image_id: str) -> List[Dict]:
         """搜索相似商品"""
         try:
@@ -397,77 +944,68 @@ class Alibaba1688Searcher:
                 EC.presence_of_element_located((By.CLASS_NAME, "sm-offer"))
             )
             
-            # 解析搜索结果
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            products = []
-            
-            for offer in soup.select(".normalcommon-offer-card"):
-                try:
-                    # 提取商品链接
-                    link_elem = offer.select_one("a[href*='detail.1688.com']")
-                    if not link_elem:
-                        continue
-                    product_url = link_elem.get('href', '')
-                    
-                    # 提取商品图片
-                    img_div = offer.select_one(".img")
-                    if not img_div:
-                        continue
-                    style = img_div.get('style', '')
-                    image_url = ''
-                    if 'background-image' in style:
-                        image_url = style.split('url(')[1].split(')')[0].strip('"')
-                    
-                    # 提取商品标题
-                    title_elem = offer.select_one(".title")
-                    title = title_elem.text.strip() if title_elem else ''
-                    
-                    # 提取价格
-                    price_elem = offer.select_one(".price")
-                    price = price_elem.text.strip() if price_elem else ''
-                    
-                    products.append({
-                        'product_url': product_url,
-                        'image_url': image_url,
-                        'title': title,
-                        'price': price
-                    })
-                    
-                    if len(products) >= 10:  # 只取前10个结果
-                        break
-                        
-                except Exception as e:
-                    print(f"解析商品数据时出错: {str(e)}")
-                    continue
-            
-            return products
+            # 解析搜索结果（只取前10个）
+            return parse_offer_cards(self.driver.page_source, base_url=self.driver.current_url, limit=10)
             
         except Exception as e:
             print(f"搜索相似商品时出错: {str(e)}")
             return []
 
-    def search_by_image(self, image_url: str) -> List[Dict]:
-        """使用图片在1688上搜索"""
+    def search_by_image(self, image_url: str, latency: Optional[SearchLatency] = None,
+                        use_cache: bool = True) -> List[Dict]:
+        """使用图片在1688上搜索，latency 用于记录本次搜索的耗时；use_cache 为 False 时不使用缓存的商品列表，重新搜索并更新缓存"""
+        search_start = time.perf_counter()
+        wait_seconds = 0.0
+        upload = None
         try:
             print("\n=== 开始图片搜索流程 ===")
             print(f"1. 图片URL: {image_url}")
             
-            print("\n2. 准备上传图片...")
-            upload_result = self.upload_image(image_url)
-            print(f"上传结果: {json.dumps(upload_result, indent=2, ensure_ascii=False) if upload_result else 'None'}")
-            
-            if not upload_result:
-                print("× 图片上传失败，终止搜索")
-                raise Exception("图片上传失败")
-            
-            # 从data字段中获取imageId
-            image_id = upload_result.get("data", {}).get("imageId")
-            if not image_id:
-                print("× 未获取到imageId，终止搜索")
-                raise Exception("未获取到imageId")
+            # 按图片内容查找缓存的搜索结果，图片未变化的商品无需再次搜索
+            search_cache = get_search_cache()
+            digest = self._image_digest(image_url)
+            image_id = None
+            if digest:
+                cached_offers = search_cache.get_offers(digest) if use_cache else None
+                if cached_offers is not None:
+                    print(f"✓ 使用缓存的1688搜索结果，共 {len(cached_offers)} 个商品")
+                    self._record_latency(latency, image_url, search_start, 0.0, len(cached_offers), cached=True)
+                    return cached_offers
+                image_id = search_cache.get_image_id(digest)
+            
+            if image_id:
+                print(f"\n2. 使用缓存的imageId，跳过上传")
+            else:
+                print("\n2. 准备上传图片...")
+                upload_start = time.perf_counter()
+                self.last_upload = None
+                upload_result = self.upload_image(image_url)
+                upload = dict(self.last_upload or {}, ms=round((time.perf_counter() - upload_start) * 1000, 1))
+                print(f"上传结果: {json.dumps(upload_result, indent=2, ensure_ascii=False) if upload_result else 'None'}")
+                
+                if not upload_result:
+                    print("× 图片上传失败，终止搜索")
+                    raise Exception("图片上传失败")
+                
+                # 从data字段中获取imageId
+                image_id = upload_result.get("data", {}).get("imageId")
+                if not image_id:
+                    print("× 未获取到imageId，终止搜索")
+                    raise Exception("未获取到imageId")
+                if digest:
+                    search_cache.put_image_id(digest, image_id)
             
             print(f"\n3. 获取到imageId: {image_id}")
             
+            if self.search_mode == 'http':
+                print("\n4. 通过数据接口搜索...")
+                products = self._search_offers_http(image_id)
+                print(f"\n=== 搜索完成，共解析 {len(products)} 个商品 ===")
+                if products and digest:
+                    search_cache.put_offers(digest, products)
+                self._record_latency(latency, image_url, search_start, 0.0, len(products), upload=upload)
+                return products
+            
             print("\n4. 构建搜索URL...")
             search_url = (
                 f"https://s.1688.com/p4p/image/index.html?"
@@ -490,94 +1028,25 @@ class Alibaba1688Searcher:
             print(f"当前页面URL: {self.driver.current_url}")
             print(f"当前页面标题: {self.driver.title}")
             
-            print("\n6. 等待页面加载...")
-            max_retries = 5
-            offers = []
-            
-            for attempt in range(max_retries):
-                try:
-                    print(f"\n尝试 {attempt+1}/{max_retries} 次加载商品数据")
-                    time.sleep(3)
-                    
-                    print("- 滚动页面触发懒加载")
-                    self.driver.execute_script("window.scrollTo(0, 1000);")
-                    time.sleep(1)
-                    self.driver.execute_script("window.scrollTo(0, 2000);")
-                    time.sleep(1)
-                    
-                    print("- 查找商品元素")
-                    offers = self.driver.find_elements(By.CLASS_NAME, "normalcommon-offer-card")
-                    
-                    if offers and len(offers) > 0:
-                        print(f"✓ 成功找到 {len(offers)} 个商品元素")
-                        break
-                    else:
-                        print("× 未找到商品元素，准备重试")
-                
-                except Exception as e:
-                    print(f"× 加载失败: {str(e)}")
-                    if attempt == max_retries - 1:
-                        raise Exception("页面加载超时，未找到商品元素")
-                    time.sleep(2)
+            print("\n6. 等待商品加载...")
+            wait_start = time.perf_counter()
+            loaded = self._wait_for_offers()
+            wait_seconds = time.perf_counter() - wait_start
+            print(f"✓ {loaded} 个商品已加载，等待 {wait_seconds:.1f} 秒")
             
             print("\n7. 开始解析商品数据...")
-            products = []
-            
-            print(f"准备解析 {len(offers[:10])} 个商品")
-            for i, offer in enumerate(offers[:10], 1):
-                try:
-                    print(f"\n解析第 {i} 个商品:")
-                    
-                    # 找到所有链接，选择第一个包含详情页URL的链接
-                    links = offer.find_elements(By.TAG_NAME, "a")
-                    product_url = None
-                    for link in links:
-                        href = link.get_attribute('href')
-                        if href and ('detail.1688.com' in href or 'dj.1688.com' in href):
-                            product_url = href
-                            break
-                    
-                    if not product_url:
-                        print("× 未找到商品链接")
-                        continue
-                    print(f"  链接: {product_url}")
-                    
-                    print("- 获取商品图片")
-                    img_div = offer.find_element(By.CSS_SELECTOR, ".img-container .img")
-                    style = img_div.get_attribute('style')
-                    image_url = ''
-                    if 'url(' in style:
-                        match = re.search(r'url\(["\']?(.*?)["\']?\)', style)
-                        if match:
-                            image_url = match.group(1)
-                    print(f"  图片: {image_url}")
-                    
-                    print("- 获取标题和价格")
-                    title = offer.find_element(By.CSS_SELECTOR, ".mojar-element-title .title").text
-                    price = offer.find_element(By.CSS_SELECTOR, ".mojar-element-price .price").text
-                    print(f"  标题: {title}")
-                    print(f"  价格: {price}")
-                    
-                    if product_url and image_url and title:
-                        products.append({
-                            'title': title,
-                            'price': price,
-                            'product_url': product_url,
-                            'image_url': image_url
-                        })
-                        print("✓ 商品解析成功")
-                    else:
-                        print("× 商品数据不完整")
-                    
-                except Exception as e:
-                    print(f"× 解析商品数据时出错: {str(e)}")
-                    import traceback
-                    print(traceback.format_exc())
-                    continue
+            # 一次脚本调用取回所有卡片的 HTML，在本地解析，避免逐个元素调用浏览器
+            base_url, cards_html = self.driver.execute_script(_OFFER_CARDS_HTML_JS, self.target_offers)
+            products = parse_offer_cards(cards_html, base_url=base_url, limit=self.target_offers)
+            for i, product in enumerate(products, 1):
+                print(f"  {i}. {product['title']} | {product['price']} | {product['product_url']}")
             
             print(f"\n=== 搜索完成，共解析 {len(products)} 个商品 ===")
             if len(products) == 0:
                 print("警告：未成功解析任何商品！")
+            elif digest:
+                search_cache.put_offers(digest, products)
+            self._record_latency(latency, image_url, search_start, wait_seconds, len(products), upload=upload)
             return products
             
         except Exception as e:
@@ -586,81 +1055,123 @@ class Alibaba1688Searcher:
             import traceback
             print("\n详细错误信息:")
             print(traceback.format_exc())
+            self._record_latency(latency, image_url, search_start, wait_seconds, 0, upload=upload)
             return []
 
+    def _wait_for_offers(self) -> int:
+        """
+        等待商品卡片加载出图片，返回已加载的数量
+        每次检查时把第一个未加载的卡片滚动到可视区域触发懒加载；达到目标数量，
+        或所有卡片都已加载且数量在 SEARCH_SETTLE_SECONDS 内不再变化时结束等待
+        """
+        state = {'loaded': 0, 'changed_at': time.perf_counter()}
+        
+        def offers_ready(driver):
+            loaded, total = driver.execute_script(_LOADED_OFFERS_JS, self.target_offers)
+            now = time.perf_counter()
+            if loaded != state['loaded']:
+                state['loaded'] = loaded
+                state['changed_at'] = now
+            if loaded >= self.target_offers:
+                return loaded
+            if loaded and loaded == total and now - state['changed_at'] >= SEARCH_SETTLE_SECONDS:
+                return loaded
+            return False
+        
+        try:
+            return WebDriverWait(self.driver, self.page_timeout, poll_frequency=0.2).until(offers_ready)
+        except TimeoutException:
+            if state['loaded']:
+                print(f"等待超时，使用已加载的 {state['loaded']} 个商品")
+                return state['loaded']
+            raise Exception("页面加载超时，未找到商品元素")
+
+    def _record_latency(self, latency: Optional[SearchLatency], image_url: str, start: float,
+                        wait_seconds: float, offers: int, cached: bool = False, upload: Optional[Dict] = None):
+        if latency is not None:
+            latency.record(image_url, time.perf_counter() - start, wait_seconds, offers, cached, upload)
+
 class DataAnalyzer:
-    def __init__(self, data_dir: str = 'data'):
+    def __init__(self, data_dir: str = DATA_DIR, data_file: Optional[str] = None):
         """初始化数据分析器
         
         Args:
             data_dir: 数据文件目录，默认为 'data'
+            data_file: 要分析的数据文件，未指定时使用 data_dir 中最新的文件
         """
         self.data_dir = data_dir
-        self.image_dir = 'product_images'  # 添加图片目录
+        self.data_file = data_file
+        self.storage = get_storage()
+        self.image_dir = self.storage.area_dir(IMAGE_DIR)  # 添加图片目录
         os.makedirs(self.image_dir, exist_ok=True)
         self.image_matcher = ImageMatcher()
-        self.alibaba_searcher = Alibaba1688Searcher()
         
-    def _load_latest_data(self) -> List[Dict]:
-        """加载最新的数据文件"""
+    def _latest_data_file(self) -> str:
+        """返回 data_dir 中最新的数据文件路径"""
+        # 获取所有products开头的json文件（包括已被压缩的冷文件）
+        data_files = {
+            f.rsplit('.json', 1)[0] + '.json' for f in os.listdir(self.data_dir)
+            if f.startswith('products_') and '.json' in f
+        }
+        
+        if not data_files:
+            raise FileNotFoundError("没有找到数据文件")
+        
+        # 按文件名排序，获取最新的文件
+        return os.path.join(self.data_dir, max(data_files))
+    
+    def load_frame(self) -> ProductFrame:
+        """
+        加载数据文件并解析为 ProductFrame
+        同一文件（路径、修改时间和大小不变）在进程内只读取和解析一次
+        """
         try:
-            # 获取所有products开头的json文件
-            data_files = [
-                f for f in os.listdir(self.data_dir) 
-                if f.startswith('products_') and f.endswith('.json')
-            ]
-            
-            if not data_files:
-                raise FileNotFoundError("没有找到数据文件")
-            
-            # 按文件名排序，获取最新的文件
-            latest_file = max(data_files)
-            file_path = os.path.join(self.data_dir, latest_file)
-            
-            print(f"加载数据文件: {latest_file}")
-            
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                print(f"成功加载 {len(data)} 条商品数据")
-                return data
+            file_path = self.data_file or self._latest_data_file()
+            actual_path = self.storage.resolve(file_path)
+            if actual_path is None:
+                raise FileNotFoundError(f"数据文件不存在: {file_path}")
+            
+            stat = os.stat(actual_path)
+            cache_key = (os.path.abspath(file_path), stat.st_mtime, stat.st_size)
+            with _frame_cache_lock:
+                frame = _frame_cache.get(cache_key)
+                if frame is not None:
+                    _frame_cache.move_to_end(cache_key)
+                    print(f"使用已解析的数据文件: {file_path}（{len(frame)} 条商品数据）")
+                    return frame
+            
+            print(f"加载数据文件: {file_path}")
+            products = self.storage.read_json(file_path)
+            print(f"成功加载 {len(products)} 条商品数据")
+            frame = self._build_frame(products)
+            
+            with _frame_cache_lock:
+                _frame_cache[cache_key] = frame
+                while len(_frame_cache) > _FRAME_CACHE_SIZE:
+                    _frame_cache.popitem(last=False)
+            return frame
             
         except Exception as e:
             print(f"加载数据文件时出错: {str(e)}")
             raise
     
-    def _convert_price(self, price_str: str) -> float:
-        """将价格字符串转换为数字"""
-        if not price_str or price_str == 'N/A':
-            return 0.0
-        # 提取数字部分（去掉RM前缀）
-        match = re.search(r'RM([\d.]+)', price_str)
-        if match:
-            return float(match.group(1))
-        return 0.0
-    
-    def _convert_count(self, count_str: str) -> float:
-        """将数量字符串（如 "1.5K", "2.3M"）转换为数字"""
-        if not count_str or count_str == 'N/A':
-            return 0.0
-            
-        multipliers = {'K': 1000, 'M': 1000000}
-        match = re.search(r'([\d.]+)([KM])?', count_str)
-        if match:
-            number = float(match.group(1))
-            unit = match.group(2)
-            if unit and unit in multipliers:
-                number *= multipliers[unit]
-            return number
-        return 0.0
+    def _build_frame(self, products: List[Dict]) -> ProductFrame:
+        """读取商品指标的数值列，解析规则见 metrics 模块"""
+        return ProductFrame(
+            products,
+            _metric_column(products, 'avg_price', parse_price),
+            _metric_column(products, 'total_sale_nd_cnt', parse_count),
+            _metric_column(products, 'influencers_count', parse_count)
+        )
     
     def _download_image(self, url: str, product_id: str) -> str:
         """下载商品图片并返回本地路径，添加超时处理"""
         try:
-            response = requests.get(url, timeout=10)  # 添加10秒超时
-            if response.status_code == 200:
+            content = get_image_cache().fetch(url)  # 默认10秒超时
+            if content:
                 image_path = os.path.join(self.image_dir, f"{product_id}.jpg")
                 with open(image_path, 'wb') as f:
-                    f.write(response.content)
+                    f.write(content)
                 return image_path
         except requests.exceptions.Timeout:
             print(f"\n下载超时: {url}")
@@ -672,7 +1183,8 @@ class DataAnalyzer:
                         price_range: tuple = (20, 50),    # 价格范围
                         sales_weight: float = 0.6,        # 销量得分权重
                         influencer_weight: float = 0.4,   # 达人数量得分权重
-                        top_n: int = 50                   # 返回前N个结果
+                        top_n: int = 50,                  # 返回前N个结果
+                        reports: Iterable[str] = ()       # 需要生成的附加报告，见 strategies.SIDE_REPORTS
                         ) -> List[Dict]:
         """
         分析商品数据，使用排名评分系统
@@ -682,75 +1194,114 @@ class DataAnalyzer:
         2. 对7天销量进行排名评分（由高到低）
         3. 对达人数量进行排名评分（由低到高）
         4. 计算加权总分并排序
+        
+        默认只评分，不生成任何报告；需要报告时指定 reports，或之后调用 generate_reports
         """
-        products = self._load_latest_data()
-        valid_products = []
-        skipped_count = 0
+        reports = resolve_reports(reports)
+        frame = self.load_frame()
+        # 报告需要前50个商品
+        results = self._score_frame(frame, price_range, sales_weight,
+                                    influencer_weight, max(top_n, 50) if reports else top_n)
+        if not results:
+            return []
         
-        # 第一步：筛选价格范围内的有效商品
-        for product in products:
-            try:
-                price = self._convert_price(product.get('avg_price', 'N/A'))
-                sales = self._convert_count(product.get('total_sale_nd_cnt', 'N/A'))
-                influencers = self._convert_count(product.get('influencers_count', 'N/A'))
-                
-                # 只保留价格范围内且数据有效的商品
-                if (price_range[0] <= price <= price_range[1] and 
-                    sales > 0 and influencers > 0):
-                    valid_products.append({
-                        'product': product,
-                        'price': price,
-                        'sales': sales,
-                        'influencers': influencers
-                    })
-                else:
-                    skipped_count += 1
-                
-            except Exception as e:
-                print(f"处理商品数据时出错: {str(e)}")
-                skipped_count += 1
-                continue
+        if reports:
+            self.generate_reports(results, reports, price_range, sales_weight, influencer_weight)
         
-        if not valid_products:
-            print("\n警告: 没有找到有效的商品数据！")
-            return []
+        return results[:top_n]
+
+    def generate_reports(self, results: List[Dict], reports: Iterable[str],
+                         price_range: tuple = (20, 50),
+                         sales_weight: float = 0.6,
+                         influencer_weight: float = 0.4) -> Dict[str, str]:
+        """
+        为评分结果生成附加报告，返回报告名到文件路径的映射
+        商品图片从图片缓存和缩略图缓存读取，已下载过的封面不会再次下载
+        """
+        files = {}
+        for name in resolve_reports(reports):
+            if name == 'top50_excel':
+                path = self._generate_excel_report(results, price_range, sales_weight, influencer_weight)
+            else:
+                path = self._generate_txt_report(results)
+            if path:
+                files[name] = path
+        return files
+
+    def score_products(self, products: List[Dict],
+                       price_range: tuple = (20, 50),
+                       sales_weight: float = 0.6,
+                       influencer_weight: float = 0.4,
+                       top_n: int = 50) -> List[Dict]:
+        """对给定的商品列表评分，返回得分最高的 top_n 个商品（按总分从高到低）"""
+        return self._score_frame(self._build_frame(products), price_range,
+                                 sales_weight, influencer_weight, top_n)
+
+    def score_strategies(self, strategies: Optional[Dict[str, Dict]] = None) -> Dict[str, List[Dict]]:
+        """
+        用同一份已解析的数据计算多个策略的结果
         
-        total_products = len(valid_products)
-        score_step = 100 / total_products  # 计算分数间隔
+        Args:
+            strategies: 策略名到参数的映射，缺省计算 strategies.STRATEGIES 中的全部策略
+        """
+        frame = self.load_frame()
+        return {
+            name: self._score_frame(frame, **params)
+            for name, params in (strategies or STRATEGIES).items()
+        }
+
+    def _score_frame(self, frame: ProductFrame,
+                     price_range: tuple = (20, 50),
+                     sales_weight: float = 0.6,
+                     influencer_weight: float = 0.4,
+                     top_n: int = 50) -> List[Dict]:
+        """
+        向量化的排名评分，返回得分最高的 top_n 个商品（按总分从高到低）
         
-        # 第二步：按7天销量排序并评分（由高到低）
-        valid_products.sort(key=lambda x: x['sales'], reverse=True)
-        for i, product in enumerate(valid_products):
-            product['sales_score'] = 100 - (i * score_step)  # 最高100分
+        排名由 frame 按价格范围缓存，用 NumPy 计算加权总分，
+        再用 argpartition 选出前 top_n 个，只为入选商品构建结果字典
+        """
+        # 第一步至第三步：筛选价格范围内的有效商品，销量由高到低、达人数量由低到高排名评分
+        valid_idx, sales_score, sales_rank, influencer_score, influencer_rank = frame.ranks(price_range)
+        products = frame.products
+        total_products = len(valid_idx)
+        skipped_count = len(products) - total_products
         
-        # 第三步：按达人数量排序并评分（由低到高）
-        valid_products.sort(key=lambda x: x['influencers'])
-        for i, product in enumerate(valid_products):
-            product['influencer_score'] = 100 - (i * score_step)  # 最低数量得最高分
+        if total_products == 0:
+            print("\n警告: 没有找到有效的商品数据！")
+            return []
+        
+        # 第四步：计算加权总分，选出前 top_n 个
+        final_score = np.round(sales_score * sales_weight + influencer_score * influencer_weight, 2)
+        k = min(top_n, total_products)
+        if k < total_products:
+            # argpartition 找到第 k 名的分数，分数相同的商品一起参与排序，保证结果确定
+            kth = np.argpartition(-final_score, k - 1)[:k]
+            candidates = np.flatnonzero(final_score >= final_score[kth].min())
+        else:
+            candidates = np.arange(total_products)
+        # 总分相同时依次按达人排名、销量排名、原始顺序排序
+        order = np.lexsort((candidates, sales_rank[candidates],
+                            influencer_rank[candidates], -final_score[candidates]))
+        selected = candidates[order][:k]
         
-        # 第四步：计算加权总分
         results = []
-        for product_data in valid_products:
-            final_score = (product_data['sales_score'] * sales_weight + 
-                          product_data['influencer_score'] * influencer_weight)
-            
+        for i in selected:
+            product = products[valid_idx[i]]
             results.append({
-                'product_id': product_data['product'].get('product_id'),
-                'product_name': product_data['product'].get('product_name'),
-                'avg_price': product_data['product'].get('avg_price'),
-                'total_sale_nd_cnt': product_data['product'].get('total_sale_nd_cnt'),
-                'influencers_count': product_data['product'].get('influencers_count'),
-                'product_rating': product_data['product'].get('product_rating'),
-                'category': product_data['product'].get('category'),
-                'sales_score': round(product_data['sales_score'], 2),
-                'influencer_score': round(product_data['influencer_score'], 2),
-                'final_score': round(final_score, 2),
-                'cover_url': product_data['product'].get('cover_url'),  # 添加封面图URL
+                'product_id': product.get('product_id'),
+                'product_name': product.get('product_name'),
+                'avg_price': product.get('avg_price'),
+                'total_sale_nd_cnt': product.get('total_sale_nd_cnt'),
+                'influencers_count': product.get('influencers_count'),
+                'product_rating': product.get('product_rating'),
+                'category': product.get('category'),
+                'sales_score': round(float(sales_score[i]), 2),
+                'influencer_score': round(float(influencer_score[i]), 2),
+                'final_score': float(final_score[i]),
+                'cover_url': product.get('cover_url'),  # 添加封面图URL
             })
         
-        # 按总分排序
-        results.sort(key=lambda x: x['final_score'], reverse=True)
-        
         # 打印统计信息
         print(f"\n数据分析统计:")
         print(f"总商品数: {len(products)}")
@@ -760,61 +1311,50 @@ class DataAnalyzer:
         print(f"销量得分权重: {sales_weight * 100}%")
         print(f"达人数量得分权重: {influencer_weight * 100}%")
         
-        # 在返回结果之前，生成Excel报告
-        self._generate_excel_report(results, price_range, sales_weight, influencer_weight)
-        self._generate_txt_report(results)  # 添加生成TXT报告
-        
-        return results[:top_n]
+        return results
 
     def _generate_excel_report(self, results: List[Dict], price_range: tuple, 
                               sales_weight: float, influencer_weight: float):
         """
-        使用 openpyxl 生成Excel报告，确保图片正确嵌入单元格
+        使用流式写入的 ReportWriter 生成Excel报告，图片缩放铺满图片列的单元格
         """
-        try:
-            from PIL import Image as PILImage  # 确保 Pillow 已安装
-        except ImportError:
-            print("错误: 请先安装 Pillow 库: pip install Pillow")
-            return
-
         # 只取前50条数据
         top_50_results = results[:50]
-        
-        # 创建工作簿和工作表
-        wb = Workbook()
-        ws = wb.active
-        ws.title = 'TOP 50分析结果'
+        # 后台并发下载所有封面图，下面逐行插入时直接读取缓存
+        get_image_cache().prefetch(product['cover_url'] for product in top_50_results)
         
         # 设置列标题
         headers = [
             '商品名称', '类别', '价格', '7天销量', '达人数量',
             '商品评分', '销量得分', '达人得分', '最终得分', '商品图片'
         ]
+        # 设置列宽：商品名称、类别、价格、7天销量、达人数量、其他列、图片列
+        column_widths = {1: 30, 2: 12, 3: 10, 4: 12, 5: 12, 10: 25}
+        column_widths.update({col: 10 for col in range(6, 10)})
+        thin = Side(style='thin')
         
-        # 写入标题行
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col)
-            cell.value = header
-            cell.font = cell.font.copy(bold=True)
-            cell.fill = PatternFill(start_color="D7E4BC", end_color="D7E4BC", fill_type="solid")
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # 设置列宽
-        ws.column_dimensions['A'].width = 30  # 商品名称
-        ws.column_dimensions['B'].width = 12  # 类别
-        ws.column_dimensions['C'].width = 10  # 价格
-        ws.column_dimensions['D'].width = 12  # 7天销量
-        ws.column_dimensions['E'].width = 12  # 达人数量
-        for col in range(6, 10):
-            ws.column_dimensions[get_column_letter(col)].width = 10  # 其他列
-        ws.column_dimensions['J'].width = 25  # 图片列
+        # 流式写入报告，图片引用磁盘上的缩略图文件，保存时才读入
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        excel_file = self.storage.path(REPORTS_DIR, f'top50_analysis_{timestamp}.xlsx')
+        sheet = 'TOP 50分析结果'
+        report = ReportWriter(
+            excel_file,
+            {sheet: headers},
+            column_widths=column_widths,
+            header_style={
+                'font': Font(bold=True),
+                'fill': PatternFill(start_color="D7E4BC", end_color="D7E4BC", fill_type="solid"),
+                'alignment': Alignment(horizontal='center', vertical='center')
+            },
+            cell_style={
+                'alignment': Alignment(horizontal='center', vertical='center', wrap_text=True),
+                'border': Border(left=thin, right=thin, top=thin, bottom=thin)
+            },
+            fit_images=True
+        )
         
         # 写入数据并插入图片
-        for row_idx, product in enumerate(top_50_results, 2):
-            # 设置行高
-            ws.row_dimensions[row_idx].height = 150
-            
-            # 写入数据
+        for index, product in enumerate(top_50_results, 1):
             data = [
                 product['product_name'],
                 product['category'],
@@ -827,95 +1367,38 @@ class DataAnalyzer:
                 f"{product['final_score']:.2f}"
             ]
             
-            for col_idx, value in enumerate(data, 1):
-                cell = ws.cell(row=row_idx, column=col_idx)
-                cell.value = value
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                cell.border = Border(
-                    left=Side(style='thin'),
-                    right=Side(style='thin'),
-                    top=Side(style='thin'),
-                    bottom=Side(style='thin')
-                )
-            
-            # 下载并插入图片
+            # 使用缓存的 180x200 缩略图文件，每张图片只缩放一次
+            image_path = None
             image_url = product['cover_url']
             if image_url:
-                print(f"正在处理第 {row_idx-1}/50 张图片: {image_url}")
-                try:
-                    response = requests.get(image_url, timeout=10)
-                    if response.status_code == 200:
-                        image_bytes = BytesIO()
-                        image_bytes.write(response.content)
-                        
-                        # 使用 PIL 处理图片
-                        pil_image = PILImage.open(image_bytes)
-                        
-                        # 调整图片大小
-                        target_width = 180
-                        target_height = 200
-                        pil_image.thumbnail((target_width, target_height), PILImage.LANCZOS)
-                        
-                        # 保存处理后的图片
-                        output_bytes = BytesIO()
-                        pil_image.save(output_bytes, format='PNG')
-                        output_bytes.seek(0)
-                        
-                        # 创建 openpyxl 图片对象
-                        img = Image(output_bytes)
-                        
-                        # 创建图片锚点
-                        from_marker = AnchorMarker(
-                            col=9,  # J列（图片列）
-                            colOff=50000,
-                            row=row_idx-1,
-                            rowOff=50000
-                        )
-                        
-                        to_marker = AnchorMarker(
-                            col=10,
-                            colOff=-50000,
-                            row=row_idx,
-                            rowOff=-50000
-                        )
-                        
-                        img.anchor = TwoCellAnchor('twoCell', from_marker, to_marker)
-                        ws.add_image(img)
-                        print(f"✓ 图片 {row_idx-1} 处理成功")
-                        
-                    else:
-                        print(f"× 下载图片失败: HTTP {response.status_code}")
-                        
-                except requests.exceptions.Timeout:
-                    print(f"× 下载超时: {image_url}")
-                except Exception as e:
-                    print(f"× 处理图片时出错: {str(e)}")
-                    import traceback
-                    print(traceback.format_exc())
-        
-        # 冻结标题行
-        ws.freeze_panes = 'A2'
+                print(f"正在处理第 {index}/{len(top_50_results)} 张图片: {image_url}")
+                image_path = get_thumbnail_store().path(image_url, REPORT_SIZE)
+                if image_path:
+                    print(f"✓ 图片 {index} 处理成功")
+                else:
+                    print(f"× 获取图片失败: {image_url}")
+            
+            report.add_row(sheet, data, images={10: image_path}, height=150)
         
         # 添加筛选条件说明
-        info_row = len(top_50_results) + 3
-        ws.cell(row=info_row, column=1, value='筛选条件:').font = Font(bold=True)
-        ws.cell(row=info_row+1, column=1, value=f'价格范围: RM{price_range[0]}-{price_range[1]}')
-        ws.cell(row=info_row+2, column=1, value=f'销量得分权重: {sales_weight * 100}%')
-        ws.cell(row=info_row+3, column=1, value=f'达人得分权重: {influencer_weight * 100}%')
+        report.add_row(sheet, [], styled=False)
+        report.add_row(sheet, ['筛选条件:'], styled=False)
+        report.add_row(sheet, [f'价格范围: RM{price_range[0]}-{price_range[1]}'], styled=False)
+        report.add_row(sheet, [f'销量得分权重: {sales_weight * 100}%'], styled=False)
+        report.add_row(sheet, [f'达人得分权重: {influencer_weight * 100}%'], styled=False)
         
         # 保存文件
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        excel_file = f'top50_analysis_{timestamp}.xlsx'
-        wb.save(excel_file)
+        files = report.close()
         
-        print(f"\nTOP 50分析报告已生成: {excel_file}")
+        print(f"\nTOP 50分析报告已生成: {', '.join(files)}")
+        return files[0]
 
-    def _generate_txt_report(self, results: List[Dict]):
+    def _generate_txt_report(self, results: List[Dict]) -> str:
         """
         生成TXT格式的简要报告，包含前50个商品的基本信息
         """
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        txt_file = f'top50_brief_{timestamp}.txt'
+        txt_file = self.storage.path(REPORTS_DIR, f'top50_brief_{timestamp}.txt')
         
         with open(txt_file, 'w', encoding='utf-8') as f:
             for i, product in enumerate(results[:50], 1):
@@ -924,102 +1407,51 @@ class DataAnalyzer:
                        f"{product['influencers_count']}\n")
         
         print(f"\n简要报告已生成: {txt_file}")
+        return txt_file
 
     def _generate_excel_report_with_1688(self, results: List[Dict], 
                                        price_range: tuple,
                                        sales_weight: float,
                                        influencer_weight: float,
-                                       method: int = 1):
+                                       method: int = 1) -> str:
         """
         生成包含1688匹配结果的Excel报告
-        method: 1 表示方案一，2 表示方案二
+        method: 1 表示方案一（保留所有商品），2 表示方案二（只保留两个以上高相似度结果的商品）
         """
-        # ... Excel初始化代码 ...
-
-        # 初始化1688搜索
-        self.alibaba_searcher.init_browser()
-
-        filtered_results = []
-        for product in results[:50]:
-            shopee_image_url = product['cover_url']
-            
-            # 搜索1688商品
-            alibaba_products = self.alibaba_searcher.search_by_image(shopee_image_url)
-            
-            if method == 1:
-                # 方案一：保留所有商品，直接添加1688搜索结果
-                product['alibaba_matches'] = alibaba_products[:3]  # 保存前3个结果
-                filtered_results.append(product)
-                
-            else:
-                # 方案二：检查图片相似度
-                similar_products = []
-                for alibaba_product in alibaba_products[:10]:
-                    similarity = self.image_matcher.compare_images(
-                        shopee_image_url, 
-                        alibaba_product['image_url']
-                    )
-                    if similarity >= self.image_matcher.similarity_threshold:
-                        similar_products.append({
-                            **alibaba_product,
-                            'similarity': similarity
-                        })
-                
-                # 如果有两个以上高相似度的商品，保留这个商品
-                if len(similar_products) >= 2:
-                    product['alibaba_matches'] = similar_products
-                    filtered_results.append(product)
-
-        # 生成Excel报告
-        wb = Workbook()
-        ws = wb.active
-        
-        # 添加1688相关的列
-        headers.extend(['1688商品1', '1688链接1', '1688商品2', '1688链接2', '1688商品3', '1688链接3'])
+        top_50_results = results[:50]
+        get_image_cache().prefetch(product['cover_url'] for product in top_50_results)
         
-        # ... 写入数据 ...
-        for row_idx, product in enumerate(filtered_results, 2):
-            # ... 原有数据写入代码 ...
-            
-            # 写入1688匹配结果
-            for i, match in enumerate(product.get('alibaba_matches', [])[:3], 1):
-                img_col = len(headers) - 6 + (i-1)*2
-                link_col = img_col + 1
-                
-                # 插入1688商品图片
-                self._insert_image_to_cell(ws, row_idx, img_col, match['image_url'])
-                
-                # 插入1688商品链接
-                ws.cell(row_idx, link_col, match['product_url'])
-
-        # 保存文件
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        excel_file = f'top50_analysis_with_1688_{timestamp}.xlsx'
-        wb.save(excel_file)
+        excel_file = self.storage.path(REPORTS_DIR, f'top50_analysis_with_1688_{timestamp}.xlsx')
+        report = create_match_report(excel_file, sheets=(SCHEME1_SHEET if method == 1 else SCHEME2_SHEET,),
+                                     only_valid=True)
         
+        # 初始化1688搜索
+        self.image_matcher.init_browser()
+        try:
+            _match_products(
+                top_50_results,
+                lambda index: self.image_matcher.search_1688_by_image(top_50_results[index]['cover_url']),
+                self.image_matcher,
+                report
+            )
+        finally:
+            self.image_matcher.close_browser()
+        
+        excel_file = report.close()[0]
         print(f"\nTOP 50分析报告（含1688匹配）已生成: {excel_file}")
+        return excel_file
 
 def _insert_image_to_cell(ws, row, col, image_url):
     """在指定单元格中插入图片"""
     try:
-        # 下载图片
-        response = requests.get(image_url)
-        img_data = BytesIO(response.content)
-        
-        # 创建PIL图像对象
-        pil_img = PILImage.open(img_data)
-        
-        # 调整图片大小
-        max_width, max_height = 120, 120
-        pil_img.thumbnail((max_width, max_height), PILImage.LANCZOS)
-        
-        # 保存调整后的图片到内存
-        img_byte_arr = BytesIO()
-        pil_img.save(img_byte_arr, format=pil_img.format or 'PNG')
-        img_byte_arr.seek(0)
+        # 读取 120x120 缩略图（同一图片只下载和缩放一次，所有工作表共用）
+        content = get_thumbnail_store().get(image_url, CELL_SIZE)
+        if not content:
+            raise ValueError(f"无法获取图片: {image_url}")
         
         # 创建openpyxl图片对象
-        img = Image(img_byte_arr)
+        img = Image(BytesIO(content))
         
         # 设置图片位置
         img.anchor = f'{get_column_letter(col)}{row}'
@@ -1035,6 +1467,62 @@ def _insert_image_to_cell(ws, row, col, image_url):
         print(f"插入图片时出错: {str(e)}")
         ws.cell(row, col, "图片加载失败")
 
+def _match_products(products: List[Dict], get_offers: Callable[[int], List[Dict]], matcher: 'ImageMatcher',
+                    report: MatchReportBuilder, journal: Optional[AnalysisJournal] = None,
+                    records: Optional[Dict[int, Dict]] = None):
+    """
+    匹配阶段：按顺序读取每个商品的1688搜索结果（get_offers 按商品序号返回），
+    生成 ProductMatch 后交给报告的所有渲染器；无搜索结果或出错的商品跳过
+    records 为可直接沿用的匹配结果（商品序号到检查点记录），这些商品不调用 get_offers；
+    传入检查点日志时，沿用和新完成的商品都追加到日志（日志中已有的除外）
+    """
+    image_cache = get_image_cache()
+    records = records or {}
+    for index, product in enumerate(products):
+        print(f"\n{'='*50}")
+        print(f"处理第 {index + 1}/{len(products)} 个商品: {product['product_name']}")
+        print(f"商品URL: {product['cover_url']}")
+        try:
+            if index in records:
+                match = ProductMatch.from_record(product, records[index])
+                report.add(match)
+                if journal and journal.lookup(product) is None:
+                    journal.append(match.to_record())
+                print(f"✓ 沿用已有的匹配结果")
+                continue
+            
+            offers = get_offers(index)
+            if not offers:
+                print(f"× 未找到匹配商品，跳过")
+                continue
+            
+            print(f"✓ 找到 {len(offers)} 个匹配商品")
+            # 提前并发下载候选图片（方案一插图、方案二比较）
+            image_cache.prefetch(offer['image_url'] for offer in offers[:SCHEME2_CANDIDATES])
+            # 记录封面图内容哈希（搜索时已下载），供下次增量分析比较
+            if not product.get('cover_hash'):
+                product['cover_hash'] = image_cache.hash_of(product['cover_url'])
+            match = match_product(product, offers, matcher)
+            report.add(match)
+            if journal:
+                journal.append(match.to_record())
+            print(f"\n当前进度: {index + 1}/{len(products)} 完成")
+            
+        except Exception as e:
+            print(f"× 处理商品时出错: {str(e)}")
+            print("跳过当前商品，继续处理下一个")
+
+
+def _cover_hashes(products: List[Dict]):
+    """等待封面下载完成，为每个商品记录封面图内容哈希（cover_hash），无法获取的为 None"""
+    image_cache = get_image_cache()
+    for product in products:
+        try:
+            image_cache.fetch(product['cover_url'])
+        except Exception as e:
+            print(f"获取封面图失败 {product['cover_url']}: {str(e)}")
+        product['cover_hash'] = image_cache.hash_of(product['cover_url'])
+
 def test_single_product():
     """测试单个商品的1688识图功能"""
     test_product = {
@@ -1204,7 +1692,7 @@ def test_single_product():
         
         # 保存Excel文件
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        excel_file = f'test_results_{timestamp}.xlsx'
+        excel_file = get_storage().path(REPORTS_DIR, f'test_results_{timestamp}.xlsx')
         wb.save(excel_file)
         print(f"\nExcel报告已生成: {excel_file}")
         
@@ -1227,7 +1715,8 @@ def main():
             price_range=(10, 1000),
             sales_weight=0.6,
             influencer_weight=0.4,
-            top_n=50
+            top_n=50,
+            reports=SIDE_REPORTS  # 命令行运行时同时生成TOP50的Excel和TXT报告
         )
         
         if not top50_results:
@@ -1239,135 +1728,75 @@ def main():
         # 3. 初始化匹配器并开始1688匹配
         print(f"\n2. 开始1688商品匹配...")
         matcher = ImageMatcher()
-        
+        # 后台并发下载所有商品封面，供上传搜索和相似度比较使用
+        image_cache = get_image_cache()
+        image_cache.prefetch(product['cover_url'] for product in top50_results)
+        
+        search_latency = SearchLatency()
+        # 从进程内常驻的浏览器服务租用已就绪的浏览器，分析结束后归还而不关闭
+        browser_service = get_browser_service(Alibaba1688Searcher)
+        pool = BrowserPool(browser_service)
         try:
-            matcher.init_browser()
+            pool.start()
+            # 所有商品的1688搜索提交到浏览器池并行执行，下面按原顺序读取结果
+            search_futures = pool.submit_all(
+                lambda searcher, product: searcher.search_by_image(product['cover_url'], latency=search_latency),
+                top50_results
+            )
             
-            # 4. 创建Excel工作簿
-            wb = Workbook()
-            ws1 = wb.active
-            ws1.title = "方案一结果"
-            ws2 = wb.create_sheet("方案二结果")
+            # 4. 创建Excel报告，每个商品处理完即流式写入
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            excel_file = get_storage().path(REPORTS_DIR, f'top50_analysis_{timestamp}.xlsx')
+            report = create_match_report(excel_file)
             
             # 5. 处理每个TOP50商品
-            valid_products = []  # 存储方案二的有效商品
-            processed_count = 0  # 记录成功处理的商品数
-            
-            for row, product in enumerate(top50_results, 2):
-                try:
-                    print(f"\n{'='*50}")
-                    print(f"处理第 {row-1}/{len(top50_results)} 个商品: {product['product_name']}")
-                    print(f"商品URL: {product['cover_url']}")
-                    
-                    # 搜索1688商品
-                    try:
-                        results = matcher.search_1688_by_image(product['cover_url'])
-                        if not results:
-                            print(f"× 未找到匹配商品，跳过")
-                            continue
-                            
-                        print(f"✓ 找到 {len(results)} 个匹配商品")
-                        processed_count += 1
-                        
-                        # 写入基础数据（两个表都写入）
-                        for ws in [ws1, ws2]:
-                            ws.cell(row, 1, product['product_id'])
-                            ws.cell(row, 2, product['product_name'])
-                            ws.cell(row, 3, product.get('category', ''))
-                            ws.cell(row, 4, product.get('avg_price', ''))
-                            ws.cell(row, 5, product.get('total_sale_nd_cnt', ''))
-                            ws.cell(row, 6, product.get('influencers_count', ''))
-                            ws.cell(row, 7, product.get('product_rating', ''))
-                            
-                            # 插入商品原图
-                            _insert_image_to_cell(ws, row, 8, product['cover_url'])
-                        
-                        # 方案一：写入前3个结果
-                        scheme1_results = results[:3]
-                        for i, result in enumerate(scheme1_results, 1):
-                            img_col = 8 + i*2 - 1
-                            link_col = img_col + 1
-                            _insert_image_to_cell(ws1, row, img_col, result['image_url'])
-                            ws1.cell(row, link_col, result['product_url'])
-                        
-                        # 方案二：计算相似度
-                        similar_products = []
-                        for result in results[:10]:
-                            similarity = matcher.compare_images(
-                                product['cover_url'],
-                                result['image_url']
-                            )
-                            if similarity >= matcher.similarity_threshold:
-                                similar_products.append({**result, 'similarity': similarity})
-                        
-                        # 如果有两个以上高相似度商品，写入方案二表格
-                        if len(similar_products) >= 2:
-                            similar_products.sort(key=lambda x: x['similarity'], reverse=True)
-                            for i, result in enumerate(similar_products[:3], 1):
-                                img_col = 8 + i*2 - 1
-                                link_col = img_col + 1
-                                _insert_image_to_cell(ws2, row, img_col, result['image_url'])
-                                ws2.cell(row, link_col, 
-                                    f"相似度: {result['similarity']:.4f}\n"
-                                    f"链接: {result['product_url']}")
-                            valid_products.append(product)
-                        
-                        # 每处理完一个商品，打印进度
-                        print(f"\n当前进度: {row-1}/{len(top50_results)} 完成")
-                        
-                        # 每处理完一个商品暂停一下，避免请求过快
-                        time.sleep(2)
-                        
-                    except Exception as e:
-                        print(f"× 搜索商品时出错: {str(e)}")
-                        print("跳过当前商品，继续处理下一个")
-                        continue
-                    
-                except Exception as e:
-                    print(f"× 处理商品时出错: {str(e)}")
-                    print("继续处理下一个商品")
-                    continue
+            _match_products(top50_results, lambda index: search_futures[index].result(), matcher, report)
             
-            # 6. 保存最终Excel文件
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            excel_file = f'top50_analysis_{timestamp}.xlsx'
-            wb.save(excel_file)
+            # 6. 保存最终Excel文件（行数过多时拆分为多个文件）
+            excel_file = report.close()[0]
             
             print(f"\n分析完成！")
-            print(f"共处理 {processed_count}/{len(top50_results)} 个商品")
+            print(f"共处理 {report.processed}/{len(top50_results)} 个商品")
             print(f"方案一：保存了所有处理成功的商品匹配结果")
-            print(f"方案二：找到 {len(valid_products)} 个有效商品")
+            print(f"方案二：找到 {report.scheme2_valid} 个有效商品")
             print(f"Excel报告已生成: {excel_file}")
             
             return excel_file
             
         finally:
-            matcher.close_browser()
+            pool.close()
             
     except Exception as e:
         print(f"\n处理过程中出现错误: {str(e)}")
         import traceback
         print(traceback.format_exc())
 
-def analyze_product_data(data_file: str, strategy: str = 'all') -> tuple:
-    """分析商品数据并生成报告"""
+def analyze_product_data(data_file: str, strategy: str = 'all', reports: Iterable[str] = (),
+                         journal_file: Optional[str] = None, previous_file: Optional[str] = None,
+                         use_search_cache: bool = True) -> tuple:
+    """
+    分析商品数据并生成报告，reports 为需要额外生成的附加报告（见 strategies.SIDE_REPORTS）
+    journal_file 为检查点日志路径（见 analysis_journal.journal_path）：每个商品匹配完成后写入日志，
+    中断后再次分析时跳过日志中已完成的商品，分析成功后删除日志
+    previous_file 为同一任务上次的分析结果 JSON：商品ID和封面图都未变的商品沿用上次的匹配结果，
+    只搜索新上榜或换了封面图的商品
+    use_search_cache 为 False 时（非增量的重新分析）不使用1688搜索结果缓存，所有需要搜索的商品都重新搜索
+    """
     try:
         print(f"\n=== 开始分析商品数据 ===")
         print(f"数据文件: {data_file}")
         print(f"分析策略: {strategy}")
         
-        # 1. 初始化数据分析器
-        data_dir = os.path.dirname(data_file) if os.path.dirname(data_file) else 'data'
-        analyzer = DataAnalyzer(data_dir=data_dir)
+        # 1. 初始化数据分析器，只分析当前任务的数据文件
+        strategy = resolve_strategy(strategy)
+        reports = resolve_reports(reports)
+        data_dir = os.path.dirname(data_file) if os.path.dirname(data_file) else DATA_DIR
+        analyzer = DataAnalyzer(data_dir=data_dir, data_file=data_file)
         
-        # 2. 分析并筛选TOP50商品
+        # 2. 按策略分析并筛选商品
         print("\n1. 开始分析商品数据...")
-        top50_results = analyzer.analyze_products(
-            price_range=(10, 1000),
-            sales_weight=0.6,
-            influencer_weight=0.4,
-            top_n=50
-        )
+        strategy_params = get_strategy(strategy)
+        top50_results = analyzer.analyze_products(**strategy_params)
         
         if not top50_results:
             raise Exception("未找到符合条件的商品")
@@ -1388,157 +1817,151 @@ def analyze_product_data(data_file: str, strategy: str = 'all') -> tuple:
         analysis_results = {
             "products": [],
             "summary": {
+                "strategy": strategy,
                 "total_products": len(top50_results),
                 "processed_count": 0,
                 "scheme1_count": 0,
                 "scheme2_count": 0
             }
         }
-        
+        image_cache = get_image_cache()
+        cache_stats_before = image_cache.stats()
+        search_cache = get_search_cache()
+        search_stats_before = search_cache.stats()
+        # 后台并发下载所有商品封面，供上传搜索和相似度比较使用
+        image_cache.prefetch(product['cover_url'] for product in top50_results)
+        
+        # 检查点日志中已完成的商品、上次分析中未变化的商品不再搜索
+        journal = AnalysisJournal(journal_file) if journal_file else None
+        previous = PreviousResults(previous_file) if previous_file else None
+        if (journal and journal.stats()['loaded']) or (previous and previous.count):
+            # 按封面图内容比较，需要先等封面下载完成
+            _cover_hashes(top50_results)
+        if journal:
+            # 日志同时供接口读取分析中的结果，只保留本次分析商品的记录
+            journal.retain(top50_results)
+            journal.write_meta({"strategy": strategy, "total_products": len(top50_results)})
+        records = {}
+        incremental = {"previous_file": previous_file, "reused": 0, "changed": 0, "new": 0}
+        for index, product in enumerate(top50_results):
+            record = journal.lookup(product) if journal else None
+            if record is not None:
+                records[index] = record
+                continue
+            record = previous.lookup(product) if previous else None
+            if record is not None:
+                records[index] = record
+                incremental["reused"] += 1
+            elif previous and previous.has(product):
+                incremental["changed"] += 1
+            else:
+                incremental["new"] += 1
+        pending = [index for index in range(len(top50_results)) if index not in records]
+        resumed = len(records) - incremental["reused"]
+        if resumed:
+            print(f"✓ 检查点中已有 {resumed} 个商品的匹配结果")
+        if previous:
+            print(f"✓ 增量分析：沿用上次结果 {incremental['reused']} 个，封面图变化 {incremental['changed']} 个，"
+                  f"新商品 {incremental['new']} 个")
+        print(f"共 {len(pending)}/{len(top50_results)} 个商品需要搜索")
+        
+        search_latency = SearchLatency()
+        # 从进程内常驻的浏览器服务租用已就绪的浏览器，分析结束后归还而不关闭
+        browser_service = get_browser_service(Alibaba1688Searcher)
+        pool = BrowserPool(browser_service)
         try:
-            matcher.init_browser()
-            
-            # 4. 创建Excel工作簿
-            wb = Workbook()
-            ws1 = wb.active
-            ws1.title = "方案一结果"
-            ws2 = wb.create_sheet("方案二结果")
-            
-            # 5. 处理每个商品
-            valid_products = []
-            processed_count = 0
-            
-            for row, product in enumerate(top50_results, 2):
-                try:
-                    print(f"\n{'='*50}")
-                    print(f"处理第 {row-1}/{len(top50_results)} 个商品: {product['product_name']}")
-                    print(f"商品URL: {product['cover_url']}")
-                    
-                    # 创建当前商品的结果对象
-                    product_result = {
-                        "product_id": product['product_id'],
-                        "product_name": product['product_name'],
-                        "cover_url": product['cover_url'],
-                        "category": product.get('category', ''),
-                        "avg_price": product.get('avg_price', ''),
-                        "total_sale_nd_cnt": product.get('total_sale_nd_cnt', ''),
-                        "influencers_count": product.get('influencers_count', ''),
-                        "product_rating": product.get('product_rating', ''),
-                        "matches_1": [],  # 方案一结果
-                        "matches_2": []   # 方案二结果
-                    }
-                    
-                    # 搜索1688商品
-                    try:
-                        results = matcher.search_1688_by_image(product['cover_url'])
-                        if not results:
-                            print(f"× 未找到匹配商品，跳过")
-                            continue
-                            
-                        print(f"✓ 找到 {len(results)} 个匹配商品")
-                        processed_count += 1
-                        analysis_results["summary"]["processed_count"] += 1
-                        
-                        # 写入基础数据（两个表都写入）
-                        for ws in [ws1, ws2]:
-                            ws.cell(row, 1, product['product_id'])
-                            ws.cell(row, 2, product['product_name'])
-                            ws.cell(row, 3, product.get('category', ''))
-                            ws.cell(row, 4, product.get('avg_price', ''))
-                            ws.cell(row, 5, product.get('total_sale_nd_cnt', ''))
-                            ws.cell(row, 6, product.get('influencers_count', ''))
-                            ws.cell(row, 7, product.get('product_rating', ''))
-                            
-                            # 插入商品原图
-                            _insert_image_to_cell(ws, row, 8, product['cover_url'])
-                        
-                        # 方案一：写入前3个结果
-                        scheme1_results = results[:3]
-                        for i, result in enumerate(scheme1_results, 1):
-                            img_col = 8 + i*2 - 1
-                            link_col = img_col + 1
-                            _insert_image_to_cell(ws1, row, img_col, result['image_url'])
-                            ws1.cell(row, link_col, result['product_url'])
-                            
-                            # 保存到JSON结果
-                            product_result["matches_1"].append({
-                                "image_url": result['image_url'],
-                                "product_url": result['product_url'],
-                                "title": result.get('title', ''),
-                                "price": result.get('price', '')
-                            })
-                        
-                        # 方案二：计算相似度
-                        similar_products = []
-                        for result in results[:10]:
-                            similarity = matcher.compare_images(
-                                product['cover_url'],
-                                result['image_url']
-                            )
-                            if similarity >= matcher.similarity_threshold:
-                                similar_products.append({**result, 'similarity': similarity})
-                                
-                                # 保存到JSON结果
-                                product_result["matches_2"].append({
-                                    "image_url": result['image_url'],
-                                    "product_url": result['product_url'],
-                                    "title": result.get('title', ''),
-                                    "price": result.get('price', ''),
-                                    "similarity": float(similarity)
-                                })
-                        
-                        # 如果有两个以上高相似度商品，写入方案二表格
-                        if len(similar_products) >= 2:
-                            similar_products.sort(key=lambda x: x['similarity'], reverse=True)
-                            for i, result in enumerate(similar_products[:3], 1):
-                                img_col = 8 + i*2 - 1
-                                link_col = img_col + 1
-                                _insert_image_to_cell(ws2, row, img_col, result['image_url'])
-                                ws2.cell(row, link_col, 
-                                    f"相似度: {result['similarity']:.4f}\n"
-                                    f"链接: {result['product_url']}")
-                            valid_products.append(product)
-                            analysis_results["summary"]["scheme2_count"] += 1
-                        
-                        # 添加到分析结果
-                        if product_result["matches_1"] or product_result["matches_2"]:
-                            analysis_results["products"].append(product_result)
-                            if product_result["matches_1"]:
-                                analysis_results["summary"]["scheme1_count"] += 1
-                        
-                    except Exception as e:
-                        print(f"× 搜索商品时出错: {str(e)}")
-                        print("跳过当前商品，继续处理下一个")
-                        continue
-                    
-                except Exception as e:
-                    print(f"× 处理商品时出错: {str(e)}")
-                    continue
+            search_futures = {}
+            if pending:
+                pool.start()
+                # 待搜索商品的1688搜索提交到浏览器池并行执行，下面按原顺序读取结果
+                futures = pool.submit_all(
+                    lambda searcher, product: searcher.search_by_image(
+                        product['cover_url'], latency=search_latency, use_cache=use_search_cache),
+                    [top50_results[index] for index in pending]
+                )
+                search_futures = dict(zip(pending, futures))
             
-            # 6. 保存Excel文件
+            # 4. 创建Excel报告，每个商品处理完即流式写入
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            excel_file = f'top50_analysis_{timestamp}.xlsx'
-            wb.save(excel_file)
+            excel_file = get_storage().path(ANALYSIS_DIR, f'analysis_results_{timestamp}.xlsx')
+            report = create_match_report(excel_file, results=analysis_results)
+            
+            # 5. 处理每个商品，匹配结果同时写入Excel和JSON数据
+            _match_products(
+                top50_results, lambda index: search_futures[index].result(), matcher, report,
+                journal=journal, records=records
+            )
+            # 记录复用了多少已有结果
+            if journal:
+                analysis_results["summary"]["resumed_count"] = resumed
+            if previous:
+                incremental["searched"] = len(pending)
+                incremental["reuse_rate"] = round(incremental["reused"] / len(top50_results), 4)
+                analysis_results["summary"]["incremental"] = incremental
+            
+            # 6. 保存Excel文件到analysis目录（行数过多时拆分为多个文件）
+            excel_files = report.close()
+            excel_file = excel_files[0]
+            if len(excel_files) > 1:
+                analysis_results["summary"]["excel_files"] = excel_files
+            
+            # 记录本次分析的图片缓存命中情况
+            cache_stats = image_cache.stats()
+            analysis_results["summary"]["image_cache"] = {
+                key: cache_stats[key] - cache_stats_before[key]
+                for key in ('memory_hits', 'disk_hits', 'misses', 'downloads', 'download_failures')
+            }
+            # 记录本次分析的1688搜索缓存命中情况
+            search_stats = search_cache.stats()
+            search_summary = {
+                key: search_stats[key] - search_stats_before[key]
+                for key in ('hits', 'misses', 'image_id_hits')
+            }
+            lookups = search_summary['hits'] + search_summary['misses']
+            search_summary['hit_rate'] = round(search_summary['hits'] / lookups, 4) if lookups else 0.0
+            analysis_results["summary"]["search_cache"] = search_summary
+            # 记录方案二级联匹配各层的通过率和耗时
+            analysis_results["summary"]["matching"] = matcher.cascade_stats()
+            analysis_results["summary"]["browser_pool"] = pool.stats()
+            analysis_results["summary"]["browser_service"] = browser_service.stats()
+            analysis_results["summary"]["search_latency"] = search_latency.summary()
+            
+            # 按需生成附加报告，封面图此时已在缓存中
+            if reports:
+                analysis_results["summary"]["reports"] = analyzer.generate_reports(
+                    top50_results, reports, strategy_params['price_range'],
+                    strategy_params['sales_weight'], strategy_params['influencer_weight']
+                )
             
             # 7. 保存JSON结果文件到analysis目录
-            analysis_dir = 'analysis'
-            os.makedirs(analysis_dir, exist_ok=True)
-            json_file = os.path.join(analysis_dir, f'analysis_results_{timestamp}.json')
+            json_file = get_storage().path(ANALYSIS_DIR, f'analysis_results_{timestamp}.json')
             with open(json_file, 'w', encoding='utf-8') as f:
                 json.dump(analysis_results, f, ensure_ascii=False, indent=2)
             
             print(f"\n分析完成！")
-            print(f"共处理 {processed_count}/{len(top50_results)} 个商品")
+            print(f"共处理 {report.processed}/{len(top50_results)} 个商品")
             print(f"方案一：保存了所有处理成功的商品匹配结果")
-            print(f"方案二：找到 {len(valid_products)} 个有效商品")
+            print(f"方案二：找到 {report.scheme2_valid} 个有效商品")
             print(f"Excel报告已生成: {excel_file}")
             print(f"JSON结果已生成: {json_file}")
+            print(f"图片缓存: {analysis_results['summary']['image_cache']}")
+            print(f"1688搜索缓存: {analysis_results['summary']['search_cache']}")
+            latency = analysis_results['summary']['search_latency']
+            if latency['count']:
+                print(f"1688搜索耗时: 平均 {latency['avg_ms']} ms，P95 {latency['p95_ms']} ms，"
+                      f"平均等待页面 {latency['avg_wait_ms']} ms")
+            print(f"级联匹配: {analysis_results['summary']['matching']}")
+            
+            # 报告已完整生成，不再需要检查点
+            if journal:
+                journal.remove()
             
             return excel_file, json_file
             
         finally:
-            if matcher:
-                matcher.close_browser()
+            pool.close()
+            if journal:
+                journal.close()
             
     except Exception as e:
         print(f"\n分析过程出错: {str(e)}")
@@ -0,0 +1,285 @@
+"""
+分析检查点日志和上次分析结果的复用
+
+analyze_product_data 中每个商品完成1688搜索和匹配后，立即把结果追加到任务的日志文件
+（analysis/journal_<任务ID>.jsonl，每行一个商品）并写入磁盘。分析中途失败或服务重启后，
+重新分析同一任务时：
+- 日志中已有且封面图未变的商品直接使用记录的结果，不再搜索
+- Excel 和 JSON 报告按商品原顺序，由日志记录和新完成的商品重新生成
+进程崩溃时最后一行可能不完整，读取时跳过无法解析的行，并在继续追加前修复文件。
+
+日志同时是分析进行中的结果流：每条记录带有与结果 JSON 相同格式的商品数据（result），
+另有记录本次分析商品总数等信息的 {"meta": ...} 行。read_results 从游标（"<日志文件 inode>:<字节位置>"）
+读取之后新增的记录，接口据此在分析完成前返回已完成商品的匹配结果。日志重写（os.replace）后 inode 改变，
+旧游标随之失效，从头读取。
+
+重新分析已完成的任务时，PreviousResults 从上次的分析结果 JSON 中读取各商品的匹配结果，
+商品ID相同且封面图未变的商品直接沿用，只有新上榜或换了封面图的商品需要重新搜索。
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from storage import get_storage, ANALYSIS_DIR
+
+
+def journal_path(task_id: str) -> str:
+    """任务的检查点日志路径"""
+    return get_storage().path(ANALYSIS_DIR, f'journal_{task_id}.jsonl')
+
+
+def same_cover(product: Dict, record: Dict) -> bool:
+    """记录是否对应商品当前的封面图：双方都有图片内容哈希时比较哈希（封面URL可能带签名而变化），否则比较URL"""
+    if product.get('cover_hash') and record.get('cover_hash'):
+        return product['cover_hash'] == record['cover_hash']
+    return product.get('cover_url') == record.get('cover_url')
+
+
+# 每次读取分析中结果时最多返回的商品数量
+RESULTS_PAGE_SIZE = 200
+
+
+def _iter_lines(path: str) -> Iterator[Dict]:
+    """按写入顺序读取日志中的商品记录和 meta 行（日志可能已被压缩），跳过不完整或损坏的行"""
+    storage = get_storage()
+    if not storage.exists(path):
+        return
+    with storage.open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break  # 最后一行未写完
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and ('meta' in record or record.get('product_id') is not None):
+                yield record
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """按写入顺序读取日志中的商品记录"""
+    for record in _iter_lines(path):
+        if 'meta' not in record:
+            yield record
+
+
+class AnalysisJournal:
+    def __init__(self, path: str):
+        """打开检查点日志，读取已有的记录
+
+        Args:
+            path: 日志文件路径（见 journal_path）
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._records: Dict[str, Dict] = {}
+        self._meta: Optional[Dict] = None  # 最新的 meta 行，重写日志时保留
+        lines = 0
+        for record in _iter_lines(path):
+            if 'meta' in record:
+                self._meta = record
+            else:
+                self._records[str(record['product_id'])] = record
+            lines += 1
+        self._stats = {'loaded': len(self._records), 'appended': 0}
+        if self._needs_rewrite(lines):
+            self._rewrite()
+
+    def _needs_rewrite(self, lines: int) -> bool:
+        """日志被压缩、有不完整或损坏的行、或同一商品（或 meta）有多条记录时，需要重写为干净的原始文件
+
+        Args:
+            lines: 读取到的有效行数（商品记录和 meta 行）
+        """
+        storage = get_storage()
+        if not storage.exists(self.path):
+            return False
+        if storage.is_compressed(self.path):
+            return True
+        if lines != len(self._records) + (1 if self._meta else 0):
+            return True
+        valid = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    return True
+                valid += 1
+        return valid != lines
+
+    def _rewrite(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            if self._meta:
+                f.write(json.dumps(self._meta, ensure_ascii=False) + '\n')
+            for record in self._records.values():
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        get_storage().discard_variants(self.path)
+        # 追加句柄指向被替换的旧文件，下次写入时重新打开
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def retain(self, products: List[Dict]):
+        """只保留本次分析商品的记录（封面图未变），使日志中只有本次分析的结果
+        上次分析的 meta 行一并丢弃，由随后的 write_meta 写入本次的信息
+        """
+        keep = {}
+        for product in products:
+            record = self.lookup(product)
+            if record is not None:
+                keep[str(product['product_id'])] = record
+        if len(keep) != len(self._records) or self._meta:
+            with self._lock:
+                self._records = keep
+                self._meta = None
+                self._rewrite()
+
+    def write_meta(self, meta: Dict):
+        """追加本次分析的信息（如商品总数），供读取分析中结果时使用"""
+        record = {'meta': meta, 'recorded_at': time.time()}
+        self._write_line(record)
+        with self._lock:
+            self._meta = record
+
+    def lookup(self, product: Dict) -> Optional[Dict]:
+        """返回商品的已完成记录；封面图已变化的商品需要重新搜索，返回 None"""
+        record = self._records.get(str(product['product_id']))
+        if record is None or not same_cover(product, record):
+            return None
+        return record
+
+    def append(self, record: Dict):
+        """追加一条商品记录并立即写入磁盘"""
+        record = dict(record, recorded_at=time.time())
+        self._write_line(record)
+        with self._lock:
+            self._records[str(record['product_id'])] = record
+            self._stats['appended'] += 1
+
+    def _write_line(self, data: Dict):
+        line = json.dumps(data, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def remove(self):
+        """删除日志（重新开始分析时调用）"""
+        self.close()
+        get_storage().remove(self.path)
+        self._records = {}
+        self._meta = None
+
+
+class PreviousResults:
+    def __init__(self, json_file: Optional[str]):
+        """读取上次分析结果 JSON 中各商品的匹配结果（文件不存在或无法读取时为空）
+
+        Args:
+            json_file: 上次分析生成的 analysis_results_*.json
+        """
+        self.json_file = json_file
+        self._records: Dict[str, Dict] = {}
+        storage = get_storage()
+        if not storage.exists(json_file):
+            return
+        try:
+            data = storage.read_json(json_file)
+        except Exception as e:
+            print(f"读取上次分析结果失败，将重新搜索所有商品: {e}")
+            return
+        for product in data.get('products', []):
+            # 与检查点记录格式一致，方案一结果即搜索结果的前几个
+            self._records[str(product['product_id'])] = {
+                'product_id': product['product_id'],
+                'cover_url': product.get('cover_url'),
+                'cover_hash': product.get('cover_hash'),
+                'offers': product.get('matches_1') or [],
+                'scheme2': product.get('matches_2') or []
+            }
+
+    @property
+    def count(self) -> int:
+        return len(self._records)
+
+    def has(self, product: Dict) -> bool:
+        return str(product['product_id']) in self._records
+
+    def lookup(self, product: Dict) -> Optional[Dict]:
+        """返回可沿用的匹配结果，商品不在上次结果中或封面图已变化时返回 None"""
+        record = self._records.get(str(product['product_id']))
+        if record is None or not same_cover(product, record):
+            return None
+        return record
+
+
+def _parse_cursor(cursor: Union[str, int, None]) -> Tuple[Optional[int], int]:
+    """解析游标，返回 (日志文件 inode, 字节位置)；不带 inode 的游标只有 0 有效，无法识别时字节位置为 -1"""
+    if not cursor:
+        return None, 0
+    inode, sep, offset = str(cursor).partition(':')
+    try:
+        return (int(inode), int(offset)) if sep else (None, int(inode))
+    except ValueError:
+        return None, -1
+
+
+def read_results(path: Optional[str], cursor: Union[str, int, None] = None,
+                 limit: int = RESULTS_PAGE_SIZE) -> Dict:
+    """
+    读取分析进行中的结果：从游标开始的已完成商品，最多 limit 个
+    返回 {"products": [...], "meta": 本次读到的最新分析信息或 None, "cursor": 下次读取的游标, "reset": 是否从头读取}
+    游标无效时（日志在继续分析时被重写，或游标来自其他日志）从头读取并设置 reset，调用方应丢弃之前读到的结果
+    """
+    result = {"products": [], "meta": None, "cursor": cursor, "reset": False}
+    # 分析中的日志受保护不会被压缩，这里只读取原始文件
+    if not path or not os.path.exists(path):
+        return result
+    inode, offset = _parse_cursor(cursor)
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        if offset and (inode != st.st_ino or offset < 0 or offset > st.st_size):
+            offset = 0
+            result["reset"] = True
+        elif offset > 0:
+            # 同一文件中的游标应位于某一行的开头
+            f.seek(offset - 1)
+            if f.read(1) != b'\n':
+                offset = 0
+                result["reset"] = True
+        f.seek(offset)
+        while len(result["products"]) < limit:
+            line = f.readline()
+            if not line.endswith(b'\n'):
+                break  # 没有新行或最后一行尚未写完
+            offset += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict):
+                continue
+            if 'meta' in record:
+                result["meta"] = record['meta']
+            elif record.get('result'):
+                result["products"].append(record['result'])
+    result["cursor"] = f"{st.st_ino}:{offset}"
+    return result
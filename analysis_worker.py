@@ -0,0 +1,43 @@
+"""
+分析任务的工作进程入口
+
+api_server 只导入本模块，selenium、cv2、pandas、openpyxl 等重量级依赖
+在工作进程第一次执行分析时才由 analyse 模块加载，服务进程启动时无需付出这部分开销。
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+# 分析工作进程数量
+ANALYSIS_WORKERS = int(os.environ.get("ECHOTIK_ANALYSIS_WORKERS", "1"))
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """获取（按需创建）分析工作进程池，工作进程常驻以复用已加载的模块"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS)
+    return _executor
+
+
+def shutdown_executor():
+    """关闭分析工作进程池（工作进程异常退出后进程池不再可用，也用此丢弃，下次分析时重新创建）"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def run_analysis(data_file: str, strategy: str, reports: tuple = (), journal_file: Optional[str] = None,
+                 previous_file: Optional[str] = None, use_search_cache: bool = True):
+    """
+    在工作进程中执行数据分析，reports 为需要额外生成的附加报告，journal_file 为检查点日志路径，
+    previous_file 为上次的分析结果 JSON（增量分析时沿用未变化商品的匹配结果），
+    use_search_cache 为 False 时不使用1688搜索结果缓存
+    """
+    from analyse import analyze_product_data
+    return analyze_product_data(data_file, strategy=strategy, reports=reports,
+                                journal_file=journal_file, previous_file=previous_file,
+                                use_search_cache=use_search_cache)
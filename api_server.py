@@ -1,19 +1,24 @@
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional, Dict, Union
+from typing import Optional, Dict, List, Union
 import uvicorn
 import os
 import json
 from datetime import datetime
-from crawler import EchoTikCrawler
 import asyncio
 import threading
 from queue import Queue
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 import shutil
 from pathlib import Path
-from analyse import analyze_product_data as analyze_data, analyze_1688
+from urllib.parse import quote
+from coalesce import RequestCoalescer
+from concurrent.futures.process import BrokenProcessPool
+from analysis_worker import get_executor, shutdown_executor, run_analysis
+from storage import get_storage
+from strategies import resolve_strategy, resolve_reports
+from analysis_journal import journal_path, read_results
 
 app = FastAPI(title="EchoTik Data API")
 
@@ -35,11 +40,20 @@ TASKS_DIR = Path("tasks")
 ANALYSIS_DIR = Path("analysis")
 DATA_DIR = Path("data")
 
+# 重复请求合并配置：窗口期（秒）和策略（attach / follow / off）
+COALESCE_WINDOW = float(os.environ.get("ECHOTIK_COALESCE_WINDOW", "300"))
+COALESCE_POLICY = os.environ.get("ECHOTIK_COALESCE_POLICY", "attach")
+coalescer = RequestCoalescer(window_seconds=COALESCE_WINDOW, policy=COALESCE_POLICY)
+
 # 创建必要的目录
 TASKS_DIR.mkdir(exist_ok=True)
 ANALYSIS_DIR.mkdir(exist_ok=True)
 DATA_DIR.mkdir(exist_ok=True)
 
+# 存储管理：冷文件压缩和磁盘配额，后台清理间隔（秒）
+STORAGE_SWEEP_INTERVAL = float(os.environ.get("ECHOTIK_STORAGE_SWEEP_INTERVAL", "600"))
+storage = get_storage()
+
 def load_tasks():
     """从文件加载任务数据"""
     try:
@@ -76,6 +90,8 @@ class TaskStatus(BaseModel):
 class AnalyzeRequest(BaseModel):
     task_id: str
     strategy: str = 'top50'  # 默认使用 top50 策略
+    reports: List[str] = []  # 需要额外生成的附加报告（top50_excel、top50_txt），默认不生成
+    incremental: bool = True  # 重新分析时沿用上次结果中未变化商品的匹配结果；为 False 时全部重新搜索，不使用合并和搜索缓存
 
 def generate_task_id(category_id: Optional[str], keyword: Optional[str]) -> str:
     """生成任务ID"""
@@ -86,9 +102,19 @@ def generate_task_id(category_id: Optional[str], keyword: Optional[str]) -> str:
         return f"kw_{keyword}_{timestamp}"
     return f"task_{timestamp}"
 
+def fan_out_result(followers, fields: Dict, message: str):
+    """把领头任务的结果同步给合并到它上面的跟随任务"""
+    for follower_id in followers:
+        follower = tasks["tasks"].get(follower_id)
+        if follower is None:
+            continue
+        follower.update(fields)
+        follower["message"] = message
+
 async def crawl_data(task_id: str, category_id: Optional[str], 
                     keyword: Optional[str], cookie: str, authorization: str):
     """执行爬虫任务"""
+    coalesce_key = coalescer.crawl_key(category_id, keyword)
     try:
         # 确保 tasks 字典结构正确
         if "tasks" not in tasks:
@@ -97,6 +123,7 @@ async def crawl_data(task_id: str, category_id: Optional[str],
         tasks["tasks"][task_id] = {"status": "running", "message": "正在爬取数据..."}
         save_tasks()  # 保存任务状态
         
+        from crawler import EchoTikCrawler  # 按需加载，避免拖慢服务启动
         crawler = EchoTikCrawler()
         # 更新认证信息
         crawler.update_cookie(cookie)
@@ -125,6 +152,9 @@ async def crawl_data(task_id: str, category_id: Optional[str],
                     "file_path": file_path,
                     "file_name": latest_file
                 }
+                followers = coalescer.finish(coalesce_key, tasks["tasks"][task_id])
+                fan_out_result(followers, {**tasks["tasks"][task_id], "coalesced_with": task_id},
+                               f"数据爬取完成（合并自任务 {task_id}）")
                 save_tasks()  # 保存任务结果
             except Exception as e:
                 tasks["tasks"][task_id] = {
@@ -132,6 +162,10 @@ async def crawl_data(task_id: str, category_id: Optional[str],
                     "message": f"爬取失败: {str(e)}",
                     "error": str(e)
                 }
+                followers = coalescer.finish(coalesce_key, None)
+                fan_out_result(followers, {"status": "failed", "error": str(e)},
+                               f"爬取失败（合并自任务 {task_id}）: {str(e)}")
+                save_tasks()
         
         # 启动爬虫线程
         thread = threading.Thread(target=run_crawler)
@@ -142,6 +176,8 @@ async def crawl_data(task_id: str, category_id: Optional[str],
             "status": "failed",
             "message": f"任务启动失败: {str(e)}"
         }
+        followers = coalescer.finish(coalesce_key, None)
+        fan_out_result(followers, {"status": "failed"}, f"任务启动失败（合并自任务 {task_id}）: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/crawl", response_model=TaskStatus)
@@ -151,12 +187,45 @@ async def start_crawl(request: CrawlRequest, background_tasks: BackgroundTasks):
         raise HTTPException(status_code=400, 
                           detail="必须提供category_id或keyword其中之一")
         
-    task_id = generate_task_id(request.category_id, request.keyword)
-    
     # 确保 tasks 字典结构正确
     if "tasks" not in tasks:
         tasks["tasks"] = {}
     
+    # 相同参数的任务正在执行或刚完成时，合并到已有任务上
+    coalesce_key = coalescer.crawl_key(request.category_id, request.keyword)
+    existing = coalescer.lookup(coalesce_key)
+    if existing:
+        leader_id = existing["task_id"]
+        if coalescer.policy == "attach":
+            return TaskStatus(
+                task_id=leader_id,
+                status="running" if existing["running"] else "completed",
+                message=f"已有相同的爬取任务，已合并到任务 {leader_id}"
+            )
+        
+        task_id = generate_task_id(request.category_id, request.keyword)
+        if existing["running"] and coalescer.add_follower(coalesce_key, task_id):
+            tasks["tasks"][task_id] = {
+                "status": "running",
+                "message": f"已合并到进行中的任务 {leader_id}",
+                "coalesced_with": leader_id
+            }
+        else:
+            tasks["tasks"][task_id] = {
+                **(existing["result"] or tasks["tasks"].get(leader_id, {})),
+                "message": f"数据爬取完成（复用任务 {leader_id} 的结果）",
+                "coalesced_with": leader_id
+            }
+        save_tasks()
+        return TaskStatus(
+            task_id=task_id,
+            status=tasks["tasks"][task_id].get("status", "running"),
+            message=tasks["tasks"][task_id]["message"]
+        )
+    
+    task_id = generate_task_id(request.category_id, request.keyword)
+    coalescer.register(coalesce_key, task_id)
+    
     # 启动异步任务
     background_tasks.add_task(crawl_data, task_id, 
                             request.category_id, request.keyword, request.cookie, request.authorization)
@@ -170,13 +239,13 @@ async def start_crawl(request: CrawlRequest, background_tasks: BackgroundTasks):
 @app.get("/api/status/{task_id}", response_model=TaskStatus)
 async def get_task_status(task_id: str):
     """获取任务状态"""
-    global tasks
-    tasks = load_tasks()
+    # 只读取，不替换全局 tasks：后台分析持有全局字典，替换后其更新不会被保存
+    tasks_data = load_tasks()
     
-    if task_id not in tasks["tasks"]:
+    if task_id not in tasks_data["tasks"]:
         raise HTTPException(status_code=404, detail="任务不存在")
     
-    task = tasks["tasks"][task_id]
+    task = tasks_data["tasks"][task_id]
     return TaskStatus(
         task_id=task_id,
         status=task["status"],
@@ -195,22 +264,50 @@ async def download_file(task_id: str, type: str = 'raw'):
     result = tasks["tasks"][task_id]
     
     if type == 'analysis':
-        if not result.get("analysis_file") or not os.path.exists(result["analysis_file"]):
+        if not storage.exists(result.get("analysis_file")):
             raise HTTPException(status_code=404, detail="分析文件不存在")
         file_path = result["analysis_file"]
         file_name = os.path.basename(file_path)
     else:
-        if not result.get("file_path") or not os.path.exists(result["file_path"]):
+        if not storage.exists(result.get("file_path")):
             raise HTTPException(status_code=404, detail="文件不存在")
         file_path = result["file_path"]
         file_name = result["file_name"]
     
+    # 已被压缩的冷文件解压后流式返回
+    if storage.is_compressed(file_path):
+        return StreamingResponse(
+            storage.iter_bytes(file_path),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f"attachment; filename*=utf-8''{quote(file_name)}"}
+        )
+    
     return FileResponse(
         file_path,
         filename=file_name,
         media_type="application/octet-stream"
     )
 
+# 任务记录中的文件字段及其说明，删除任务时一并删除
+TASK_FILE_FIELDS = (
+    ("file_path", "原始数据文件"),
+    ("analysis_file", "分析Excel文件"),
+    ("analysis_json", "分析JSON文件"),
+    ("previous_json", "上次分析JSON文件"),
+    ("analysis_journal", "分析检查点日志"),
+)
+
+def referenced_files(exclude_task_id: Optional[str] = None) -> set:
+    """其他任务引用的所有文件（绝对路径）"""
+    paths = set()
+    for other_id, other in tasks["tasks"].items():
+        if other_id == exclude_task_id:
+            continue
+        for field, _ in TASK_FILE_FIELDS:
+            if other.get(field):
+                paths.add(os.path.abspath(other[field]))
+    return paths
+
 @app.delete("/api/tasks/{task_id}")
 async def delete_task(task_id: str):
     """删除任务及其相关数据"""
@@ -222,32 +319,20 @@ async def delete_task(task_id: str):
     
     task = tasks["tasks"][task_id]
     try:
-        # 删除原始数据文件
-        file_path = task.get("file_path")
-        if file_path and os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-                print(f"已删除原始数据文件: {file_path}")
-            except Exception as e:
-                print(f"删除原始文件失败: {e}")
-        
-        # 删除分析结果文件
-        analysis_file = task.get("analysis_file")
-        if analysis_file and os.path.exists(analysis_file):
-            try:
-                os.remove(analysis_file)
-                print(f"已删除分析Excel文件: {analysis_file}")
-            except Exception as e:
-                print(f"删除分析Excel文件失败: {e}")
-        
-        # 删除分析结果JSON文件
-        analysis_json = task.get("analysis_json")
-        if analysis_json and os.path.exists(analysis_json):
+        # 合并的任务与领头任务共用文件，仍被其他任务引用的文件不删除
+        in_use = referenced_files(exclude_task_id=task_id)
+        for field, label in TASK_FILE_FIELDS:
+            path = task.get(field)
+            if not storage.exists(path):
+                continue
+            if os.path.abspath(path) in in_use:
+                print(f"{label}仍被其他任务使用，保留: {path}")
+                continue
             try:
-                os.remove(analysis_json)
-                print(f"已删除分析JSON文件: {analysis_json}")
+                storage.remove(path)
+                print(f"已删除{label}: {path}")
             except Exception as e:
-                print(f"删除分析JSON文件失败: {e}")
+                print(f"删除{label}失败: {e}")
         
     except Exception as e:
         print(f"删除文件时出错: {e}")
@@ -278,8 +363,14 @@ async def start_analyze(request: AnalyzeRequest, background_tasks: BackgroundTas
     task = tasks["tasks"][request.task_id]
     print(f"当前任务状态: {task}")
     
+    try:
+        request.strategy = resolve_strategy(request.strategy)
+        reports = resolve_reports(request.reports)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     # 只要有原始数据文件就可以进行分析
-    if not task.get("file_path") or not os.path.exists(task["file_path"]):
+    if not storage.exists(task.get("file_path")):
         raise HTTPException(status_code=404, detail="数据文件不存在，无法进行分析")
     
     if task["status"] == "analyzing":
@@ -288,21 +379,65 @@ async def start_analyze(request: AnalyzeRequest, background_tasks: BackgroundTas
             detail="任务正在分析中，请等待当前分析完成"
         )
     
+    # 相同数据文件和策略的分析正在执行或刚完成时，合并到已有分析上
+    # 非增量的重新分析要求全部重新搜索，不参与合并（coalesce_key 为 None）
+    coalesce_key = coalescer.analyze_key(task["file_path"], request.strategy, reports) if request.incremental else None
+    existing = coalescer.lookup(coalesce_key) if coalesce_key else None
+    if existing and existing["task_id"] != request.task_id:
+        leader_id = existing["task_id"]
+        if existing["running"] and coalescer.add_follower(coalesce_key, request.task_id):
+            task["status"] = "analyzing"
+            task["message"] = f"已合并到进行中的分析任务 {leader_id}"
+            task["coalesced_with"] = leader_id
+            save_tasks()
+            return {"message": f"已合并到进行中的分析任务 {leader_id}"}
+        if existing["result"]:
+            task.update(existing["result"])
+            task["status"] = "completed"
+            task["message"] = f"分析完成（复用任务 {leader_id} 的结果）"
+            task["coalesced_with"] = leader_id
+            save_tasks()
+            return {"message": f"已复用任务 {leader_id} 最近的分析结果"}
+    elif existing and not existing["running"] and existing["result"]:
+        task.update(existing["result"])
+        task["status"] = "completed"
+        task["message"] = "分析完成（复用最近的分析结果）"
+        save_tasks()
+        return {"message": "已复用最近的分析结果"}
+    
     # 更新任务状态为分析中
     task["status"] = "analyzing"
     task["message"] = "正在进行数据分析..."
+    # 增量分析：保留上次的分析结果 JSON，未变化的商品沿用其中的匹配结果
+    # （上次分析失败时沿用更早一次成功分析的结果）
+    previous_json = task.get("analysis_json") or task.get("previous_json")
+    if request.incremental and previous_json and storage.exists(previous_json):
+        task["previous_json"] = previous_json
+    else:
+        task.pop("previous_json", None)
     # 清除之前的分析结果（如果有）
     if "analysis_file" in task:
         del task["analysis_file"]
     if "analysis_json" in task:
         del task["analysis_json"]
+    task.pop("coalesced_with", None)
+    # 检查点日志：上次分析中断时，从日志中已完成的商品继续
+    task["analysis_journal"] = journal_path(request.task_id)
+    if storage.exists(task["analysis_journal"]):
+        task["message"] = "正在从上次中断处继续分析..."
+    if coalesce_key:
+        coalescer.register(coalesce_key, request.task_id)
     save_tasks()
     
     # 启动分析任务
+    analysis_args = (task["file_path"], request.strategy, reports,
+                     task["analysis_journal"], task.get("previous_json"), request.incremental)
+    
     async def run_analyze():
         try:
-            # 执行数据分析
-            output_files = analyze_data(task["file_path"], strategy=request.strategy)
+            # 在工作进程中执行数据分析，重量级依赖只在工作进程中加载
+            loop = asyncio.get_running_loop()
+            output_files = await loop.run_in_executor(get_executor(), run_analysis, *analysis_args)
             
             if isinstance(output_files, tuple) and len(output_files) == 2:
                 excel_file, json_file = output_files
@@ -310,15 +445,30 @@ async def start_analyze(request: AnalyzeRequest, background_tasks: BackgroundTas
                 excel_file = output_files
                 json_file = None
             
-            # 更新任务状态
+            # 分析期间其他请求可能已重新加载全局 tasks，按任务ID重新获取要更新的任务
+            task = tasks["tasks"].get(request.task_id, {})
+            # 更新任务状态，检查点日志已在分析完成后删除
             task["status"] = "completed"
             task["message"] = "分析完成"
+            task.pop("analysis_journal", None)
+            task.pop("previous_json", None)
             task["analysis_file"] = excel_file
             if json_file:
                 task["analysis_json"] = json_file
+            
+            result_fields = {"status": "completed", "analysis_file": excel_file}
+            if json_file:
+                result_fields["analysis_json"] = json_file
+            followers = coalescer.finish(coalesce_key, result_fields)
+            fan_out_result(followers, result_fields, f"分析完成（合并自任务 {request.task_id}）")
             save_tasks()
             
         except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                # 工作进程异常退出（如浏览器崩溃），丢弃已损坏的进程池，下次分析时重新创建
+                print("分析工作进程异常退出，重建工作进程池")
+                shutdown_executor()
+            task = tasks["tasks"].get(request.task_id, {})
             task["status"] = "failed"
             task["message"] = f"分析失败: {str(e)}"
             # 清除可能的部分分析结果
@@ -326,6 +476,8 @@ async def start_analyze(request: AnalyzeRequest, background_tasks: BackgroundTas
                 del task["analysis_file"]
             if "analysis_json" in task:
                 del task["analysis_json"]
+            followers = coalescer.finish(coalesce_key, None)
+            fan_out_result(followers, {"status": "failed"}, f"分析失败（合并自任务 {request.task_id}）: {str(e)}")
             save_tasks()
             print(f"分析过程出错: {str(e)}")
     
@@ -333,27 +485,39 @@ async def start_analyze(request: AnalyzeRequest, background_tasks: BackgroundTas
     return {"message": "分析任务已启动"}
 
 @app.get("/api/analysis/{task_id}")
-async def get_analysis_results(task_id: str):
-    """获取分析结果数据"""
-    global tasks
-    tasks = load_tasks()
+async def get_analysis_results(task_id: str, cursor: Optional[str] = None):
+    """
+    获取分析结果数据
+    分析进行中时返回已完成商品的匹配结果（partial 为 true）：products 为游标之后新完成的商品，
+    下次请求原样传入返回的 cursor 即可只获取新增部分；reset 为 true 时需丢弃之前获取的结果
+    """
+    # 分析进行中前端会定时轮询，这里只读取，不替换后台分析正在更新的全局 tasks
+    tasks_data = load_tasks()
     
-    if task_id not in tasks["tasks"]:
+    if task_id not in tasks_data["tasks"]:
         raise HTTPException(status_code=404, detail="任务不存在")
     
-    result = tasks["tasks"][task_id]
+    result = tasks_data["tasks"][task_id]
+    
+    if result.get("status") == "analyzing":
+        # 合并到其他任务的分析读取领头任务的检查点日志
+        leader = tasks_data["tasks"].get(result.get("coalesced_with"), result)
+        journal = leader.get("analysis_journal") or result.get("analysis_journal")
+        try:
+            partial = read_results(journal, cursor)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"读取分析中结果失败: {str(e)}")
+        return {"status": "analyzing", "partial": True, **partial}
     
     if result.get("status") != "completed":
         raise HTTPException(status_code=400, detail="分析尚未完成")
     
     analysis_json = result.get("analysis_json")
-    if not analysis_json or not os.path.exists(analysis_json):
+    if not storage.exists(analysis_json):
         raise HTTPException(status_code=404, detail="分析结果数据不存在")
     
     try:
-        with open(analysis_json, 'r', encoding='utf-8') as f:
-            analysis_data = json.load(f)
-        return analysis_data
+        return storage.read_json(analysis_json)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"读取分析结果失败: {str(e)}")
 
@@ -393,6 +557,45 @@ async def get_tasks():
         # 出错时也返回空列表，而不是抛出错误
         return []
 
+def active_task_files():
+    """正在爬取或分析的任务所使用的文件，存储清理时跳过"""
+    for task in list(tasks.get("tasks", {}).values()):
+        if task.get("status") in ("running", "analyzing"):
+            yield task.get("file_path")
+            yield task.get("analysis_file")
+            yield task.get("analysis_json")
+            yield task.get("analysis_journal")
+            yield task.get("previous_json")
+
+def recover_interrupted_analyses():
+    """服务重启时仍处于分析中的任务已随工作进程中断，标记为失败，重新分析时从检查点继续"""
+    global tasks
+    tasks = load_tasks()
+    interrupted = [task for task in tasks["tasks"].values() if task.get("status") == "analyzing"]
+    for task in interrupted:
+        task["status"] = "failed"
+        if storage.exists(task.get("analysis_journal")):
+            task["message"] = "分析被中断，重新分析将从检查点继续"
+        else:
+            task["message"] = "分析被中断，请重新分析"
+        task.pop("coalesced_with", None)
+    if interrupted:
+        save_tasks()
+        print(f"已标记 {len(interrupted)} 个中断的分析任务")
+
+@app.on_event("startup")
+def on_startup():
+    """恢复中断的分析任务，启动存储后台清理线程"""
+    recover_interrupted_analyses()
+    storage.set_protected(active_task_files)
+    storage.start_sweeper(STORAGE_SWEEP_INTERVAL)
+
+@app.on_event("shutdown")
+def on_shutdown():
+    """服务关闭时结束分析工作进程和存储清理线程"""
+    shutdown_executor()
+    storage.stop_sweeper()
+
 def start_server():
     """启动服务器"""
     # 加载已有任务数据到全局变量
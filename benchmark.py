@@ -0,0 +1,295 @@
+"""
+性能基准脚本
+
+用法:
+    python benchmark.py import          # 测量各模块的冷启动导入耗时和内存
+    python benchmark.py scoring         # 向量化评分与逐条循环评分的耗时和排名对比
+    python benchmark.py upload [图片]   # 1688上传图片在不同缩放尺寸下的处理耗时和数据量
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 在独立子进程中导入模块，输出耗时（毫秒）和峰值内存（KB，仅类Unix系统可用）
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = (time.perf_counter() - start) * 1000
+try:
+    import resource
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak_kb //= 1024
+except ImportError:
+    peak_kb = None
+heavy = [m for m in ('selenium', 'cv2', 'pandas', 'openpyxl', 'PIL', 'bs4', 'webdriver_manager')
+         if m in sys.modules]
+print(json.dumps({'ms': elapsed, 'peak_kb': peak_kb, 'heavy': heavy}))
+"""
+
+
+def _probe_import(module: str, cwd: str) -> dict:
+    """在干净的子进程中导入一次模块"""
+    env = dict(os.environ, PYTHONPATH=PROJECT_DIR)
+    output = subprocess.run(
+        [sys.executable, '-c', _IMPORT_PROBE, module],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_import(modules, repeat: int):
+    """测量模块冷启动导入耗时，取多次运行的中位数"""
+    print(f"\n=== 导入耗时基准（{repeat} 次取中位数）===")
+    # 在临时目录中运行，避免 api_server 在项目目录中创建数据目录
+    with tempfile.TemporaryDirectory() as cwd:
+        for module in modules:
+            try:
+                runs = [_probe_import(module, cwd) for _ in range(repeat)]
+            except subprocess.CalledProcessError as e:
+                print(f"× {module}: 导入失败\n{e.stderr}")
+                continue
+            runs.sort(key=lambda r: r['ms'])
+            median = runs[len(runs) // 2]
+            peak = f"{median['peak_kb'] / 1024:.1f} MB" if median['peak_kb'] else "未知"
+            heavy = ', '.join(median['heavy']) or '无'
+            print(f"{module:<16} {median['ms']:>9.1f} ms  峰值内存 {peak:>10}  已加载重量级依赖: {heavy}")
+
+
+def _legacy_score(products, price_range, sales_weight, influencer_weight, top_n):
+    """原先 DataAnalyzer.analyze_products 中的逐条循环评分，作为对照"""
+    def convert_price(price_str):
+        if not price_str or price_str == 'N/A':
+            return 0.0
+        match = re.search(r'RM([\d.]+)', price_str)
+        return float(match.group(1)) if match else 0.0
+
+    def convert_count(count_str):
+        if not count_str or count_str == 'N/A':
+            return 0.0
+        match = re.search(r'([\d.]+)([KM])?', count_str)
+        if not match:
+            return 0.0
+        number = float(match.group(1))
+        return number * {'K': 1000, 'M': 1000000}.get(match.group(2), 1)
+
+    valid = []
+    for product in products:
+        try:
+            price = convert_price(product.get('avg_price', 'N/A'))
+            sales = convert_count(product.get('total_sale_nd_cnt', 'N/A'))
+            influencers = convert_count(product.get('influencers_count', 'N/A'))
+        except Exception:
+            continue
+        if price_range[0] <= price <= price_range[1] and sales > 0 and influencers > 0:
+            valid.append({'product': product, 'sales': sales, 'influencers': influencers})
+    if not valid:
+        return []
+    step = 100 / len(valid)
+    valid.sort(key=lambda x: x['sales'], reverse=True)
+    for i, item in enumerate(valid):
+        item['sales_score'] = 100 - i * step
+    valid.sort(key=lambda x: x['influencers'])
+    for i, item in enumerate(valid):
+        item['influencer_score'] = 100 - i * step
+    results = [{
+        'product_id': item['product'].get('product_id'),
+        'final_score': round(item['sales_score'] * sales_weight
+                             + item['influencer_score'] * influencer_weight, 2)
+    } for item in valid]
+    results.sort(key=lambda x: x['final_score'], reverse=True)
+    return results[:top_n]
+
+
+def _synthetic_products(count: int, seed: int = 42):
+    """生成与 EchoTik 数据格式一致的随机商品，数值取连续分布以避免并列"""
+    rng = random.Random(seed)
+    products = []
+    for i in range(count):
+        sales = rng.uniform(1, 500000)
+        influencers = rng.uniform(1, 5000)
+        products.append({
+            'product_id': str(i),
+            'product_name': f'商品{i}',
+            'avg_price': 'N/A' if rng.random() < 0.02 else f'RM{rng.uniform(1, 300):.2f}',
+            'total_sale_nd_cnt': f'{sales / 1000:.4f}K' if sales >= 1000 else f'{sales:.2f}',
+            'influencers_count': f'{influencers:.3f}',
+            'product_rating': f'{rng.uniform(3, 5):.1f}',
+            'category': '家居用品',
+            'cover_url': ''
+        })
+    return products
+
+
+def bench_scoring(count: int, legacy_limit: int, top_n: int):
+    """对比向量化评分与逐条循环评分的耗时，并校验两者的排名一致"""
+    from analyse import DataAnalyzer
+    from metrics import normalize_product
+
+    params = dict(price_range=(10, 1000), sales_weight=0.6, influencer_weight=0.4, top_n=top_n)
+    analyzer = DataAnalyzer.__new__(DataAnalyzer)
+
+    print(f"\n=== 评分基准（top_n={top_n}）===")
+    for n in sorted({min(count, legacy_limit), count}):
+        products = _synthetic_products(n)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            vectorized = analyzer.score_products(products, **params)
+            vectorized_ms = (time.perf_counter() - start) * 1000
+        line = f"{n:>9} 个商品  向量化 {vectorized_ms:>9.1f} ms"
+
+        # 入库时已解析数值列的数据，评分时无需再解析字符串
+        normalized = [normalize_product(dict(p)) for p in products]
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            preparsed = analyzer.score_products(normalized, **params)
+            preparsed_ms = (time.perf_counter() - start) * 1000
+        line += f"  已解析 {preparsed_ms:>8.1f} ms"
+        vectorized_ids = [r['product_id'] for r in vectorized]
+        if vectorized_ids != [r['product_id'] for r in preparsed]:
+            line += "（与字符串解析结果不一致！）"
+
+        if n <= legacy_limit:
+            start = time.perf_counter()
+            legacy = _legacy_score(products, **params)
+            legacy_ms = (time.perf_counter() - start) * 1000
+            same = [r['product_id'] for r in legacy] == vectorized_ids
+            line += f"  循环 {legacy_ms:>9.1f} ms  加速 {legacy_ms / vectorized_ms:>5.1f}x  排名一致: {'是' if same else '否'}"
+        print(line)
+
+
+def _synthetic_images():
+    """生成几张接近商品主图的测试图片：大尺寸高质量 JPEG 和带透明通道的 PNG"""
+    import numpy as np
+    from PIL import Image as PILImage
+
+    rng = np.random.default_rng(0)
+    images = {}
+    for side in (1600, 1000):
+        y, x = np.mgrid[0:side, 0:side]
+        pixels = np.stack([(x * 255 // side), (y * 255 // side), ((x + y) * 127 // side)], axis=-1)
+        pixels = np.clip(pixels + rng.normal(0, 12, pixels.shape), 0, 255).astype('uint8')
+        output = io.BytesIO()
+        PILImage.fromarray(pixels).save(output, format='JPEG', quality=95)
+        images[f'synthetic_{side}.jpg'] = output.getvalue()
+
+    rgba = np.zeros((1200, 1200, 4), dtype='uint8')
+    rgba[200:1000, 200:1000] = (220, 80, 40, 255)
+    output = io.BytesIO()
+    PILImage.fromarray(rgba).save(output, format='PNG')
+    images['synthetic_alpha.png'] = output.getvalue()
+    return images
+
+
+def _load_images(sources):
+    """读取本地图片文件或下载图片URL"""
+    from image_cache import download
+
+    images = {}
+    for source in sources:
+        if source.startswith(('http://', 'https://')):
+            images[source] = download(source)
+        else:
+            with open(source, 'rb') as f:
+                images[os.path.basename(source)] = f.read()
+    return images
+
+
+def bench_upload(sources, sizes, quality: int, repeat: int, live: bool):
+    """
+    对比不同缩放尺寸下上传数据的处理耗时和字节数（0 表示上传原图）
+    live 时使用 Alibaba1688Searcher 实际上传，测量上传接口的耗时（需要网络和浏览器）
+    """
+    import base64
+    from urllib.parse import urlencode
+    from thumbnails import render_upload
+
+    images = _load_images(sources) if sources else _synthetic_images()
+    print(f"\n=== 1688上传数据基准（JPEG 质量 {quality}，{repeat} 次取中位数）===")
+    for name, content in images.items():
+        print(f"\n{name}: 原图 {len(content) / 1024:.1f} KB")
+        for max_side in sizes:
+            runs = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                prepared = render_upload(content, max_side, quality) if max_side else content
+                data_json = json.dumps({'imageBase64': base64.b64encode(prepared).decode('utf-8')},
+                                       separators=(',', ':'))
+                body = urlencode({'data': data_json})
+                runs.append((time.perf_counter() - start) * 1000)
+            runs.sort()
+            label = f"{max_side}px" if max_side else "原图"
+            print(f"  {label:>8}  处理 {runs[len(runs) // 2]:>7.1f} ms  图片 {len(prepared) / 1024:>8.1f} KB"
+                  f"  请求体 {len(body) / 1024:>8.1f} KB")
+
+    if not live:
+        return
+
+    from analyse import Alibaba1688Searcher
+    from image_cache import get_image_cache
+
+    print("\n=== 实际上传耗时 ===")
+    searcher = Alibaba1688Searcher()
+    searcher.init_browser()
+    try:
+        for name, content in images.items():
+            url = name if name.startswith(('http://', 'https://')) else f"benchmark://{name}"
+            get_image_cache().put(url, content)
+            for max_side in sizes:
+                searcher.upload_max_side = max_side
+                with contextlib.redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    result = searcher.upload_image(url)
+                    elapsed = (time.perf_counter() - start) * 1000
+                image_id = (result or {}).get('data', {}).get('imageId')
+                label = f"{max_side}px" if max_side else "原图"
+                print(f"{name:<24} {label:>8}  上传 {elapsed:>8.1f} ms  imageId: {image_id or '失败'}")
+    finally:
+        searcher.close_browser()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EchoTik 性能基准")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='模块导入耗时')
+    import_parser.add_argument('modules', nargs='*',
+                               default=['api_server', 'analysis_worker', 'crawler', 'analyse'])
+    import_parser.add_argument('--repeat', type=int, default=5)
+
+    scoring_parser = subparsers.add_parser('scoring', help='商品评分耗时与排名一致性')
+    scoring_parser.add_argument('--count', type=int, default=1000000)
+    scoring_parser.add_argument('--legacy-limit', type=int, default=100000,
+                                help='循环评分较慢，只在不超过该数量时运行对照')
+    scoring_parser.add_argument('--top-n', type=int, default=50)
+
+    upload_parser = subparsers.add_parser('upload', help='1688上传图片的处理耗时和数据量')
+    upload_parser.add_argument('images', nargs='*', help='本地图片路径或图片URL，默认使用生成的测试图片')
+    upload_parser.add_argument('--sizes', type=int, nargs='+', default=[0, 1200, 800, 600, 480],
+                               help='上传前缩放的最大边长，0 表示原图')
+    upload_parser.add_argument('--quality', type=int, default=85)
+    upload_parser.add_argument('--repeat', type=int, default=5)
+    upload_parser.add_argument('--live', action='store_true', help='实际上传到1688，测量接口耗时')
+
+    args = parser.parse_args()
+    if args.command == 'import':
+        bench_import(args.modules, args.repeat)
+    elif args.command == 'scoring':
+        bench_scoring(args.count, args.legacy_limit, args.top_n)
+    elif args.command == 'upload':
+        bench_upload(args.images, args.sizes, args.quality, args.repeat, args.live)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+浏览器池
+
+启动浏览器并获取1688 token 需要数秒，这里把已初始化的浏览器保留在进程内重复使用：
+- BrowserService 是进程内常驻的浏览器服务，分析任务从中租用已就绪的浏览器，用完归还；
+  空闲超时的浏览器会被关闭，使用次数达到上限的浏览器会被回收重建
+- BrowserPool 在一次分析中从服务租用多个浏览器，把商品分配给空闲的浏览器并行搜索，
+  结果按提交顺序返回。每次搜索失败后会检查浏览器是否仍可用，不可用或连续失败过多时换用新的浏览器
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.util import Finalize
+from typing import Callable, Dict, Iterable, List, Optional
+
+# 默认浏览器数量，每个无头 Chrome 约占用 200-300MB 内存
+BROWSER_POOL_SIZE = int(os.environ.get('ECHOTIK_BROWSER_POOL_SIZE', '2'))
+# 浏览器空闲多久后关闭（秒）
+BROWSER_IDLE_TIMEOUT = float(os.environ.get('ECHOTIK_BROWSER_IDLE_TIMEOUT', '600'))
+# 每个浏览器最多执行多少次搜索后回收重建，避免长时间运行的浏览器占用内存持续增长
+BROWSER_MAX_USES = int(os.environ.get('ECHOTIK_BROWSER_MAX_USES', '200'))
+
+
+class BrowserService:
+    def __init__(self, factory: Callable[[], object], max_size: int = BROWSER_POOL_SIZE,
+                 idle_timeout: float = BROWSER_IDLE_TIMEOUT, max_uses: int = BROWSER_MAX_USES):
+        """初始化浏览器服务
+
+        Args:
+            factory: 创建工作实例的函数，实例需提供 init_browser()、close_browser() 和 is_alive()
+            max_size: 同时存在的浏览器上限
+            idle_timeout: 空闲超时（秒）
+            max_uses: 每个浏览器的最大使用次数
+        """
+        self.factory = factory
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.max_uses = max_uses
+        self._cond = threading.Condition()
+        self._idle: List[tuple] = []  # (实例, 归还时间)
+        self._uses: Dict[int, int] = {}
+        self._count = 0  # 已创建且未关闭的浏览器数量
+        self._closed = False
+        self._reaper: Optional[threading.Thread] = None
+        self._stats = {'leases': 0, 'created': 0, 'recycled': 0, 'idle_closed': 0, 'discarded': 0}
+
+    def lease(self):
+        """租用一个已就绪的浏览器，优先复用最近归还的；达到上限时等待其他任务归还"""
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise Exception("浏览器服务已关闭")
+                if self._idle:
+                    worker, _ = self._idle.pop()
+                    self._stats['leases'] += 1
+                    return worker
+                if self._count < self.max_size:
+                    self._count += 1
+                    break
+                self._cond.wait()
+
+        try:
+            worker = self.factory()
+            worker.init_browser()
+        except Exception:
+            with self._cond:
+                self._count -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._uses[id(worker)] = 0
+            self._stats['created'] += 1
+            self._stats['leases'] += 1
+        self._start_reaper()
+        return worker
+
+    def record_use(self, worker) -> bool:
+        """记录一次使用，返回是否已达到使用上限需要回收"""
+        with self._cond:
+            self._uses[id(worker)] = self._uses.get(id(worker), 0) + 1
+            return self._uses[id(worker)] >= self.max_uses
+
+    def release(self, worker):
+        """归还浏览器，已不可用或达到使用上限的浏览器直接关闭"""
+        with self._cond:
+            worn_out = self._uses.get(id(worker), 0) >= self.max_uses
+        if worn_out or self._closed or not worker.is_alive():
+            self.discard(worker, recycled=worn_out)
+            return
+        with self._cond:
+            self._idle.append((worker, time.time()))
+            self._cond.notify()
+
+    def discard(self, worker, recycled: bool = False):
+        """关闭浏览器并释放名额，recycled 表示因达到使用上限而回收"""
+        try:
+            worker.close_browser()
+        except Exception as e:
+            print(f"关闭浏览器失败: {str(e)}")
+        with self._cond:
+            self._uses.pop(id(worker), None)
+            self._count -= 1
+            self._stats['recycled' if recycled else 'discarded'] += 1
+            self._cond.notify()
+
+    def _start_reaper(self):
+        with self._cond:
+            if self._reaper is not None or not self.idle_timeout:
+                return
+            self._reaper = threading.Thread(target=self._reap, name='browser-reaper', daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        """定期关闭空闲超时的浏览器"""
+        interval = min(60.0, max(1.0, self.idle_timeout / 4))
+        while not self._closed:
+            time.sleep(interval)
+            now = time.time()
+            with self._cond:
+                expired = [w for w, released_at in self._idle if now - released_at >= self.idle_timeout]
+                self._idle = [(w, t) for w, t in self._idle if now - t < self.idle_timeout]
+                self._stats['idle_closed'] += len(expired)
+            for worker in expired:
+                self.discard(worker)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats['alive'] = self._count
+            stats['idle'] = len(self._idle)
+            return stats
+
+    def close(self):
+        """关闭所有空闲的浏览器，之后归还的浏览器也会直接关闭"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for worker, _ in idle:
+            self.discard(worker)
+
+
+_services: Dict[Callable, BrowserService] = {}
+_services_lock = threading.Lock()
+
+
+def get_browser_service(factory: Callable[[], object]) -> BrowserService:
+    """获取进程内常驻的浏览器服务（每种工作实例一个），进程退出时关闭所有浏览器"""
+    with _services_lock:
+        service = _services.get(factory)
+        if service is None:
+            service = BrowserService(factory)
+            _services[factory] = service
+            # 分析工作进程退出时不会执行 atexit，Finalize 在普通进程和工作进程退出时都会执行
+            Finalize(service, service.close, exitpriority=10)
+        return service
+
+
+class BrowserPool:
+    def __init__(self, service: BrowserService, size: int = BROWSER_POOL_SIZE, max_failures: int = 3):
+        """初始化一次分析使用的浏览器池
+
+        Args:
+            service: 提供浏览器的常驻服务
+            size: 并行使用的浏览器数量
+            max_failures: 同一浏览器连续失败（出错或无结果）多少次后换用新的浏览器
+        """
+        self.service = service
+        self.size = max(1, min(size, service.max_size))
+        self.max_failures = max_failures
+        self._workers: List[object] = []
+        self._failures: Dict[int, int] = {}
+        self._idle: queue.Queue = queue.Queue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats = {'tasks': 0, 'failures': 0, 'rebuilds': 0}
+
+    def start(self):
+        """并行租用所有浏览器（已就绪的直接复用），至少一个可用才可使用"""
+        with ThreadPoolExecutor(max_workers=self.size) as starter:
+            futures = [starter.submit(self.service.lease) for _ in range(self.size)]
+        for future in futures:
+            try:
+                worker = future.result()
+            except Exception as e:
+                print(f"× 启动浏览器失败: {str(e)}")
+                continue
+            self._workers.append(worker)
+            self._failures[id(worker)] = 0
+            self._idle.put(worker)
+
+        if not self._workers:
+            raise Exception("浏览器池启动失败，没有可用的浏览器")
+        self._executor = ThreadPoolExecutor(max_workers=len(self._workers), thread_name_prefix='browser')
+        print(f"✓ 浏览器池已就绪，共 {len(self._workers)} 个浏览器")
+
+    def _replace(self, worker, reason: str, recycled: bool = False):
+        """关闭浏览器并换用新的（先关闭以释放服务名额），新浏览器启动失败时返回 None"""
+        print(f"{reason}，正在更换浏览器...")
+        self.service.discard(worker, recycled=recycled)
+        try:
+            replacement = self.service.lease()
+        except Exception as e:
+            print(f"× 更换浏览器失败: {str(e)}")
+            replacement = None
+        with self._lock:
+            index = self._workers.index(worker)
+            self._failures.pop(id(worker), None)
+            if replacement is None:
+                self._workers.pop(index)
+            else:
+                self._workers[index] = replacement
+                self._failures[id(replacement)] = 0
+                self._stats['rebuilds'] += 1
+        return replacement
+
+    def _check(self, worker, failed: bool):
+        """健康检查：失败后浏览器不可用或连续失败过多时更换，达到使用上限时回收，返回之后使用的实例"""
+        worn_out = self.service.record_use(worker)
+        with self._lock:
+            if failed:
+                self._stats['failures'] += 1
+                self._failures[id(worker)] = self._failures.get(id(worker), 0) + 1
+            else:
+                self._failures[id(worker)] = 0
+            failures = self._failures[id(worker)]
+
+        if worn_out:
+            return self._replace(worker, "浏览器已达到使用次数上限", recycled=True)
+        if failed and (failures >= self.max_failures or not worker.is_alive()):
+            return self._replace(worker, f"浏览器不可用或连续失败 {failures} 次")
+        return worker
+
+    def _run(self, fn: Callable, item):
+        worker = self._idle.get()
+        if worker is None:
+            # 所有浏览器都已失效，让其余等待中的任务也直接失败
+            self._idle.put(None)
+            raise Exception("浏览器池中没有可用的浏览器")
+        failed = True
+        try:
+            result = fn(worker, item)
+            failed = not result
+            return result
+        finally:
+            with self._lock:
+                self._stats['tasks'] += 1
+            next_worker = self._check(worker, failed)
+            if next_worker is not None:
+                self._idle.put(next_worker)
+            elif not self._workers:
+                self._idle.put(None)
+
+    def submit_all(self, fn: Callable, items: Iterable) -> List[Future]:
+        """
+        为每个元素提交任务 fn(浏览器实例, 元素)，返回与 items 顺序一致的 Future 列表
+        调用方按顺序读取结果即可保持原有顺序，同时各浏览器并行执行
+        """
+        if self._executor is None:
+            raise Exception("浏览器池尚未启动")
+        return [self._executor.submit(self._run, fn, item) for item in items]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._workers)
+            return stats
+
+    def close(self):
+        """取消未开始的任务，把浏览器归还给服务"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        for worker in self._workers:
+            self.service.release(worker)
+        self._workers = []
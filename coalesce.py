@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class RequestCoalescer:
+    """
+    合并重复的爬取/分析请求
+
+    以规范化后的请求参数为键，记录正在执行或最近完成的任务。
+    窗口期内参数相同的新请求不再启动新的工作，而是挂到已有任务上：
+    - attach: 直接返回已有任务的ID
+    - follow: 创建跟随任务，领头任务结束时把结果同步给它
+    - off:    不合并，每个请求都启动新任务
+    """
+
+    POLICIES = ('attach', 'follow', 'off')
+
+    def __init__(self, window_seconds: float = 300, policy: str = 'attach'):
+        if policy not in self.POLICIES:
+            raise ValueError(f"不支持的合并策略: {policy}，可选: {', '.join(self.POLICIES)}")
+        self.window_seconds = window_seconds
+        self.policy = policy
+        self._jobs: Dict[Tuple, Dict] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.policy != 'off'
+
+    @staticmethod
+    def crawl_key(category_id: Optional[str], keyword: Optional[str]) -> Tuple:
+        """爬取请求的规范化键：去掉首尾空白，关键词合并空白并转小写"""
+        category = (category_id or '').strip()
+        kw = ' '.join((keyword or '').split()).lower()
+        return ('crawl', category, kw)
+
+    @staticmethod
+    def analyze_key(file_path: str, strategy: Optional[str], reports: Tuple = ()) -> Tuple:
+        """分析请求的规范化键：数据文件的绝对路径+修改时间、策略名，以及需要的附加报告"""
+        path = os.path.normcase(os.path.abspath(file_path))
+        try:
+            mtime = os.path.getmtime(file_path)
+        except OSError:
+            mtime = None
+        return ('analyze', path, mtime, (strategy or '').strip().lower(), tuple(sorted(reports)))
+
+    def _expire(self, now: float):
+        """清理超出窗口期的已完成任务"""
+        expired = [
+            key for key, job in self._jobs.items()
+            if job['finished_at'] is not None
+            and now - job['finished_at'] > self.window_seconds
+        ]
+        for key in expired:
+            del self._jobs[key]
+
+    def lookup(self, key: Tuple) -> Optional[Dict]:
+        """
+        查找可合并的任务
+        返回 {"task_id", "running", "result"}，没有可合并的任务时返回 None
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._expire(time.time())
+            job = self._jobs.get(key)
+            if not job:
+                return None
+            return {
+                'task_id': job['task_id'],
+                'running': job['finished_at'] is None,
+                'result': dict(job['result']) if job['result'] else None
+            }
+
+    def register(self, key: Tuple, task_id: str):
+        """登记一个新启动的领头任务"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._jobs[key] = {
+                'task_id': task_id,
+                'started_at': time.time(),
+                'finished_at': None,
+                'result': None,
+                'followers': []
+            }
+
+    def add_follower(self, key: Tuple, task_id: str) -> bool:
+        """把任务挂到正在执行的领头任务上，领头任务已结束时返回 False"""
+        with self._lock:
+            job = self._jobs.get(key)
+            if not job or job['finished_at'] is not None:
+                return False
+            if task_id != job['task_id'] and task_id not in job['followers']:
+                job['followers'].append(task_id)
+            return True
+
+    def finish(self, key: Tuple, result: Optional[Dict] = None) -> List[str]:
+        """
+        领头任务结束
+        result 为 None 表示失败，失败的任务会立即移除，后续请求会重新执行；
+        返回需要同步结果的跟随任务ID列表
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if not job:
+                return []
+            followers = job['followers']
+            if result is None:
+                del self._jobs[key]
+            else:
+                job['finished_at'] = time.time()
+                job['result'] = dict(result)
+                job['followers'] = []
+            return followers
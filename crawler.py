@@ -6,6 +6,8 @@ from datetime import datetime
 import random
 from typing import Dict, List, Optional
 import re
+from storage import get_storage, DATA_DIR
+from metrics import normalize_product
 
 class EchoTikCrawler:
     def __init__(self):
@@ -41,7 +43,8 @@ class EchoTikCrawler:
         }
         
         # 创建数据存储目录
-        self.data_dir = 'data'
+        self.storage = get_storage()
+        self.data_dir = self.storage.area_dir(DATA_DIR)
         os.makedirs(self.data_dir, exist_ok=True)
         
         # 请求配置
@@ -148,6 +151,7 @@ class EchoTikCrawler:
     def _save_data(self, all_products: List[Dict]):
         """
         保存商品数据到JSON文件，保留所有基础字段，排除复杂对象字段
+        价格、销量等指标同时保存解析后的数值列（<字段名>_num），供分析直接使用
         """
         simplified_products = []
         for product in all_products:
@@ -176,20 +180,20 @@ class EchoTikCrawler:
         
         # 如果文件已存在，读取已有数据并合并
         existing_products = []
-        if os.path.exists(filename):
+        if self.storage.exists(filename):
             try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    existing_products = json.load(f)
+                existing_products = self.storage.read_json(filename)
             except json.JSONDecodeError:
                 pass
         
         # 合并数据并去重（基于product_id）
         all_products_dict = {p['product_id']: p for p in existing_products + simplified_products}
-        final_products = list(all_products_dict.values())
+        final_products = [normalize_product(p) for p in all_products_dict.values()]
         
         # 保存数据
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(final_products, f, ensure_ascii=False, indent=2)
+        self.storage.discard_variants(filename)  # 旧的压缩版本已合并进新文件
         
         print(f"数据已保存到: {filename}")
         print(f"当前文件共包含 {len(final_products)} 个商品数据")
@@ -78,9 +78,12 @@ export const startAnalyze = async (taskId, strategy = "top50") => {
   }
 };
 
-export const getAnalysisResults = async (taskId) => {
+// 分析进行中时返回 cursor 之后新完成的商品（partial 为 true），下次请求原样传入返回的 cursor
+export const getAnalysisResults = async (taskId, cursor = null) => {
   try {
-    const response = await api.get(`/analysis/${taskId}`);
+    const response = await api.get(`/analysis/${taskId}`, {
+      params: { cursor },
+    });
     return response.data;
   } catch (error) {
     console.error("获取分析结果失败:", error);
@@ -0,0 +1,356 @@
+"""
+图片缓存
+
+同一张图片在一次分析中会被多处使用（Excel报告、1688上传、相似度比较），
+这里按URL和内容哈希统一缓存：内存中保存最近使用的图片（LRU），
+磁盘上以内容的 SHA-256 为文件名保存，相同内容的图片只存一份。
+两级缓存都有容量上限，超出后淘汰最久未使用的图片和 URL 索引。
+URL 到内容哈希的对应关系有有效期，过期后重新下载该URL，图片内容变化时随之更新。
+
+候选图片列表确定后可以调用 prefetch 在后台线程池中并发下载（按域名限制并发数，失败自动重试），
+之后的读取会等待进行中的下载，而不会重复下载。
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from storage import get_storage, IMAGE_DIR
+
+# 下载图片时使用的默认请求头
+IMAGE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
+    'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+}
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def download(url: str, timeout: float = 10) -> bytes:
+    """默认下载函数，HTTP 状态异常时抛出 requests.HTTPError"""
+    response = requests.get(url, headers=IMAGE_HEADERS, timeout=timeout)
+    response.raise_for_status()
+    return response.content
+
+
+class ImageCache:
+    # 内存中最多记录的 URL 索引数量
+    URL_MEMORY_ENTRIES = 50000
+
+    def __init__(self, cache_dir: str, memory_limit_mb: float = 64, disk_limit_mb: float = 512,
+                 prefetch_workers: int = 8, per_host_limit: int = 4, prefetch_retries: int = 2,
+                 url_ttl_hours: float = 72):
+        """初始化图片缓存
+
+        Args:
+            cache_dir: 磁盘缓存目录
+            memory_limit_mb: 内存缓存上限（MB）
+            disk_limit_mb: 磁盘缓存上限（MB，包括图片和 URL 索引）
+            prefetch_workers: 预取线程数
+            per_host_limit: 同一域名的最大并发下载数
+            prefetch_retries: 预取失败后的重试次数
+            url_ttl_hours: URL 到内容哈希对应关系的有效期（小时）
+        """
+        self.blob_dir = os.path.join(cache_dir, 'blobs')
+        self.url_dir = os.path.join(cache_dir, 'urls')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.url_dir, exist_ok=True)
+
+        self.memory_limit = int(memory_limit_mb * 1024 * 1024)
+        self.disk_limit = int(disk_limit_mb * 1024 * 1024)
+        self.url_ttl = url_ttl_hours * 3600
+
+        self._memory = OrderedDict()  # 内容哈希 -> 图片数据
+        self._memory_bytes = 0
+        self._url_hashes = OrderedDict()  # URL -> (内容哈希, 记录时间)
+        self._lock = threading.RLock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0,
+                       'downloads': 0, 'download_failures': 0, 'evictions': 0}
+        self._disk_bytes = sum(entry.stat().st_size for entry in self._disk_entries())
+
+        self.prefetch_workers = prefetch_workers
+        self.per_host_limit = per_host_limit
+        self.prefetch_retries = prefetch_retries
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[str, Future] = {}  # URL -> 进行中的预取
+        self._host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest)
+
+    def _url_path(self, url: str) -> str:
+        return os.path.join(self.url_dir, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+    def _disk_entries(self) -> list:
+        """磁盘上的图片和 URL 索引文件（不含写入中的临时文件）"""
+        return [entry for directory in (self.blob_dir, self.url_dir) for entry in os.scandir(directory)
+                if entry.is_file() and not entry.name.endswith('.tmp')]
+
+    # ---- 内部读写 ----
+
+    def _remember(self, digest: str, content: bytes):
+        """放入内存 LRU，超出上限时淘汰最久未使用的图片"""
+        if len(content) > self.memory_limit:
+            return
+        if digest in self._memory:
+            self._memory.move_to_end(digest)
+            return
+        self._memory[digest] = content
+        self._memory_bytes += len(content)
+        while self._memory_bytes > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _remember_url(self, url: str, digest: str, recorded_at: float):
+        self._url_hashes[url] = (digest, recorded_at)
+        self._url_hashes.move_to_end(url)
+        while len(self._url_hashes) > self.URL_MEMORY_ENTRIES:
+            self._url_hashes.popitem(last=False)
+
+    def _read_index(self, url: str) -> Optional[tuple]:
+        """读取磁盘上的 URL 索引，返回 (内容哈希, 记录时间)；不存在或已过期时返回 None"""
+        path = self._url_path(url)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                digest = f.read().strip()
+            recorded_at = os.stat(path).st_mtime
+            if time.time() - recorded_at > self.url_ttl:
+                return None
+            # 修改时间是记录时间，访问时间供磁盘淘汰使用
+            os.utime(path, (time.time(), recorded_at))
+        except OSError:
+            return None
+        return (digest, recorded_at) if digest else None
+
+    def _lookup_hash(self, url: str) -> Optional[str]:
+        """返回有效期内URL对应的内容哈希，磁盘读取在锁外进行"""
+        with self._lock:
+            entry = self._url_hashes.get(url)
+            if entry and time.time() - entry[1] <= self.url_ttl:
+                return entry[0]
+        entry = self._read_index(url)
+        if entry is None:
+            return None
+        with self._lock:
+            self._remember_url(url, *entry)
+        return entry[0]
+
+    def _read_blob(self, digest: str) -> Optional[bytes]:
+        path = self._blob_path(digest)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            os.utime(path, None)  # 记录访问时间，供磁盘淘汰使用
+            return content
+        except OSError:
+            return None
+
+    def _write_atomic(self, path: str, data: bytes):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _evict_disk(self):
+        """磁盘缓存超出上限时，按访问时间淘汰最久未使用的图片和 URL 索引"""
+        if self._disk_bytes <= self.disk_limit:
+            return
+        # 存储清理线程也会淘汰缓存文件，跳过扫描后已被删除的文件，并以实际占用为准
+        entries = []
+        for entry in self._disk_entries():
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((max(st.st_atime, st.st_mtime), st.st_size, entry.path))
+        entries.sort()
+        self._disk_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._disk_bytes <= self.disk_limit * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._disk_bytes -= size
+            self._stats['evictions'] += 1
+            evicted = self._memory.pop(os.path.basename(path), None)
+            if evicted is not None:
+                self._memory_bytes -= len(evicted)
+
+    # ---- 对外接口 ----
+
+    def _is_cached(self, url: str) -> bool:
+        """不计入统计地检查图片是否已缓存"""
+        digest = self._lookup_hash(url)
+        return bool(digest) and (digest in self._memory or os.path.exists(self._blob_path(digest)))
+
+    def _wait_inflight(self, url: str):
+        """等待该URL进行中的预取完成，预取失败时由调用方自行下载"""
+        with self._lock:
+            future = self._inflight.get(url)
+        if future is not None:
+            try:
+                future.result()
+            except Exception:
+                pass
+
+    def get(self, url: str) -> Optional[bytes]:
+        """读取缓存的图片，未命中返回 None"""
+        if not url:
+            return None
+        self._wait_inflight(url)
+        digest = self._lookup_hash(url)
+        if digest:
+            with self._lock:
+                content = self._memory.get(digest)
+                if content is not None:
+                    self._memory.move_to_end(digest)
+                    self._stats['memory_hits'] += 1
+                    return content
+            # 读取磁盘时不持有锁，其他线程的内存命中不必等待
+            content = self._read_blob(digest)
+            with self._lock:
+                if content is not None:
+                    self._remember(digest, content)
+                    self._stats['disk_hits'] += 1
+                    return content
+                self._url_hashes.pop(url, None)
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, url: str, content: bytes) -> str:
+        """保存图片，返回内容哈希"""
+        digest = content_hash(content)
+        with self._lock:
+            blob_path = self._blob_path(digest)
+            if not os.path.exists(blob_path):
+                self._write_atomic(blob_path, content)
+                self._disk_bytes += len(content)
+            url_path = self._url_path(url)
+            if not os.path.exists(url_path):
+                self._disk_bytes += len(digest)
+            self._write_atomic(url_path, digest.encode('utf-8'))
+            self._remember_url(url, digest, time.time())
+            self._remember(digest, content)
+            self._evict_disk()
+        return digest
+
+    def fetch(self, url: str, downloader: Optional[Callable[[str], Optional[bytes]]] = None) -> Optional[bytes]:
+        """读取图片，未命中时用 downloader 下载并写入缓存；下载失败时异常会向上抛出"""
+        content = self.get(url)
+        if content is not None:
+            return content
+        try:
+            content = (downloader or download)(url)
+        except Exception:
+            with self._lock:
+                self._stats['download_failures'] += 1
+            raise
+        with self._lock:
+            self._stats['downloads'] += 1
+        if not content:
+            return None
+        self.put(url, content)
+        return content
+
+    def _host_semaphore(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self._lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_semaphores[host] = semaphore
+            return semaphore
+
+    def _prefetch_one(self, url: str, downloader: Callable[[str], Optional[bytes]]) -> Optional[bytes]:
+        """后台下载单张图片，失败时按 1s、2s... 退避重试"""
+        try:
+            last_error = None
+            for attempt in range(self.prefetch_retries + 1):
+                try:
+                    with self._host_semaphore(url):
+                        content = downloader(url)
+                    with self._lock:
+                        self._stats['downloads'] += 1
+                    if content:
+                        self.put(url, content)
+                    return content
+                except Exception as e:
+                    last_error = e
+                    if attempt < self.prefetch_retries:
+                        time.sleep(attempt + 1)
+            with self._lock:
+                self._stats['download_failures'] += 1
+            print(f"预取图片失败 {url}: {last_error}")
+            raise last_error
+        finally:
+            with self._lock:
+                self._inflight.pop(url, None)
+
+    def prefetch(self, urls: Iterable[str],
+                 downloader: Optional[Callable[[str], Optional[bytes]]] = None) -> Dict[str, Future]:
+        """
+        在后台并发下载尚未缓存的图片，立即返回 URL 到 Future 的映射
+        已缓存或正在下载的图片不会重复下载
+        """
+        futures = {}
+        # 先在锁外检查哪些图片已缓存（需要读取磁盘）
+        urls = [url for url in dict.fromkeys(urls) if url and not self._is_cached(url)]
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.prefetch_workers,
+                                                    thread_name_prefix='image-prefetch')
+            for url in urls:
+                if url in self._inflight:
+                    futures[url] = self._inflight[url]
+                    continue
+                future = self._executor.submit(self._prefetch_one, url, downloader or download)
+                self._inflight[url] = future
+                futures[url] = future
+        return futures
+
+    def hash_of(self, url: str) -> Optional[str]:
+        """返回已缓存图片的内容哈希（URL 索引过期时返回 None）"""
+        return self._lookup_hash(url)
+
+    def stats(self) -> Dict:
+        """命中率等统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+            stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 4) if lookups else 0.0
+            stats['memory_bytes'] = self._memory_bytes
+            stats['disk_bytes'] = self._disk_bytes
+            stats['inflight'] = len(self._inflight)
+            return stats
+
+
+_image_cache: Optional[ImageCache] = None
+_image_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> ImageCache:
+    """获取全局图片缓存，磁盘目录位于 product_images/cache"""
+    global _image_cache
+    with _image_cache_lock:
+        if _image_cache is None:
+            _image_cache = ImageCache(
+                os.path.join(get_storage().area_dir(IMAGE_DIR), 'cache'),
+                memory_limit_mb=float(os.environ.get('ECHOTIK_IMAGE_MEMORY_CACHE_MB', '64')),
+                disk_limit_mb=float(os.environ.get('ECHOTIK_IMAGE_CACHE_MB', '512')),
+                prefetch_workers=int(os.environ.get('ECHOTIK_IMAGE_PREFETCH_WORKERS', '8')),
+                per_host_limit=int(os.environ.get('ECHOTIK_IMAGE_PER_HOST', '4')),
+                url_ttl_hours=float(os.environ.get('ECHOTIK_IMAGE_URL_TTL_HOURS', '72'))
+            )
+    return _image_cache
@@ -0,0 +1,250 @@
+"""
+1688匹配结果报告
+
+匹配阶段为每个商品生成一个 ProductMatch（商品信息、1688搜索结果、方案一和方案二的匹配结果），
+报告由多个渲染器在一次遍历中消费同一组结果：
+- Scheme1SheetRenderer：方案一工作表，写入前3个搜索结果
+- Scheme2SheetRenderer：方案二工作表，写入相似度达标的结果（至少2个时）
+- JsonRenderer：写入分析结果 JSON 数据
+工作表共用 ReportAssets 中的缩略图文件，同一图片只下载、缩放一次，在 xlsx 中也只保存一份。
+"""
+from typing import Dict, List, Optional
+
+from report_writer import ReportWriter
+from thumbnails import get_thumbnail_store, CELL_SIZE
+
+SCHEME1_SHEET = '方案一结果'
+SCHEME2_SHEET = '方案二结果'
+
+# 两个工作表结构相同
+MATCH_REPORT_HEADERS = [
+    '商品ID', '商品名称', '类别', '价格', '7天销量', '达人数量', '商品评分', '商品图片',
+    '1688商品1', '1688链接1', '1688商品2', '1688链接2', '1688商品3', '1688链接3'
+]
+
+SCHEME1_LIMIT = 3        # 方案一保存的搜索结果数量
+SCHEME2_CANDIDATES = 10  # 方案二参与相似度比较的搜索结果数量
+SCHEME2_MIN_MATCHES = 2  # 方案二至少需要的高相似度结果数量
+REPORT_MATCHES = 3       # 每个工作表最多写入的匹配结果数量
+
+
+class ProductMatch:
+    def __init__(self, product: Dict, offers: List[Dict], scheme1: List[Dict], scheme2: List[Dict]):
+        """一个商品的匹配结果
+
+        Args:
+            product: 商品数据
+            offers: 1688搜索结果
+            scheme1: 方案一结果（前几个搜索结果）
+            scheme2: 方案二结果（相似度达标的搜索结果，按搜索结果顺序，带 similarity 字段）
+        """
+        self.product = product
+        self.offers = offers
+        self.scheme1 = scheme1
+        self.scheme2 = scheme2
+
+    @property
+    def scheme2_valid(self) -> bool:
+        """方案二是否有效（两个以上高相似度商品）"""
+        return len(self.scheme2) >= SCHEME2_MIN_MATCHES
+
+    def scheme2_top(self, limit: int = REPORT_MATCHES) -> List[Dict]:
+        """相似度最高的方案二结果，方案二无效时为空"""
+        if not self.scheme2_valid:
+            return []
+        return sorted(self.scheme2, key=lambda x: x['similarity'], reverse=True)[:limit]
+
+    def to_record(self) -> Dict:
+        """检查点日志中保存的数据，可用 from_record 还原"""
+        return {
+            "product_id": self.product['product_id'],
+            "cover_url": self.product['cover_url'],
+            "cover_hash": self.product.get('cover_hash'),
+            "offers": self.offers,
+            "scheme2": self.scheme2,
+            "result": self.to_dict()  # 分析进行中读取结果时使用
+        }
+
+    @classmethod
+    def from_record(cls, product: Dict, record: Dict) -> 'ProductMatch':
+        offers = record.get('offers') or []
+        return cls(product, offers, offers[:SCHEME1_LIMIT], record.get('scheme2') or [])
+
+    def to_dict(self) -> Dict:
+        """分析结果 JSON 中的商品数据"""
+        product = self.product
+        return {
+            "product_id": product['product_id'],
+            "product_name": product['product_name'],
+            "cover_url": product['cover_url'],
+            "cover_hash": product.get('cover_hash'),
+            "category": product.get('category', ''),
+            "avg_price": product.get('avg_price', ''),
+            "total_sale_nd_cnt": product.get('total_sale_nd_cnt', ''),
+            "influencers_count": product.get('influencers_count', ''),
+            "product_rating": product.get('product_rating', ''),
+            "matches_1": [_offer_dict(offer) for offer in self.scheme1],
+            "matches_2": [dict(_offer_dict(offer), similarity=float(offer['similarity'])) for offer in self.scheme2]
+        }
+
+
+def _offer_dict(offer: Dict) -> Dict:
+    return {
+        "image_url": offer['image_url'],
+        "product_url": offer['product_url'],
+        "title": offer.get('title', ''),
+        "price": offer.get('price', '')
+    }
+
+
+def match_product(product: Dict, offers: List[Dict], matcher) -> ProductMatch:
+    """
+    匹配阶段：方案一取前3个搜索结果，方案二用 matcher.match_many 比较前10个结果的图片相似度
+    matcher 需提供 match_many(原图URL, 候选图片URL列表) 和 similarity_threshold
+    """
+    candidates = offers[:SCHEME2_CANDIDATES]
+    similarities = matcher.match_many(product['cover_url'], [offer['image_url'] for offer in candidates])
+    scheme2 = [
+        {**offer, 'similarity': float(similarity)}
+        for offer, similarity in zip(candidates, similarities)
+        if similarity >= matcher.similarity_threshold
+    ]
+    return ProductMatch(product, offers, offers[:SCHEME1_LIMIT], scheme2)
+
+
+class ReportAssets:
+    def __init__(self, size=CELL_SIZE):
+        """报告中共用的图片：图片URL到缩略图文件路径，每张图片只查找或生成一次"""
+        self.size = size
+        self._paths: Dict[str, Optional[str]] = {}
+
+    def path(self, image_url: str) -> Optional[str]:
+        if image_url not in self._paths:
+            self._paths[image_url] = get_thumbnail_store().path(image_url, self.size)
+        return self._paths[image_url]
+
+
+class SheetRenderer:
+    sheet = ''
+
+    def __init__(self, writer: ReportWriter, assets: ReportAssets):
+        self.writer = writer
+        self.assets = assets
+
+    def _write_row(self, product: Dict, matches: List[Dict], links: List[str]):
+        """写入商品基础数据、商品原图和最多3个匹配结果的图片和链接"""
+        values = [
+            product['product_id'],
+            product['product_name'],
+            product.get('category', ''),
+            product.get('avg_price', ''),
+            product.get('total_sale_nd_cnt', ''),
+            product.get('influencers_count', ''),
+            product.get('product_rating', ''),
+            None
+        ]
+        image_urls = {8: product['cover_url']}
+        for i, (match, link) in enumerate(zip(matches[:REPORT_MATCHES], links), 1):
+            image_urls[8 + i * 2 - 1] = match['image_url']
+            values += [None, link]
+
+        images = {}
+        for col, image_url in image_urls.items():
+            images[col] = self.assets.path(image_url)
+            if not images[col]:
+                print(f"插入图片时出错: 无法获取图片: {image_url}")
+                values[col - 1] = "图片加载失败"
+        self.writer.add_row(self.sheet, values, images=images, height=90)
+
+
+class Scheme1SheetRenderer(SheetRenderer):
+    """方案一：前3个搜索结果的图片和链接"""
+    sheet = SCHEME1_SHEET
+
+    def render(self, match: ProductMatch):
+        self._write_row(match.product, match.scheme1, [offer['product_url'] for offer in match.scheme1])
+
+
+class Scheme2SheetRenderer(SheetRenderer):
+    """方案二：相似度最高的结果的图片、相似度和链接"""
+    sheet = SCHEME2_SHEET
+
+    def __init__(self, writer: ReportWriter, assets: ReportAssets, only_valid: bool = False):
+        super().__init__(writer, assets)
+        self.only_valid = only_valid  # 为 True 时只写入方案二有效的商品
+
+    def render(self, match: ProductMatch):
+        if self.only_valid and not match.scheme2_valid:
+            return
+        top = match.scheme2_top()
+        self._write_row(match.product, top, [
+            f"相似度: {offer['similarity']:.4f}\n链接: {offer['product_url']}" for offer in top
+        ])
+
+
+class JsonRenderer:
+    def __init__(self, results: Dict):
+        """把匹配结果写入分析结果数据 {"products": [...], "summary": {...}}"""
+        self.results = results
+        summary = results.setdefault("summary", {})
+        for key in ('processed_count', 'scheme1_count', 'scheme2_count'):
+            summary.setdefault(key, 0)
+        results.setdefault("products", [])
+
+    def render(self, match: ProductMatch):
+        summary = self.results["summary"]
+        summary["processed_count"] += 1
+        if match.scheme2_valid:
+            summary["scheme2_count"] += 1
+        product_result = match.to_dict()
+        if product_result["matches_1"] or product_result["matches_2"]:
+            self.results["products"].append(product_result)
+            if product_result["matches_1"]:
+                summary["scheme1_count"] += 1
+
+
+class MatchReportBuilder:
+    def __init__(self, renderers: List, writer: Optional[ReportWriter] = None):
+        """在一次遍历中把每个商品的匹配结果交给所有渲染器
+
+        Args:
+            renderers: 渲染器列表，每个渲染器提供 render(ProductMatch)
+            writer: 工作表渲染器共用的 Excel 报告，close 时保存
+        """
+        self.renderers = renderers
+        self.writer = writer
+        self.processed = 0
+        self.scheme2_valid = 0
+
+    def add(self, match: ProductMatch):
+        self.processed += 1
+        if match.scheme2_valid:
+            self.scheme2_valid += 1
+        for renderer in self.renderers:
+            renderer.render(match)
+
+    def close(self) -> List[str]:
+        """保存 Excel 报告，返回生成的文件（行数过多时拆分为多个文件）"""
+        return self.writer.close() if self.writer else []
+
+
+def create_match_report(excel_file: str, results: Optional[Dict] = None,
+                        sheets=(SCHEME1_SHEET, SCHEME2_SHEET), only_valid: bool = False) -> MatchReportBuilder:
+    """
+    创建匹配结果报告：sheets 中的工作表，传入 results 时同时写入分析结果 JSON 数据
+    only_valid 为 True 时方案二工作表只写入方案二有效的商品
+    """
+    writer = ReportWriter(
+        excel_file,
+        {sheet: MATCH_REPORT_HEADERS for sheet in sheets},
+        column_widths={col: 18 for col in (8, 9, 11, 13)}  # 图片列
+    )
+    assets = ReportAssets()
+    renderers = []
+    if SCHEME1_SHEET in sheets:
+        renderers.append(Scheme1SheetRenderer(writer, assets))
+    if SCHEME2_SHEET in sheets:
+        renderers.append(Scheme2SheetRenderer(writer, assets, only_valid=only_valid))
+    if results is not None:
+        renderers.append(JsonRenderer(results))
+    return MatchReportBuilder(renderers, writer)
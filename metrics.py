@@ -0,0 +1,101 @@
+"""
+商品指标解析规则
+
+EchoTik 返回的指标都是展示用的字符串（如 "RM10.00"、"39.4K"、"4.8"、"10%"）。
+爬虫入库时用这里的规则把它们解析成数值，以 "<字段名>_num" 的形式和原始字符串一起保存，
+分析时直接读取数值列，不再逐条解析。
+
+解析结果约定：
+- 空值、"N/A" 记为 0.0
+- 格式无法识别的值（如 "1.2.3"）记为 None，分析时会被排除
+"""
+import re
+from typing import Callable, Dict, Optional
+
+NUMERIC_SUFFIX = '_num'
+
+_PRICE_PATTERN = re.compile(r'RM([\d.]+)')
+_COUNT_PATTERN = re.compile(r'([\d.]+)([KM])?')
+_NUMBER_PATTERN = re.compile(r'([\d.]+)')
+_COUNT_MULTIPLIERS = {'K': 1000, 'M': 1000000}
+
+
+def _is_empty(value) -> bool:
+    return value is None or value == '' or value == 'N/A'
+
+
+def _to_float(text: str) -> Optional[float]:
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_price(value) -> Optional[float]:
+    """价格字符串（如 "RM10.00"）转换为数字"""
+    if _is_empty(value):
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    # 提取数字部分（去掉RM前缀）
+    match = _PRICE_PATTERN.search(str(value))
+    if match:
+        return _to_float(match.group(1))
+    return 0.0
+
+
+def parse_count(value) -> Optional[float]:
+    """数量字符串（如 "1.5K", "2.3M"）转换为数字"""
+    if _is_empty(value):
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _COUNT_PATTERN.search(str(value))
+    if match:
+        number = _to_float(match.group(1))
+        if number is not None and match.group(2):
+            number *= _COUNT_MULTIPLIERS[match.group(2)]
+        return number
+    return 0.0
+
+
+def parse_number(value) -> Optional[float]:
+    """普通数字字符串（如商品评分 "4.8"、佣金比例 "10%"）转换为数字"""
+    if _is_empty(value):
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER_PATTERN.search(str(value))
+    if match:
+        return _to_float(match.group(1))
+    return 0.0
+
+
+# 需要在入库时解析的字段及其解析规则
+NUMERIC_FIELDS: Dict[str, Callable] = {
+    'avg_price': parse_price,
+    'min_price': parse_price,
+    'max_price': parse_price,
+    'total_sale_nd_cnt': parse_count,
+    'total_sale_cnt': parse_count,
+    'total_sale_gmv_nd_amt': parse_price,
+    'total_sale_gmv_amt': parse_price,
+    'influencers_count': parse_count,
+    'total_video_cnt': parse_count,
+    'total_views_cnt': parse_count,
+    'product_rating': parse_number,
+    'commission_rate': parse_number,
+}
+
+
+def numeric_field(field: str) -> str:
+    """返回字段对应的数值列名"""
+    return field + NUMERIC_SUFFIX
+
+
+def normalize_product(product: Dict) -> Dict:
+    """为商品补充数值列（原地修改并返回），原始字符串保持不变"""
+    for field, parse in NUMERIC_FIELDS.items():
+        if field in product:
+            product[numeric_field(field)] = parse(product[field])
+    return product
@@ -0,0 +1,124 @@
+"""
+1688 mtop 接口 token 管理
+
+mtop 接口的签名依赖 _m_h5_tk cookie，格式为 "<token>_<过期时间戳(毫秒)>"，
+请求时还需要带上同时下发的 _m_h5_tk_enc cookie。token 过期后接口返回 FAIL_SYS_TOKEN_* 错误，
+同时在响应中下发新的 cookie，因此刷新 token 不需要重新打开浏览器。
+
+TokenManager 在进程内所有搜索器之间共享：浏览器只在首次获取 token 时使用，
+之后在即将过期时主动刷新，或在遇到 token 错误时从响应 cookie 中更新。
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+TOKEN_COOKIE = '_m_h5_tk'
+TOKEN_COOKIES = ('_m_h5_tk', '_m_h5_tk_enc')
+
+# 接口返回这些错误码时说明 token 失效，需要刷新后重试
+TOKEN_ERROR_PREFIXES = ('FAIL_SYS_TOKEN', 'FAIL_SYS_ILLEGAL_ACCESS')
+
+
+def is_token_error(ret: str) -> bool:
+    return bool(ret) and ret.startswith(TOKEN_ERROR_PREFIXES)
+
+
+def parse_token(value: str) -> Tuple[str, float]:
+    """解析 _m_h5_tk 的值，返回 (token, 过期时间秒)，无法识别过期时间时为 0"""
+    token, _, expiry = value.partition('_')
+    try:
+        expires_at = int(expiry) / 1000
+    except ValueError:
+        expires_at = 0.0
+    return token, expires_at
+
+
+class TokenManager:
+    def __init__(self, refresh_margin_seconds: float = 60):
+        """初始化 token 管理器
+
+        Args:
+            refresh_margin_seconds: 距离过期不足该时间时主动刷新
+        """
+        self.refresh_margin = refresh_margin_seconds
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._cookies: Dict[str, str] = {}
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._version = 0  # 每次更新 token 加一，用于合并并发的刷新
+        self._stats = {'updates': 0, 'refreshes': 0, 'token_errors': 0}
+
+    def update(self, cookies: Iterable[Tuple[str, str]]) -> bool:
+        """从 (名称, 值) 列表中读取 token cookie（浏览器或接口响应），有新 token 时返回 True"""
+        found = {name: value for name, value in cookies if name in TOKEN_COOKIES and value}
+        if TOKEN_COOKIE not in found:
+            return False
+        token, expires_at = parse_token(found[TOKEN_COOKIE])
+        with self._lock:
+            if token == self._token:
+                return False
+            self._cookies.update(found)
+            self._token = token
+            self._expires_at = expires_at
+            self._version += 1
+            self._stats['updates'] += 1
+        return True
+
+    def current(self) -> Tuple[Optional[str], Dict[str, str]]:
+        """返回当前的 token 和需要随请求发送的 cookie"""
+        with self._lock:
+            return self._token, dict(self._cookies)
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            return self._version
+
+    def needs_refresh(self) -> bool:
+        with self._lock:
+            if not self._token:
+                return True
+            return bool(self._expires_at) and self._expires_at - time.time() < self.refresh_margin
+
+    def refresh(self, fetch: Callable[[], Iterable[Tuple[str, str]]], seen_version: Optional[int] = None) -> bool:
+        """
+        刷新 token：fetch 发起一次不带有效签名的接口请求并返回响应 cookie
+        seen_version 为调用方使用的 token 版本，其他线程已刷新过时直接返回，避免重复刷新
+        """
+        with self._refresh_lock:
+            if seen_version is not None and self.version != seen_version:
+                return True
+            with self._lock:
+                self._stats['refreshes'] += 1
+            try:
+                return self.update(fetch())
+            except Exception as e:
+                print(f"刷新1688 token失败: {str(e)}")
+                return False
+
+    def record_token_error(self):
+        with self._lock:
+            self._stats['token_errors'] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['expires_in'] = round(self._expires_at - time.time()) if self._expires_at else None
+            return stats
+
+
+_token_manager: Optional[TokenManager] = None
+_token_manager_lock = threading.Lock()
+
+
+def get_token_manager() -> TokenManager:
+    """获取进程内共享的 token 管理器"""
+    global _token_manager
+    with _token_manager_lock:
+        if _token_manager is None:
+            _token_manager = TokenManager(
+                refresh_margin_seconds=float(os.environ.get('ECHOTIK_1688_TOKEN_REFRESH_MARGIN', '60'))
+            )
+    return _token_manager
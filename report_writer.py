@@ -0,0 +1,200 @@
+"""
+流式 Excel 报告
+
+openpyxl 的普通 Workbook 会把所有单元格和嵌入图片的数据保留在内存中直到保存，
+报告越大占用内存越多。ReportWriter 改用 write-only 模式：
+- 每行写完立即写入临时文件，内存中不保留单元格
+- 图片以磁盘路径（缩略图文件）引用，保存时才逐个读入压缩包；同一图片文件在压缩包中只保存一份，
+  多个工作表、多个单元格引用同一图片时共用
+- 单个工作表行数超过上限时在新工作表中继续，单个文件行数超过上限时拆分为多个文件
+"""
+import copy
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from zipfile import ZipFile, ZIP_DEFLATED
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.drawing.image import Image
+from openpyxl.drawing.spreadsheet_drawing import AnchorMarker, TwoCellAnchor
+from openpyxl.packaging.relationship import get_rels_path
+from openpyxl.utils import get_column_letter
+from openpyxl.writer.excel import ExcelWriter
+from openpyxl.xml.functions import tostring
+
+# 每个工作表的最大数据行数，超出后在新工作表中继续
+REPORT_SHEET_ROWS = int(os.environ.get('ECHOTIK_REPORT_SHEET_ROWS', '500'))
+# 每个文件的最大数据行数（所有工作表合计），超出后拆分为新文件；
+# 图片锚点要到保存时才写出，内存占用与单个文件中的图片数量成正比
+REPORT_FILE_ROWS = int(os.environ.get('ECHOTIK_REPORT_FILE_ROWS', '2000'))
+
+# 图片铺满单元格时距单元格边缘的偏移（EMU）
+_IMAGE_MARGIN = 50000
+
+
+class _DedupExcelWriter(ExcelWriter):
+    """按图片文件路径去重的 ExcelWriter，相同图片在压缩包中只写入一次"""
+
+    def __init__(self, workbook, archive):
+        super().__init__(workbook, archive)
+        self._media_ids: Dict[str, int] = {}
+
+    def _write_drawing(self, drawing):
+        self._drawings.append(drawing)
+        drawing._id = len(self._drawings)
+        for chart in drawing.charts:
+            self._charts.append(chart)
+            chart._id = len(self._charts)
+        for img in drawing.images:
+            key = img.ref if isinstance(img.ref, str) else f"obj:{id(img)}"
+            if key not in self._media_ids:
+                self._images.append(img)
+                self._media_ids[key] = len(self._images)
+            img._id = self._media_ids[key]
+        rels_path = get_rels_path(drawing.path)[1:]
+        self._archive.writestr(drawing.path[1:], tostring(drawing._write()))
+        self._archive.writestr(rels_path, tostring(drawing._write_rels()))
+        self.manifest.append(drawing)
+
+
+class ReportWriter:
+    def __init__(self, path: str, sheets: Dict[str, List[str]],
+                 column_widths: Optional[Dict[int, float]] = None,
+                 header_style: Optional[Dict] = None,
+                 cell_style: Optional[Dict] = None,
+                 fit_images: bool = False,
+                 sheet_rows: int = REPORT_SHEET_ROWS,
+                 file_rows: int = REPORT_FILE_ROWS):
+        """初始化报告
+
+        Args:
+            path: 报告文件路径，拆分时依次为 <名称>_part2.xlsx、<名称>_part3.xlsx ...
+            sheets: 工作表名到表头的映射（表头为空列表时不写表头）
+            column_widths: 列号（从1开始）到列宽的映射，所有工作表共用
+            header_style / cell_style: 表头和数据单元格的样式，如 {'font': ..., 'fill': ..., 'alignment': ..., 'border': ...}
+            fit_images: 图片是否缩放铺满单元格（否则按原始大小放在单元格左上角）
+            sheet_rows: 每个工作表的最大数据行数
+            file_rows: 每个文件的最大数据行数
+        """
+        self.path = path
+        self.headers = sheets
+        self.column_widths = column_widths or {}
+        self.header_style = header_style or {}
+        self.cell_style = cell_style or {}
+        self.fit_images = fit_images
+        self.sheet_rows = max(1, sheet_rows)
+        self.file_rows = max(1, file_rows)
+
+        self.files: List[str] = []
+        self._workbook: Optional[Workbook] = None
+        self._sheets: Dict[str, tuple] = {}  # 工作表名 -> (当前工作表, 数据行数, 序号)
+        self._file_rows = 0
+        self._images = 0
+        self._prototypes: Dict[str, Image] = {}  # 图片路径 -> 已读取尺寸的图片对象，同一图片只打开一次
+
+    # ---- 工作簿和工作表 ----
+
+    def _file_path(self) -> str:
+        if not self.files:
+            return self.path
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}_part{len(self.files) + 1}{ext}"
+
+    def _open_workbook(self):
+        self._workbook = Workbook(write_only=True)
+        self._sheets = {}
+        self._file_rows = 0
+        # 按声明顺序创建工作表，保证每个文件中的工作表顺序一致
+        for name in self.headers:
+            self._new_sheet(name, 1)
+
+    def _new_sheet(self, name: str, index: int):
+        title = name if index == 1 else f"{name} ({index})"
+        ws = self._workbook.create_sheet(title[:31])
+        for col, width in self.column_widths.items():
+            ws.column_dimensions[get_column_letter(col)].width = width
+        headers = self.headers[name]
+        if headers:
+            ws.freeze_panes = 'A2'
+            ws.append([self._cell(ws, value, self.header_style) for value in headers])
+        self._sheets[name] = (ws, 0, index)
+
+    def _cell(self, ws, value, style: Dict):
+        if not style:
+            return value
+        cell = WriteOnlyCell(ws, value=value)
+        for attr, style_value in style.items():
+            setattr(cell, attr, style_value)
+        return cell
+
+    def _save_workbook(self):
+        """保存当前文件：各工作表的行已在临时文件中，图片在这里逐个从磁盘读入"""
+        path = self._file_path()
+        self._workbook.properties.modified = datetime.now(timezone.utc).replace(tzinfo=None)
+        with ZipFile(path, 'w', ZIP_DEFLATED, allowZip64=True) as archive:
+            _DedupExcelWriter(self._workbook, archive).write_data()
+        self.files.append(path)
+        self._workbook = None
+        self._sheets = {}
+        self._prototypes = {}
+
+    # ---- 对外接口 ----
+
+    def add_row(self, sheet: str, values: List, images: Optional[Dict[int, str]] = None,
+                height: Optional[float] = None, styled: bool = True) -> int:
+        """
+        写入一行，返回该行在工作表中的行号
+        images 为列号（从1开始）到图片文件路径的映射；styled=False 时不套用数据单元格样式
+        """
+        if self._workbook is None:
+            self._open_workbook()
+        elif self._file_rows >= self.file_rows:
+            self._save_workbook()
+            self._open_workbook()
+
+        ws, rows, index = self._sheets[sheet]
+        if rows >= self.sheet_rows:
+            self._new_sheet(sheet, index + 1)
+            ws, rows, index = self._sheets[sheet]
+
+        row = rows + (2 if self.headers[sheet] else 1)
+        if height:
+            ws.row_dimensions[row].height = height
+        for col, image_path in (images or {}).items():
+            if image_path:
+                self._add_image(ws, row, col, image_path)
+
+        style = self.cell_style if styled else {}
+        ws.append([self._cell(ws, value, style) for value in values])
+        self._sheets[sheet] = (ws, rows + 1, index)
+        self._file_rows += 1
+        return row
+
+    def _add_image(self, ws, row: int, col: int, image_path: str):
+        path = os.path.abspath(image_path)
+        prototype = self._prototypes.get(path)
+        if prototype is None:
+            prototype = self._prototypes[path] = Image(path)
+        img = copy.copy(prototype)
+        if self.fit_images:
+            img.anchor = TwoCellAnchor(
+                'twoCell',
+                AnchorMarker(col=col - 1, colOff=_IMAGE_MARGIN, row=row - 1, rowOff=_IMAGE_MARGIN),
+                AnchorMarker(col=col, colOff=-_IMAGE_MARGIN, row=row, rowOff=-_IMAGE_MARGIN)
+            )
+        else:
+            img.anchor = f"{get_column_letter(col)}{row}"
+        ws.add_image(img)
+        self._images += 1
+
+    def close(self) -> List[str]:
+        """保存报告，返回生成的所有文件路径"""
+        if self._workbook is None and not self.files:
+            self._open_workbook()
+        if self._workbook is not None:
+            self._save_workbook()
+        return self.files
+
+    def stats(self) -> Dict:
+        return {'files': len(self.files), 'images': self._images}
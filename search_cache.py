@@ -0,0 +1,128 @@
+"""
+1688 图片搜索结果缓存
+
+热销商品往往连续多天出现在榜单中，同一张封面图会被反复上传到1688搜索。
+这里以图片内容的 SHA-256 为键，持久化保存上传得到的 imageId 和解析后的商品列表：
+- 商品列表在有效期内直接复用，完全跳过上传和页面搜索
+- 商品列表过期但 imageId 仍有效时，只跳过上传
+
+每个图片一个 JSON 文件，条目数超过上限时淘汰最久未使用的条目。
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from storage import get_storage, ANALYSIS_DIR
+
+
+class SearchCache:
+    def __init__(self, cache_dir: str, ttl_hours: float = 72, image_id_ttl_hours: float = 24,
+                 max_entries: int = 5000):
+        """初始化搜索结果缓存
+
+        Args:
+            cache_dir: 缓存目录
+            ttl_hours: 商品列表的有效期（小时）
+            image_id_ttl_hours: imageId 的有效期（小时）
+            max_entries: 最多保存的图片数量
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.ttl = ttl_hours * 3600
+        self.image_id_ttl = image_id_ttl_hours * 3600
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+        self._stats = {'hits': 0, 'misses': 0, 'image_id_hits': 0, 'evictions': 0}
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _load(self, digest: str) -> Dict:
+        try:
+            with open(self._path(digest), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, digest: str, entry: Dict):
+        path = self._path(digest)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _evict(self):
+        """条目数超出上限时，按最后使用时间淘汰"""
+        entries = [e for e in os.scandir(self.cache_dir) if e.is_file() and e.name.endswith('.json')]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - int(self.max_entries * 0.9)]:
+            try:
+                os.remove(entry.path)
+                self._stats['evictions'] += 1
+            except OSError:
+                pass
+
+    def get_offers(self, digest: str) -> Optional[List[Dict]]:
+        """返回有效期内的商品列表，未命中返回 None"""
+        with self._lock:
+            entry = self._load(digest)
+            offers = entry.get('offers')
+            if offers is not None and time.time() - entry.get('offers_at', 0) <= self.ttl:
+                self._stats['hits'] += 1
+                os.utime(self._path(digest), None)
+                return offers
+            self._stats['misses'] += 1
+            return None
+
+    def get_image_id(self, digest: str) -> Optional[str]:
+        """返回有效期内的 imageId，未命中返回 None"""
+        with self._lock:
+            entry = self._load(digest)
+            image_id = entry.get('image_id')
+            if image_id and time.time() - entry.get('image_id_at', 0) <= self.image_id_ttl:
+                self._stats['image_id_hits'] += 1
+                return image_id
+            return None
+
+    def put_image_id(self, digest: str, image_id: str):
+        with self._lock:
+            entry = self._load(digest)
+            entry.update(image_id=image_id, image_id_at=time.time())
+            self._save(digest, entry)
+            self._evict()
+
+    def put_offers(self, digest: str, offers: List[Dict]):
+        with self._lock:
+            entry = self._load(digest)
+            entry.update(offers=offers, offers_at=time.time())
+            self._save(digest, entry)
+            self._evict()
+
+    def stats(self) -> Dict:
+        """命中率等统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+            return stats
+
+
+_search_cache: Optional[SearchCache] = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """获取全局1688搜索结果缓存，目录位于 analysis/1688_cache"""
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache(
+                os.path.join(get_storage().area_dir(ANALYSIS_DIR), '1688_cache'),
+                ttl_hours=float(os.environ.get('ECHOTIK_1688_CACHE_TTL_HOURS', '72')),
+                max_entries=int(os.environ.get('ECHOTIK_1688_CACHE_MAX_ENTRIES', '5000'))
+            )
+    return _search_cache
@@ -0,0 +1,349 @@
+"""
+生成文件的存储管理
+
+所有生成的文件（原始数据、分析结果、商品图片、报告）都放在受管目录下：
+- data/            爬取的原始 JSON
+- analysis/        分析结果（Excel、JSON）
+- product_images/  商品图片
+- reports/         TOP50 等附带报告
+
+后台清理线程会把长时间未访问的文本类文件透明压缩（优先 zstd，未安装时使用 gzip），
+并按目录的容量和保存时间配额淘汰最久未访问的文件。读取接口会自动识别压缩文件，
+调用方始终使用原始路径即可。
+子目录中的缓存（product_images/cache、product_images/thumbs、analysis/1688_cache）计入所在目录的配额，
+同样按最久未访问淘汰；它们由各自的缓存直接读写，因此不会被压缩。
+"""
+import gzip
+import io
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # zstd 为可选依赖
+    zstandard = None
+
+DATA_DIR = 'data'
+ANALYSIS_DIR = 'analysis'
+IMAGE_DIR = 'product_images'
+REPORTS_DIR = 'reports'
+
+# 各目录的默认策略：
+#   max_mb              目录容量上限（MB），超出后按最久未访问淘汰
+#   max_age_days        文件最长保存天数
+#   compress_after_hours 超过多少小时未访问的文件会被压缩，None 表示不压缩
+DEFAULT_POLICIES = {
+    DATA_DIR: {'max_mb': 2048, 'max_age_days': 90, 'compress_after_hours': 24},
+    ANALYSIS_DIR: {'max_mb': 1024, 'max_age_days': 90, 'compress_after_hours': 24},
+    IMAGE_DIR: {'max_mb': 1024, 'max_age_days': 30, 'compress_after_hours': None},
+    REPORTS_DIR: {'max_mb': 512, 'max_age_days': 14, 'compress_after_hours': 6},
+}
+
+# 只有文本类文件值得压缩，图片和 xlsx 本身已是压缩格式
+COMPRESSIBLE_SUFFIXES = ('.json', '.jsonl', '.txt', '.csv')
+COMPRESSED_SUFFIXES = ('.zst', '.gz')
+
+# 最近修改过的文件不参与淘汰，避免删除正在写入的文件
+MIN_EVICT_AGE_SECONDS = 3600
+
+
+def _compressed_variants(path: str) -> List[str]:
+    return [path + suffix for suffix in COMPRESSED_SUFFIXES]
+
+
+def _original_path(path: str) -> str:
+    for suffix in COMPRESSED_SUFFIXES:
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+class StorageManager:
+    def __init__(self, root: str = '.', policies: Optional[Dict[str, Dict]] = None,
+                 codec: Optional[str] = None):
+        """初始化存储管理器
+
+        Args:
+            root: 受管目录所在的根目录
+            policies: 各目录的配额策略，缺省使用 DEFAULT_POLICIES
+            codec: 压缩格式 'zstd' 或 'gzip'，缺省时 zstd 可用则用 zstd
+        """
+        self.root = root
+        self.policies = {area: dict(policy) for area, policy in DEFAULT_POLICIES.items()}
+        for area, policy in (policies or {}).items():
+            self.policies.setdefault(area, {}).update(policy)
+
+        if codec is None:
+            codec = 'zstd' if zstandard else 'gzip'
+        if codec == 'zstd' and not zstandard:
+            print("未安装 zstandard，改用 gzip 压缩")
+            codec = 'gzip'
+        self.codec = codec
+
+        self._protected: Optional[Callable[[], Iterable[str]]] = None
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+        for area in self.policies:
+            os.makedirs(self.area_dir(area), exist_ok=True)
+
+    def area_dir(self, area: str) -> str:
+        return os.path.join(self.root, area)
+
+    def path(self, area: str, filename: str) -> str:
+        """返回受管目录下的文件路径，并确保目录存在"""
+        directory = self.area_dir(area)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, filename)
+
+    def set_protected(self, provider: Callable[[], Iterable[str]]):
+        """设置受保护文件的提供函数，其返回的路径不会被压缩或淘汰"""
+        self._protected = provider
+
+    # ---- 读取 ----
+
+    def resolve(self, path: Optional[str]) -> Optional[str]:
+        """返回文件在磁盘上的实际路径（原始或压缩版本），不存在时返回 None"""
+        if not path:
+            return None
+        for candidate in [path] + _compressed_variants(path):
+            if os.path.exists(candidate):
+                return candidate
+        return None
+
+    def exists(self, path: Optional[str]) -> bool:
+        return self.resolve(path) is not None
+
+    def _touch(self, actual: str):
+        """记录访问时间，供 LRU 淘汰使用（很多文件系统关闭了 atime 更新）"""
+        try:
+            st = os.stat(actual)
+            os.utime(actual, (time.time(), st.st_mtime))
+        except OSError:
+            pass
+
+    def open(self, path: str, mode: str = 'rb', encoding: Optional[str] = None):
+        """以只读方式打开文件，压缩文件会被透明解压"""
+        if mode not in ('r', 'rb'):
+            raise ValueError("StorageManager.open 只支持读取模式")
+        actual = self.resolve(path)
+        if actual is None:
+            raise FileNotFoundError(path)
+        self._touch(actual)
+
+        if actual.endswith('.gz'):
+            raw = gzip.open(actual, 'rb')
+        elif actual.endswith('.zst'):
+            if not zstandard:
+                raise RuntimeError(f"读取 {actual} 需要安装 zstandard")
+            raw = zstandard.ZstdDecompressor().stream_reader(open(actual, 'rb'), closefd=True)
+        else:
+            raw = open(actual, 'rb')
+
+        if mode == 'rb':
+            return raw
+        return io.TextIOWrapper(raw, encoding=encoding or 'utf-8')
+
+    def read_json(self, path: str):
+        with self.open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def iter_bytes(self, path: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """按块读取文件内容（已解压），用于流式下载"""
+        with self.open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def is_compressed(self, path: str) -> bool:
+        actual = self.resolve(path)
+        return bool(actual) and actual != path
+
+    # ---- 写入与删除 ----
+
+    def discard_variants(self, path: str):
+        """删除文件的压缩版本，在重新写入原始文件后调用"""
+        for variant in _compressed_variants(path):
+            if os.path.exists(variant):
+                try:
+                    os.remove(variant)
+                except OSError as e:
+                    print(f"删除旧的压缩文件失败 {variant}: {e}")
+
+    def remove(self, path: Optional[str]) -> bool:
+        """删除文件及其压缩版本"""
+        if not path:
+            return False
+        removed = False
+        for candidate in [path] + _compressed_variants(path):
+            if os.path.exists(candidate):
+                os.remove(candidate)
+                removed = True
+        return removed
+
+    # ---- 压缩与淘汰 ----
+
+    def _compress_file(self, path: str) -> Optional[str]:
+        """压缩单个文件，保留原有的访问和修改时间"""
+        suffix = '.zst' if self.codec == 'zstd' else '.gz'
+        target = path + suffix
+        tmp = target + '.tmp'
+        st = os.stat(path)
+        try:
+            with open(path, 'rb') as src, open(tmp, 'wb') as dst:
+                if self.codec == 'zstd':
+                    zstandard.ZstdCompressor(level=10).copy_stream(src, dst)
+                else:
+                    with gzip.GzipFile(fileobj=dst, mode='wb', compresslevel=6, mtime=0) as gz:
+                        shutil.copyfileobj(src, gz)
+            os.utime(tmp, (st.st_atime, st.st_mtime))
+            os.replace(tmp, target)
+        except Exception as e:
+            print(f"压缩文件失败 {path}: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return None
+        try:
+            os.remove(path)
+        except OSError:
+            # 文件仍被占用（如 Windows 上正在下载），保留原文件，下次再处理
+            os.remove(target)
+            return None
+        return target
+
+    def _protected_paths(self) -> set:
+        if not self._protected:
+            return set()
+        try:
+            return {os.path.abspath(_original_path(p)) for p in self._protected() if p}
+        except Exception as e:
+            print(f"获取受保护文件列表失败: {e}")
+            return set()
+
+    def _scan(self, area: str) -> List[Dict]:
+        """列出目录及其子目录中的文件，nested 表示文件位于子目录（缓存）中"""
+        entries = []
+        directory = self.area_dir(area)
+        if not os.path.isdir(directory):
+            return entries
+        for dirpath, _, filenames in os.walk(directory):
+            for name in filenames:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue  # 扫描期间被删除
+                entries.append({
+                    'path': path,
+                    'size': st.st_size,
+                    'atime': max(st.st_atime, st.st_mtime),
+                    'mtime': st.st_mtime,
+                    'nested': dirpath != directory
+                })
+        return entries
+
+    def sweep(self) -> Dict[str, Dict]:
+        """执行一次压缩和配额清理，返回各目录的统计信息"""
+        now = time.time()
+        protected = self._protected_paths()
+        stats = {}
+
+        for area, policy in self.policies.items():
+            area_stats = {'compressed': 0, 'evicted': 0, 'freed_bytes': 0, 'total_bytes': 0}
+            entries = self._scan(area)
+
+            # 1. 压缩冷文件
+            compress_after = policy.get('compress_after_hours')
+            if compress_after is not None:
+                for entry in entries:
+                    path = entry['path']
+                    if (entry['nested'] or not path.endswith(COMPRESSIBLE_SUFFIXES)
+                            or os.path.abspath(path) in protected
+                            or now - entry['atime'] < compress_after * 3600):
+                        continue
+                    target = self._compress_file(path)
+                    if target:
+                        area_stats['compressed'] += 1
+                        entry['path'] = target
+                        entry['size'] = os.path.getsize(target)
+
+            # 2. 按保存时间和容量淘汰，最久未访问的先删除
+            max_age = policy.get('max_age_days')
+            max_bytes = (policy.get('max_mb') or 0) * 1024 * 1024
+            total = sum(e['size'] for e in entries)
+            for entry in sorted(entries, key=lambda e: e['atime']):
+                too_old = max_age is not None and now - entry['atime'] > max_age * 86400
+                over_quota = max_bytes and total > max_bytes
+                if not (too_old or over_quota):
+                    continue
+                if (now - entry['mtime'] < MIN_EVICT_AGE_SECONDS
+                        or os.path.abspath(_original_path(entry['path'])) in protected):
+                    continue
+                try:
+                    os.remove(entry['path'])
+                except OSError as e:
+                    print(f"淘汰文件失败 {entry['path']}: {e}")
+                    continue
+                total -= entry['size']
+                area_stats['evicted'] += 1
+                area_stats['freed_bytes'] += entry['size']
+
+            area_stats['total_bytes'] = total
+            stats[area] = area_stats
+
+        return stats
+
+    def start_sweeper(self, interval_seconds: float = 600):
+        """启动后台清理线程"""
+        if self._sweeper and self._sweeper.is_alive():
+            return
+        self._stop_event.clear()
+
+        def run():
+            while not self._stop_event.wait(interval_seconds):
+                try:
+                    stats = self.sweep()
+                    changed = {a: s for a, s in stats.items() if s['compressed'] or s['evicted']}
+                    if changed:
+                        print(f"存储清理完成: {changed}")
+                except Exception as e:
+                    print(f"存储清理出错: {e}")
+
+        self._sweeper = threading.Thread(target=run, name='storage-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop_event.set()
+
+
+def _load_policies() -> Optional[Dict[str, Dict]]:
+    """从 ECHOTIK_STORAGE_CONFIG 指向的 JSON 文件读取配额覆盖配置"""
+    config_file = os.environ.get('ECHOTIK_STORAGE_CONFIG')
+    if not config_file:
+        return None
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"读取存储配置失败 {config_file}: {e}")
+        return None
+
+
+_storage: Optional[StorageManager] = None
+
+
+def get_storage() -> StorageManager:
+    """获取全局存储管理器"""
+    global _storage
+    if _storage is None:
+        _storage = StorageManager(policies=_load_policies(),
+                                  codec=os.environ.get('ECHOTIK_STORAGE_CODEC') or None)
+    return _storage
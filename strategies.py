@@ -0,0 +1,46 @@
+"""
+选品分析策略
+
+每个策略定义价格范围、销量/达人得分权重和返回数量，另外定义分析时可选生成的附加报告。本模块不依赖任何第三方库，
+api_server 可以直接导入用于参数校验，而不会加载分析所需的重量级依赖。
+"""
+from typing import Dict, Iterable, Tuple
+
+STRATEGIES: Dict[str, Dict] = {
+    # TOP50选品：价格RM10-1000，销量权重60%，达人数量权重40%
+    'top50': {'price_range': (10, 1000), 'sales_weight': 0.6, 'influencer_weight': 0.4, 'top_n': 50},
+    # 低价选品：只看RM10-50的商品
+    'budget': {'price_range': (10, 50), 'sales_weight': 0.6, 'influencer_weight': 0.4, 'top_n': 50},
+    # 低竞争选品：更看重达人数量少的商品
+    'low_competition': {'price_range': (10, 1000), 'sales_weight': 0.4, 'influencer_weight': 0.6, 'top_n': 50},
+    # TOP100选品：与TOP50相同的评分，返回前100个
+    'top100': {'price_range': (10, 1000), 'sales_weight': 0.6, 'influencer_weight': 0.4, 'top_n': 100},
+}
+
+# 兼容旧的策略名：analyze_product_data 过去的默认值为 'all'
+STRATEGY_ALIASES = {'all': 'top50'}
+
+# 可选的附加报告（默认不生成）：TOP50商品的Excel报告（含商品图片）和TXT简要报告
+SIDE_REPORTS = ('top50_excel', 'top50_txt')
+
+
+def resolve_strategy(name: str) -> str:
+    """返回策略的规范名称，未知策略抛出 ValueError"""
+    name = STRATEGY_ALIASES.get(name, name)
+    if name not in STRATEGIES:
+        raise ValueError(f"未知的分析策略: {name}，可选: {', '.join(STRATEGIES)}")
+    return name
+
+
+def resolve_reports(names: Iterable[str]) -> Tuple[str, ...]:
+    """校验附加报告名称并去重（保持顺序），未知报告抛出 ValueError"""
+    reports = tuple(dict.fromkeys(name.strip().lower() for name in names or ()))
+    unknown = [name for name in reports if name not in SIDE_REPORTS]
+    if unknown:
+        raise ValueError(f"未知的附加报告: {', '.join(unknown)}，可选: {', '.join(SIDE_REPORTS)}")
+    return reports
+
+
+def get_strategy(name: str) -> Dict:
+    """返回策略参数的副本"""
+    return dict(STRATEGIES[resolve_strategy(name)])
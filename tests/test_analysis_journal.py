@@ -0,0 +1,81 @@
+import json
+import os
+
+import pytest
+
+import storage
+from analysis_journal import AnalysisJournal, read_results
+from storage import StorageManager
+
+
+@pytest.fixture
+def journal_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, '_storage', StorageManager(root=str(tmp_path)))
+    return str(tmp_path / 'journal_1.jsonl')
+
+
+def _record(product_id, cover='a.jpg'):
+    return {'product_id': product_id, 'cover_url': cover, 'offers': [],
+            'result': {'product_id': product_id}}
+
+
+def _lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_reopen_keeps_meta_without_rewriting(journal_file):
+    journal = AnalysisJournal(journal_file)
+    journal.append(_record(1))
+    journal.write_meta({'total_products': 2})
+    journal.append(_record(2))
+    journal.close()
+    inode = os.stat(journal_file).st_ino
+
+    reopened = AnalysisJournal(journal_file)
+    reopened.close()
+
+    assert os.stat(journal_file).st_ino == inode
+    assert [line.get('meta') for line in _lines(journal_file)] == [None, {'total_products': 2}, None]
+
+
+def test_rewrite_keeps_latest_meta(journal_file):
+    journal = AnalysisJournal(journal_file)
+    journal.write_meta({'total_products': 3})
+    journal.append(_record(1, 'old.jpg'))
+    journal.append(_record(1, 'new.jpg'))
+    journal.write_meta({'total_products': 2})
+    journal.close()
+
+    reopened = AnalysisJournal(journal_file)
+    reopened.close()
+
+    lines = _lines(journal_file)
+    assert [line['meta'] for line in lines if 'meta' in line] == [{'total_products': 2}]
+    assert [line['cover_url'] for line in lines if 'meta' not in line] == ['new.jpg']
+    assert read_results(journal_file)['meta'] == {'total_products': 2}
+
+
+def test_read_results_resets_cursor_after_rewrite(journal_file):
+    journal = AnalysisJournal(journal_file)
+    journal.write_meta({'total_products': 3})
+    for product_id in (1, 2, 3):
+        journal.append(_record(product_id))
+
+    first = read_results(journal_file, limit=2)
+    assert [p['product_id'] for p in first['products']] == [1, 2]
+    assert not first['reset']
+    assert [p['product_id'] for p in read_results(journal_file, first['cursor'])['products']] == [3]
+
+    # 继续分析时日志被重写为更短的内容，旧游标即使恰好落在行首也不能继续使用
+    journal.retain([{'product_id': 2, 'cover_url': 'a.jpg'}])
+    journal.write_meta({'total_products': 1})
+    journal.close()
+    second = read_results(journal_file, first['cursor'])
+    assert second['reset']
+    assert [p['product_id'] for p in second['products']] == [2]
+    assert second['meta'] == {'total_products': 1}
+
+    assert not read_results(journal_file, second['cursor'])['reset']
+    assert read_results(journal_file, '0')['reset'] is False
+    assert read_results(journal_file, '12')['reset']
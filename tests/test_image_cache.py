@@ -0,0 +1,60 @@
+import os
+import time
+
+from image_cache import ImageCache
+
+
+def _age(path: str, hours: float):
+    mtime = time.time() - hours * 3600
+    os.utime(path, (mtime, mtime))
+
+
+def test_url_index_expires(tmp_path):
+    cache = ImageCache(str(tmp_path), url_ttl_hours=1)
+    url = 'https://cbu01.alicdn.com/img/ibank/a.jpg'
+    cache.put(url, b'old')
+    assert cache.get(url) == b'old'
+
+    # 进程重启后内存中没有记录，只能读取磁盘上的索引
+    reopened = ImageCache(str(tmp_path), url_ttl_hours=1)
+    _age(reopened._url_path(url), 2)
+    assert reopened.get(url) is None
+    assert reopened.fetch(url, downloader=lambda u: b'new') == b'new'
+    assert ImageCache(str(tmp_path), url_ttl_hours=1).get(url) == b'new'
+
+
+def test_eviction_includes_url_index(tmp_path):
+    cache = ImageCache(str(tmp_path), disk_limit_mb=0.001)
+    for i in range(4):
+        url = f'https://cbu01.alicdn.com/img/ibank/{i}.jpg'
+        cache.put(url, bytes([i]) * 300)
+        _age(cache._url_path(url), 4 - i)
+        _age(cache._blob_path(cache.hash_of(url)), 4 - i)
+
+    cache.put('https://cbu01.alicdn.com/img/ibank/4.jpg', b'\x04' * 300)
+
+    assert cache.stats()['disk_bytes'] <= cache.disk_limit
+    assert len(os.listdir(cache.url_dir)) < 5
+    assert not os.path.exists(cache._url_path('https://cbu01.alicdn.com/img/ibank/0.jpg'))
+
+
+def test_eviction_skips_files_removed_by_sweeper(tmp_path, monkeypatch):
+    cache = ImageCache(str(tmp_path))
+    for i in range(3):
+        cache.put(f'https://cbu01.alicdn.com/img/ibank/{i}.jpg', bytes([i]) * 300)
+    cache.disk_limit = 1000
+    swept = cache._blob_path(cache.hash_of('https://cbu01.alicdn.com/img/ibank/0.jpg'))
+    scan = cache._disk_entries
+
+    def entries_then_sweep():
+        # 存储清理线程在扫描之后删除了其中一张图片
+        entries = scan()
+        if os.path.exists(swept):
+            os.remove(swept)
+        return entries
+
+    monkeypatch.setattr(cache, '_disk_entries', entries_then_sweep)
+    cache.put('https://cbu01.alicdn.com/img/ibank/3.jpg', b'\x03' * 300)
+
+    assert cache.get('https://cbu01.alicdn.com/img/ibank/3.jpg') == b'\x03' * 300
+    assert cache.stats()['disk_bytes'] <= cache.disk_limit
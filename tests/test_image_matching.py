@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+
+from analyse import ImageMatcher, _FEATURE_EXTRACTORS, _correl_scores, _histogram_feature
+
+
+def _product_image(seed: int, background: int = 255) -> np.ndarray:
+    """白底上若干色块的模拟商品图"""
+    rng = np.random.default_rng(seed)
+    img = np.full((400, 400, 3), background, np.uint8)
+    for _ in range(6):
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        center = tuple(int(c) for c in rng.integers(50, 350, 2))
+        cv2.circle(img, center, int(rng.integers(20, 120)), color, -1)
+    noise = rng.normal(0, 12, img.shape)
+    return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+
+def _jpeg(img: np.ndarray, quality: int = 85) -> bytes:
+    return cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def test_identical_images_score_one():
+    content = _jpeg(_product_image(1))
+    feature = _histogram_feature(content)
+    assert _correl_scores(feature, [feature])[0] > 0.999
+
+
+def test_reencoded_image_scores_high():
+    img = _product_image(2)
+    source = _histogram_feature(_jpeg(img))
+    resized = _histogram_feature(_jpeg(cv2.resize(img, (300, 300)), quality=60))
+    assert _correl_scores(source, [resized])[0] > 0.95
+
+
+def test_unrelated_images_score_low():
+    threshold = ImageMatcher().similarity_threshold
+    features = [_histogram_feature(_jpeg(_product_image(seed))) for seed in range(6)]
+    for i, source in enumerate(features):
+        others = features[:i] + features[i + 1:]
+        assert (_correl_scores(source, others) < threshold).all()
+
+
+def test_cascade_passes_identical_candidate():
+    images = {
+        'source': _jpeg(_product_image(4)),
+        'same': _jpeg(_product_image(4)),
+        'other': _jpeg(_product_image(5)),
+    }
+    matcher = ImageMatcher()
+    matcher._image_feature = lambda url, kind: _FEATURE_EXTRACTORS[kind](images[url])
+
+    scores = matcher.match_many('source', ['same', 'other'])
+
+    assert scores[0] > 0.999
+    assert scores[1] == 0
+    stats = matcher.cascade_stats()
+    assert stats['histogram']['passed'] == 1
+    assert stats['orb']['checked'] == 1
+
+
+def test_feature_cache_keyed_by_content_without_url_index(tmp_path, monkeypatch):
+    import analyse
+    from image_cache import ImageCache
+
+    cache = ImageCache(str(tmp_path))
+    monkeypatch.setattr(analyse, 'get_image_cache', lambda: cache)
+    images = {'a': _jpeg(_product_image(6)), 'b': _jpeg(_product_image(7))}
+    for url, content in images.items():
+        cache.put(url, content)
+    # 取得图片后 URL 索引已过期或被淘汰，hash_of 返回 None
+    monkeypatch.setattr(cache, 'hash_of', lambda url: None)
+
+    matcher = ImageMatcher()
+    features = {url: matcher._image_feature(url, 'histogram') for url in images}
+
+    assert not np.array_equal(features['a'], features['b'])
+    assert np.allclose(features['b'], _histogram_feature(images['b']))
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import analyse
+from analyse import MTOP_APP_KEY, SEARCH_API, Alibaba1688Searcher, parse_offer_json
+from mtop_token import TokenManager
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def _fixture_json(name: str) -> dict:
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_parse_offer_json():
+    offers = parse_offer_json(_fixture_json('1688_mtop_search.json'))
+
+    # filterTags 等其他数组、推荐词条目以及缺少图片或标题的商品被跳过
+    assert offers == [
+        {
+            'title': '挂式抽纸 家用 大包 面巾纸 4提装',
+            'price': '8.50',
+            'product_url': 'https://detail.1688.com/offer/724838291012.html?spm=a26352.13672862.offerlist.1',
+            'image_url': 'https://cbu01.alicdn.com/img/ibank/O1CN01aB3xYz1Kj2mN4pQ7r_!!2211234567890-0-cib.jpg',
+        },
+        {
+            'title': '熊猫图案 抽取式纸巾 整箱批发',
+            'price': '12.80',
+            'product_url': 'https://detail.1688.com/offer/681203945577.html',
+            'image_url': 'https://cbu01.alicdn.com/img/ibank/O1CN01ZzYy9x1Kj2mNaBcDe_!!2209876543210-0-cib.jpg',
+        },
+        {
+            'title': '【广告】悬挂式纸巾 母婴可用',
+            'price': '6.90',
+            'product_url': 'https://dj.1688.com/ci_bb?a=1&e=655512340098',
+            'image_url': 'https://cbu01.alicdn.com/img/ibank/O1CN01Adv0001.jpg',
+        },
+    ]
+
+
+def test_parse_offer_json_items_array_and_limit():
+    result = _fixture_json('1688_mtop_search.json')
+    result['data'] = {'data': {'itemsArray': result['data']['offerList']}}
+
+    assert [offer['price'] for offer in parse_offer_json(result)] == ['8.50', '12.80', '6.90']
+    assert [offer['price'] for offer in parse_offer_json(result, limit=2)] == ['8.50', '12.80']
+    assert parse_offer_json(result, limit=0) == []
+
+
+def test_parse_offer_json_ignores_unrelated_lists():
+    # 没有商品列表时，带 id 的其他数组不能被当作商品
+    result = _fixture_json('1688_mtop_search.json')
+    del result['data']['offerList']
+
+    assert parse_offer_json(result) == []
+    assert parse_offer_json({'ret': ['SUCCESS::调用成功']}) == []
+
+
+class _MtopStandIn(BaseHTTPRequestHandler):
+    """本地模拟的 mtop 接口：不带签名的请求下发 token cookie，签名正确的搜索请求返回保存的响应"""
+    token = 'standintoken'
+    requests = []
+
+    def do_POST(self):
+        query = {name: values[0] for name, values in parse_qs(urlparse(self.path).query).items()}
+        form = {name: values[0] for name, values in
+                parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')).items()}
+        self.requests.append(query['api'])
+        expected = hashlib.md5(f"{self.token}&{query['t']}&{MTOP_APP_KEY}&{form['data']}".encode('utf-8')).hexdigest()
+        if query['sign'] != expected:
+            body = {'ret': ['FAIL_SYS_TOKEN_EMPTY::令牌为空'], 'data': {}}
+        elif query['api'] == SEARCH_API:
+            body = _fixture_json('1688_mtop_search.json')
+        else:
+            body = {'ret': ['FAIL_SYS_API_NOT_FOUNDED::请求API不存在'], 'data': {}}
+        content = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        self.send_header('Content-Length', str(len(content)))
+        if query['sign'] != expected:
+            expires = int((time.time() + 3600) * 1000)
+            self.send_header('Set-Cookie', f'_m_h5_tk={self.token}_{expires}; Path=/')
+            self.send_header('Set-Cookie', '_m_h5_tk_enc=standinenc; Path=/')
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_search_offers_http_against_stand_in(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _MtopStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _MtopStandIn.requests = []
+    monkeypatch.setattr(analyse, 'get_token_manager', lambda: TokenManager())
+    try:
+        searcher = Alibaba1688Searcher()
+        searcher.api_url = f'http://127.0.0.1:{server.server_address[1]}/h5'
+        searcher.target_offers = 2
+
+        offers = searcher._search_offers_http('image-id-1')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # 先取得 token，再用签名后的请求调用图片搜索接口
+    assert _MtopStandIn.requests[-1] == SEARCH_API
+    assert [offer['product_url'] for offer in offers] == [
+        'https://detail.1688.com/offer/724838291012.html?spm=a26352.13672862.offerlist.1',
+        'https://detail.1688.com/offer/681203945577.html',
+    ]
@@ -0,0 +1,59 @@
+import os
+import re
+
+from analyse import parse_offer_cards
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def _fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def _offer_id(product_url: str) -> str:
+    match = re.search(r'/offer/(\d+)\.html', product_url) or re.search(r'[?&]e=(\d+)', product_url)
+    return match.group(1)
+
+
+def test_parse_offer_cards():
+    offers = parse_offer_cards(_fixture('1688_search_results.html'))
+
+    # 缺少价格、图片未加载、链接不指向商品详情页的卡片被跳过
+    assert [_offer_id(offer['product_url']) for offer in offers] == [
+        '724838291012', '681203945577', '655512340098'
+    ]
+    assert [offer['image_url'] for offer in offers] == [
+        'https://cbu01.alicdn.com/img/ibank/O1CN01aB3xYz1Kj2mN4pQ7r_!!2211234567890-0-cib.jpg_460x460q100.jpg_.webp',
+        'https://cbu01.alicdn.com/img/ibank/O1CN01ZzYy9x1Kj2mNaBcDe_!!2209876543210-0-cib.jpg_460x460q100.jpg_.webp',
+        'https://cbu01.alicdn.com/img/ibank/O1CN01Adv0001.jpg',
+    ]
+    # 标题中的换行和多余空白被折叠，高亮标签只保留文本
+    assert [offer['title'] for offer in offers] == [
+        '挂式抽纸 家用 大包 面巾纸 4提装',
+        '熊猫图案 抽取式纸巾 整箱批发',
+        '【广告】悬挂式纸巾 母婴 可用',
+    ]
+    assert [offer['price'] for offer in offers] == ['¥8.50', '¥12.80', '¥6.90']
+
+
+def test_parse_offer_cards_resolves_links_against_base_url():
+    offers = parse_offer_cards(_fixture('1688_search_results.html'), base_url='https://detail.1688.com/')
+
+    assert offers[1]['product_url'] == 'https://detail.1688.com/offer/681203945577.html'
+    assert offers[-1]['product_url'] == 'https://detail.1688.com/offer/612340987766.html'
+    assert offers[-1]['title'] == '相对链接的商品'
+
+
+def test_parse_offer_cards_limit():
+    html = _fixture('1688_search_results.html')
+
+    assert [_offer_id(offer['product_url']) for offer in parse_offer_cards(html, limit=2)] == [
+        '724838291012', '681203945577'
+    ]
+    assert len(parse_offer_cards(html, limit=1)) == 1
+    assert parse_offer_cards(html, limit=0) == []
+
+
+def test_parse_offer_cards_without_cards():
+    assert parse_offer_cards('<html><body><div class="empty">没有找到相关商品</div></body></html>') == []
@@ -0,0 +1,45 @@
+import os
+import time
+
+from storage import ANALYSIS_DIR, IMAGE_DIR, StorageManager
+
+
+def _write(path: str, size: int, age_hours: float):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    mtime = time.time() - age_hours * 3600
+    os.utime(path, (mtime, mtime))
+
+
+def test_sweep_evicts_files_in_cache_subdirectories(tmp_path):
+    storage = StorageManager(root=str(tmp_path), policies={IMAGE_DIR: {'max_mb': 3000 / (1024 * 1024)}})
+    image_dir = storage.area_dir(IMAGE_DIR)
+    oldest = os.path.join(image_dir, 'cache', 'blobs', 'a' * 64)
+    thumb = os.path.join(image_dir, 'thumbs', 'b' * 64 + '_120x120.jpg')
+    recent = os.path.join(image_dir, 'cache', 'blobs', 'c' * 64)
+    _write(oldest, 1500, age_hours=10)
+    _write(thumb, 1500, age_hours=5)
+    _write(recent, 1500, age_hours=2)
+
+    stats = storage.sweep()
+
+    # 子目录中的缓存计入 product_images 的配额，最久未访问的先淘汰
+    assert stats[IMAGE_DIR]['evicted'] == 1
+    assert not os.path.exists(oldest)
+    assert os.path.exists(thumb) and os.path.exists(recent)
+    assert stats[IMAGE_DIR]['total_bytes'] == 3000
+
+
+def test_sweep_does_not_compress_cache_subdirectories(tmp_path):
+    storage = StorageManager(root=str(tmp_path), codec='gzip')
+    analysis_dir = storage.area_dir(ANALYSIS_DIR)
+    cached = os.path.join(analysis_dir, '1688_cache', 'd' * 64 + '.json')
+    result = os.path.join(analysis_dir, 'analysis_results_1.json')
+    _write(cached, 100, age_hours=48)
+    _write(result, 100, age_hours=48)
+
+    storage.sweep()
+
+    assert os.path.exists(cached)
+    assert storage.is_compressed(result)
@@ -0,0 +1,30 @@
+from io import BytesIO
+
+from PIL import Image as PILImage
+
+from image_cache import ImageCache
+from thumbnails import CELL_SIZE, ThumbnailStore
+
+
+def _png(size=(400, 300)) -> bytes:
+    output = BytesIO()
+    PILImage.new('RGB', size, (200, 40, 40)).save(output, format='PNG')
+    return output.getvalue()
+
+
+def test_path_returns_existing_thumbnail_without_reading_source(tmp_path):
+    cache = ImageCache(str(tmp_path / 'cache'))
+    store = ThumbnailStore(str(tmp_path / 'thumbs'), cache)
+    url = 'https://cbu01.alicdn.com/img/ibank/sample.jpg'
+    cache.put(url, _png())
+
+    path = store.path(url, CELL_SIZE)
+    assert path and PILImage.open(path).size == (120, 90)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('已有缩略图时不应读取原图')
+
+    cache.fetch = fail
+    assert store.path(url, CELL_SIZE) == path
+    assert store.stats()['hits'] == 1
+    assert store.stats()['renders'] == 1
@@ -0,0 +1,197 @@
+"""
+缩略图缓存
+
+报告中嵌入的商品图片只需要固定的几种尺寸（TOP50报告 180x200，匹配结果 120x120）。
+这里对每张原图的每种尺寸只生成一次缩略图：JPEG 使用 draft 模式按缩小比例解码，
+避免完整解码大图；结果以 JPEG（有透明通道时用 PNG）保存在磁盘和内存中，
+以原图内容哈希和尺寸作为文件名，所有报告和工作表共用。
+
+上传到1688图片搜索的图片也在这里预处理：缩小到指定边长并重新压缩为 JPEG，减少上传数据量。
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+from PIL import Image as PILImage
+
+from image_cache import ImageCache, get_image_cache
+from storage import get_storage, IMAGE_DIR
+
+# 报告中使用的缩略图尺寸
+REPORT_SIZE = (180, 200)  # TOP50报告的商品图片列
+CELL_SIZE = (120, 120)    # 1688匹配结果中的单元格图片
+
+JPEG_QUALITY = 85
+
+
+def render_thumbnail(content: bytes, size: Tuple[int, int]) -> Tuple[bytes, str]:
+    """生成缩略图，返回 (图片数据, 扩展名)"""
+    img = PILImage.open(BytesIO(content))
+    if img.format == 'JPEG':
+        # 按不小于目标尺寸的比例（1/2、1/4、1/8）直接解码，跳过完整分辨率
+        img.draft('RGB', size)
+    img.thumbnail(size, PILImage.LANCZOS)
+
+    output = BytesIO()
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        img.save(output, format='PNG', optimize=True)
+        return output.getvalue(), 'png'
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img.save(output, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+    return output.getvalue(), 'jpg'
+
+
+def render_upload(content: bytes, max_side: int, quality: int = JPEG_QUALITY) -> bytes:
+    """缩小图片使长边不超过 max_side 并重新压缩为 JPEG，结果不比原图小时返回原图"""
+    img = PILImage.open(BytesIO(content))
+    if img.format == 'JPEG':
+        img.draft('RGB', (max_side, max_side))
+    img.thumbnail((max_side, max_side), PILImage.LANCZOS)
+
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        # 透明区域铺白色背景，与1688商品图的常见背景一致
+        img = img.convert('RGBA')
+        background = PILImage.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        img = background
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    output = BytesIO()
+    img.save(output, format='JPEG', quality=quality, optimize=True)
+    data = output.getvalue()
+    return data if len(data) < len(content) else content
+
+
+class ThumbnailStore:
+    def __init__(self, thumb_dir: str, image_cache: ImageCache, memory_limit_mb: float = 16):
+        """初始化缩略图缓存
+
+        Args:
+            thumb_dir: 缩略图保存目录
+            image_cache: 读取原图使用的图片缓存
+            memory_limit_mb: 内存缓存上限（MB）
+        """
+        self.thumb_dir = thumb_dir
+        os.makedirs(thumb_dir, exist_ok=True)
+        self.image_cache = image_cache
+        self.memory_limit = int(memory_limit_mb * 1024 * 1024)
+
+        self._memory = OrderedDict()  # 缩略图文件名 -> 图片数据
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+        self._stats = {'hits': 0, 'renders': 0, 'failures': 0}
+
+    def _remember(self, name: str, data: bytes):
+        if name in self._memory:
+            self._memory.move_to_end(name)
+            return
+        self._memory[name] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _find(self, digest: str, size: Tuple[int, int]) -> Optional[str]:
+        """查找磁盘上已生成的缩略图路径（文件可能已被存储清理淘汰），并记录访问时间供淘汰使用"""
+        for ext in ('jpg', 'png'):
+            path = os.path.join(self.thumb_dir, f"{digest}_{size[0]}x{size[1]}.{ext}")
+            try:
+                os.utime(path, (time.time(), os.stat(path).st_mtime))
+            except OSError:
+                continue
+            return path
+        return None
+
+    def path(self, url: str, size: Tuple[int, int]) -> Optional[str]:
+        """返回缩略图在磁盘上的路径，已生成过时直接返回，否则下载原图并生成，失败返回 None"""
+        # 图片缓存记录过该URL的内容哈希时，先查找已有的缩略图，不必读取原图
+        digest = self.image_cache.hash_of(url)
+        if digest:
+            path = self._find(digest, size)
+            if path:
+                with self._lock:
+                    self._stats['hits'] += 1
+                return path
+
+        try:
+            content = self.image_cache.fetch(url)
+        except Exception as e:
+            print(f"下载图片失败 {url}: {e}")
+            content = None
+        if not content:
+            with self._lock:
+                self._stats['failures'] += 1
+            return None
+
+        digest = self.image_cache.hash_of(url)
+        path = self._find(digest, size)
+        if path:
+            with self._lock:
+                self._stats['hits'] += 1
+            return path
+
+        try:
+            data, ext = render_thumbnail(content, size)
+        except Exception as e:
+            print(f"生成缩略图失败 {url}: {e}")
+            with self._lock:
+                self._stats['failures'] += 1
+            return None
+
+        name = f"{digest}_{size[0]}x{size[1]}.{ext}"
+        path = os.path.join(self.thumb_dir, name)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._remember(name, data)
+            self._stats['renders'] += 1
+        return path
+
+    def get(self, url: str, size: Tuple[int, int]) -> Optional[bytes]:
+        """返回缩略图数据，失败返回 None"""
+        path = self.path(url, size)
+        if not path:
+            return None
+        name = os.path.basename(path)
+        with self._lock:
+            data = self._memory.get(name)
+            if data is not None:
+                self._memory.move_to_end(name)
+                return data
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        with self._lock:
+            self._remember(name, data)
+        return data
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_bytes'] = self._memory_bytes
+            return stats
+
+
+_thumbnail_store: Optional[ThumbnailStore] = None
+_thumbnail_store_lock = threading.Lock()
+
+
+def get_thumbnail_store() -> ThumbnailStore:
+    """获取全局缩略图缓存，磁盘目录位于 product_images/thumbs"""
+    global _thumbnail_store
+    with _thumbnail_store_lock:
+        if _thumbnail_store is None:
+            _thumbnail_store = ThumbnailStore(
+                os.path.join(get_storage().area_dir(IMAGE_DIR), 'thumbs'),
+                get_image_cache()
+            )
+    return _thumbnail_store